@@ -11,12 +11,9 @@ gs://coral-dhw-gbr/
 ├── reef_daily/                      ← Compact CSV per day (LABEL_ID + 5 values)
 │   └── {year}/{YYYYMMDD}.csv
 │
-├── reef_timeseries/                 ← Per-product Parquet (all reefs × all dates)
-│   ├── sst.parquet
-│   ├── sst_anomaly.parquet
-│   ├── hotspot.parquet
-│   ├── dhw.parquet
-│   └── baa.parquet
+├── reef_timeseries/                 ← Per-reef series + per-product Parquet
+│   ├── {LABEL_ID}.json              [{date, sst, ..., baa}, ...] (or .bin)
+│   └── {product}/{year}.parquet     sst, sst_anomaly, hotspot, dhw, baa
 │
 ├── gbr_summary/                     ← GBR-wide daily summary
 │   └── gbr_daily.csv
@@ -30,12 +27,41 @@ Usage:
     # Process a date range (saves reef JSONs + BQ rows)
     python backfill_reefs.py --start 2024-01-01 --end 2024-12-31
 
-    # Resume after interruption
+    # Resume after interruption (per-date, per-stage progress in
+    # backfill_reefs_progress.sqlite; `python progress_store.py` summarises it)
     python backfill_reefs.py --start 1981-09-01 --end 2026-02-10 --resume
 
     # Skip BigQuery, save GCS files only
     python backfill_reefs.py --start 2024-01-01 --end 2024-12-31 --json-only
 
+    # BigQuery rows are batched into load jobs (bq_writer.py; flushed every
+    # BQ_BATCH_ROWS rows / BQ_BATCH_SECONDS); per-day streaming inserts:
+    python backfill_reefs.py --start 2024-01-01 --end 2024-12-31 --bq-mode stream
+
+    # Per-stage p50/p95 timings are printed at the end of every backfill;
+    # --log-json also emits one JSON line per stage (spans.py)
+    python backfill_reefs.py --start 2024-01-01 --end 2024-01-31 --log-json
+
+    # Stack 16 dates per reduceRegions call (default 8; 1 = one call per day)
+    python backfill_reefs.py --start 2024-01-01 --end 2024-12-31 --extract-batch 16
+
+    # Process 4 date batches concurrently (progress still reported in date order)
+    python backfill_reefs.py --start 1981-09-01 --end 2026-02-10 --workers 4
+
+    # Compute products locally with NumPy (one OISST fetch per year)
+    python backfill_reefs.py --start 1981-09-01 --end 2026-02-10 --backend numpy
+    python backfill_reefs.py --start 2024-01-01 --end 2024-12-31 --backend numpy \
+        --sst-stack oisst_gbr.npz --climatology climatology.npz
+
+    # ... and reef means from cached exact coverage weights (no reduceRegions)
+    python backfill_reefs.py --start 2024-01-01 --end 2024-12-31 --backend numpy \
+        --reef-weights [--reefs-geojson gbr_reefs.geojson]
+
+    # ── Accumulated heat stress over a range (local, one pass) ───
+    # 4-, 8- and 12-week windows from one cumulative HotSpot sum
+    python backfill_reefs.py --accumulated-hs --start 2015-06-01 --end 2017-06-01 \
+        --windows 4 8 12 --out accumulated_hs_2015_2017.npz
+
     # ── Raster COG exports ────────────────────────────────────────
     # Export raster COGs (async GEE export tasks)
     python backfill_reefs.py --rasters --start 2024-01-01 --end 2024-12-31
@@ -46,30 +72,50 @@ Usage:
 
     # ── Post-processing (after backfill) ──────────────────────────
     # Build per-reef time series files for frontend
+    # (JSON; REEF_SERIES_FORMAT=bin for the compact reef_series.py files)
     python backfill_reefs.py --build-reef-files
 
-    # Build Parquet files from daily JSONs
+    # Build per-product, per-year Parquet files from the daily CSVs
     python backfill_reefs.py --build-parquet
 
     # Build GBR summary CSV
     python backfill_reefs.py --build-gbr-summary
 
-    # Build everything (reef files + parquet + summary)
+    # Build everything (reef files + parquet + summary) in one scan
     python backfill_reefs.py --build-all
 
+    # Daily refresh: append only reef_daily files not yet consumed
+    python backfill_reefs.py --build-all --incremental
+
+    # ── Local storage (bulk runs at disk speed) ───────────────────
+    # Read/write a local mirror of the bucket instead of GCS, then publish
+    python backfill_reefs.py --build-all --local-storage /data/coral-dhw-gbr
+    python backfill_reefs.py --sync-to-gcs --local-storage /data/coral-dhw-gbr
+
+    # Local memory-mapped reef × day cube for analytics (reef_cube.py)
+    python backfill_reefs.py --build-cube ./reef_cube --incremental
+
 Prerequisites:
-    pip install earthengine-api google-cloud-bigquery google-cloud-storage pyarrow pandas
+    pip install earthengine-api google-cloud-bigquery google-cloud-storage pyarrow pandas numpy
+    pip install scipy shapely   # --reef-weights only
 """
 
 import ee
 import os
-import json
-import io
 import argparse
 import time
-import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from pathlib import Path
+
+import bq_writer
+import clients
+import postprocess
+import progress_store
+import reef_cube
+import spans
+import transfer
+from reef_results import ReefTable
+from task_tracker import get_tracker
 
 # ── Config ───────────────────────────────────────────────────────────────────
 GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
@@ -82,6 +128,7 @@ BQ_TABLE = os.environ.get(
     'BQ_TABLE', f'{GEE_PROJECT}.coral_dhw.daily_summary')
 BQ_REEF_TABLE = os.environ.get(
     'BQ_REEF_TABLE', f'{GEE_PROJECT}.coral_dhw.reef_daily')
+BQ_TABLES = ('reef', 'summary')  # progress stages bq_reef / bq_summary
 
 DHW_WINDOW = 84
 HS_THRESHOLD = 1.0
@@ -94,15 +141,16 @@ EXPORT_BOUNDS = [141, -24.75, 153, -8.75]
 
 PRODUCTS = ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
 
-# Task management
+# Task management (polling cadence lives in task_tracker.py)
 MAX_QUEUED_TASKS = 2500
-TASK_CHECK_INTERVAL = 30
 RASTER_BATCH_SIZE = 100
 THROTTLE_PAUSE = 5
 
 # Reef extraction
 REEF_BATCH_SIZE = 50
-PROGRESS_FILE = Path('backfill_reefs_progress.json')
+EXTRACT_BATCH_DAYS = 8   # dates stacked per reduceRegions call (EE payload limit)
+
+# Post-processing (row-group size lives in postprocess.py)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -110,11 +158,7 @@ PROGRESS_FILE = Path('backfill_reefs_progress.json')
 # ══════════════════════════════════════════════════════════════════════════════
 
 def init_ee():
-    try:
-        ee.Initialize(project=GEE_PROJECT)
-    except Exception:
-        ee.Authenticate()
-        ee.Initialize(project=GEE_PROJECT)
+    clients.init_ee(authenticate=True)
 
 
 def load_assets(need_reefs=True):
@@ -127,7 +171,7 @@ def load_assets(need_reefs=True):
     reef_fc = None
     if need_reefs:
         reef_fc = ee.FeatureCollection(REEF_ASSET)
-        reef_count = reef_fc.size().getInfo()
+        reef_count = spans.get_info(reef_fc.size(), 'ee.reef_count')
         print(f'  Loaded {reef_count} reef polygons')
 
     print(f'  Climatology + mask assets loaded.')
@@ -181,6 +225,36 @@ def compute_all_products(target_date, bbox, mask, mmm, dc_image):
             'hotspot': hotspot, 'dhw': dhw, 'baa': baa}
 
 
+def make_product_source(backend, start_date, end_date, bbox, mask, mmm, dc_image,
+                        sst_stack=None, climatology=None):
+    """
+    Return (get_products, local): get_products maps target_date → products
+    dict (ee.Image per product); local is the NumpyBackend or None.
+
+    'ee' builds the EE expressions per day. 'numpy' computes the whole
+    range locally up front (local_compute.py) and hands each day back as
+    ee.Image, so export and extraction stay unchanged.
+    """
+    if backend == 'ee':
+        return (lambda target_date: compute_all_products(
+            target_date, bbox, mask, mmm, dc_image)), None
+
+    import local_compute
+    if climatology:
+        local = local_compute.NumpyBackend.from_npz(climatology, sst_stack)
+    else:
+        local = local_compute.NumpyBackend.from_ee(sst_stack)
+    print(f'  Computing products locally: {start_date} → {end_date} ...')
+    local.compute_range(start_date, end_date)
+
+    def products(target_date):
+        if not local.has_data(target_date):
+            raise ValueError(f'no OISST data for {target_date}')
+        return local.ee_products(target_date)
+
+    return products, local
+
+
 # ── BAA = Bleaching Alert Area classification ────────────────────────────────
 # Matches R categorize_baa():
 #   0: No Stress        (HS ≤ 0)
@@ -207,22 +281,43 @@ def get_baa(hotspot, dhw):
     return baa
 
 
+def accumulated_hs_range(start_date, end_date, weeks=(12,), out_path=None,
+                         sst_stack=None, climatology=None):
+    """
+    Range mode: DHW-style accumulated heat stress for every day in
+    [start_date, end_date] and each window in `weeks`, all derived from one
+    cumulative HotSpot sum (local_compute.accumulated_heat_stress).
+    Writes dates + one (time, y, x) array per window to a local .npz.
+    """
+    import local_compute
+    if climatology:
+        local = local_compute.NumpyBackend.from_npz(climatology, sst_stack)
+    else:
+        init_ee()
+        local = local_compute.NumpyBackend.from_ee(sst_stack)
+
+    windows = [w * 7 for w in weeks]
+    print(f'Accumulated HotSpot: {start_date} → {end_date}, windows {list(weeks)} wk')
+    local.compute_range(start_date, end_date, windows=windows)
+
+    out_path = out_path or f'accumulated_hs_{start_date:%Y%m%d}_{end_date:%Y%m%d}.npz'
+    local.save_range(out_path)
+    names = [local_compute.window_name(w) for w in windows]
+    print(f'✓ {len(local.dates)} days × {names} → {out_path}')
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # RASTER EXPORT (COGs to GCS)
 # ══════════════════════════════════════════════════════════════════════════════
 
 def count_active_tasks():
-    tasks = ee.data.getTaskList()
-    return sum(1 for t in tasks if t.get('state') in ('READY', 'RUNNING'))
+    """Queued + running EE tasks, from the shared tracker's cached task list."""
+    return get_tracker().active_count()
 
 
 def wait_for_queue_space(target=MAX_QUEUED_TASKS):
-    while True:
-        active = count_active_tasks()
-        if active < target:
-            return active
-        print(f'    Queue full ({active} tasks). Waiting {TASK_CHECK_INTERVAL}s ...')
-        time.sleep(TASK_CHECK_INTERVAL)
+    """Return as soon as the tracker sees fewer than `target` active tasks."""
+    return get_tracker().wait_for_slots(target)
 
 
 def export_daily_cog(products, target_date, export_region):
@@ -248,49 +343,53 @@ def export_daily_cog(products, target_date, export_region):
         formatOptions={'cloudOptimized': True}
     )
     task.start()
-    return task.status()['id']
+    get_tracker().track(task, f'daily_{date_str}')
+    return task.id
 
 
-def backfill_rasters(start_date, end_date, resume=False):
+def backfill_rasters(start_date, end_date, resume=False, backend='ee',
+                     sst_stack=None, climatology=None):
     """Export raster COGs for a date range (async GEE tasks)."""
     init_ee()
     print('Loading assets ...')
     bbox, mask, _, mmm, dc_image = load_assets(need_reefs=False)
     export_region = bbox
+    get_products, _ = make_product_source(backend, start_date, end_date, bbox, mask,
+                                          mmm, dc_image, sst_stack, climatology)
 
     total_days = (end_date - start_date).days + 1
     print(f'Raster export: {start_date} → {end_date} ({total_days} days)')
 
-    completed = load_progress() if resume else set()
+    store = progress_store.ProgressStore()
+    done = store.done('rasters', 'exported', start_date, end_date) if resume else set()
     current = start_date
     processed = 0
     batch_count = 0
 
     while current <= end_date:
         date_str = current.isoformat()
-        raster_key = f'raster_{date_str}'
 
-        if raster_key in completed:
+        if date_str in done:
             current += timedelta(days=1)
             continue
 
         pct = ((current - start_date).days + 1) / total_days * 100
 
         try:
-            products = compute_all_products(current, bbox, mask, mmm, dc_image)
+            products = get_products(current)
             export_daily_cog(products, current, export_region)
 
-            completed.add(raster_key)
+            store.mark('rasters', [current], 'exported')
             processed += 1
             batch_count += 1
             print(f'  [{pct:5.1f}%] {date_str}  5-band COG exported')
 
         except Exception as e:
+            store.fail('rasters', [current], 'exported', e)
             print(f'  [{pct:5.1f}%] {date_str}  ERROR: {e}')
 
         if batch_count >= RASTER_BATCH_SIZE:
             batch_count = 0
-            save_progress(completed)
             active = count_active_tasks()
             print(f'  --- Checkpoint: {processed} processed, {active} tasks queued ---')
             if active > MAX_QUEUED_TASKS:
@@ -300,7 +399,6 @@ def backfill_rasters(start_date, end_date, resume=False):
 
         current += timedelta(days=1)
 
-    save_progress(completed)
     print(f'\n✓ Raster export: {processed} days submitted.')
     print(f'  Monitor: https://code.earthengine.google.com/tasks')
 
@@ -313,7 +411,7 @@ def extract_reef_means(products, target_date, reef_fc):
     """
     Compute area-weighted mean per reef for SST, SSTA, HS, DHW.
     BAA derived from reef-level HS and DHW means.
-    Returns list of dicts (LABEL_ID + 5 values, no date/GBR_NAME).
+    Returns a ReefTable (LABEL_ID + 5 columns, no date/GBR_NAME).
     """
     combined = (products['sst'].rename('sst')
                 .addBands(products['sst_anomaly'].rename('sst_anomaly'))
@@ -326,156 +424,227 @@ def extract_reef_means(products, target_date, reef_fc):
         scale=250
     ).getInfo()
 
-    rows = []
-    for feat in results['features']:
-        p = feat['properties']
-        s = round(p['sst'], 4) if p.get('sst') is not None else None
-        a = round(p['sst_anomaly'], 4) if p.get('sst_anomaly') is not None else None
-        h = round(p['hotspot'], 4) if p.get('hotspot') is not None else None
-        d = round(p['dhw'], 4) if p.get('dhw') is not None else None
-
-        # BAA from continuous reef-level means (matches R categorize_baa)
-        if h is not None and d is not None:
-            if h >= 1 and d >= 20:
-                b = 7
-            elif h >= 1 and d >= 16:
-                b = 6
-            elif h >= 1 and d >= 12:
-                b = 5
-            elif h >= 1 and d >= 8:
-                b = 4
-            elif h >= 1 and d >= 4:
-                b = 3
-            elif h >= 1:
-                b = 2
-            elif h > 0 and d < 4:
-                b = 1
-            else:
-                b = 0
-        else:
-            b = None
+    return ReefTable.from_features(results['features'])
 
-        rows.append({
-            'LABEL_ID': p.get('LABEL_ID', ''),
-            'sst': s, 'sst_anomaly': a,
-            'hotspot': h, 'dhw': d, 'baa': b
-        })
-    return rows
 
+def extract_reef_means_batch(products_by_date, reef_fc):
+    """
+    Reef means for several dates in one reduceRegions call.
 
-def compute_gbr_summary(reef_rows, target_date):
-    """Compute GBR-wide mean ± 95% CI from reef-level data."""
-    date_str = target_date.isoformat()
-    summary = {'date': date_str}
-
-    for var in PRODUCTS:
-        values = [r[var] for r in reef_rows
-                  if r.get(var) is not None and not isinstance(r[var], str)]
-        n = len(values)
-        if n > 0:
-            mean_v = sum(values) / n
-            if n > 1:
-                std_v = math.sqrt(sum((x - mean_v)**2 for x in values) / (n - 1))
-            else:
-                std_v = 0
-            ci95 = 1.96 * (std_v / math.sqrt(n)) if n > 0 else 0
-            summary[f'{var}_mean'] = round(mean_v, 4)
-            summary[f'{var}_std'] = round(std_v, 4)
-            summary[f'{var}_ci95_lower'] = round(mean_v - ci95, 4)
-            summary[f'{var}_ci95_upper'] = round(mean_v + ci95, 4)
-            summary[f'{var}_n_reefs'] = n
-        else:
-            for s in ['mean', 'std', 'ci95_lower', 'ci95_upper']:
-                summary[f'{var}_{s}'] = None
-            summary[f'{var}_n_reefs'] = 0
+    Bands of each date are suffixed with the date (sst_20240101 …
+    dhw_20240131), reduced against reef_fc together, and unpacked into
+    {date: ReefTable}, identical to extract_reef_means per date.
+    """
+    suffixes = {d: d.strftime('%Y%m%d') for d in products_by_date}
+    bands = []
+    for d, products in products_by_date.items():
+        for var in ['sst', 'sst_anomaly', 'hotspot', 'dhw']:
+            bands.append(products[var].rename(f'{var}_{suffixes[d]}'))
 
-    return summary
+    results = spans.get_info(ee.Image.cat(bands).reduceRegions(
+        collection=reef_fc,
+        reducer=ee.Reducer.mean(),
+        scale=250
+    ), 'ee.reduceRegions')
 
+    return {d: ReefTable.from_features(results['features'], f'_{suffix}')
+            for d, suffix in suffixes.items()}
 
-# ── GCS save functions ───────────────────────────────────────────────────────
 
-REEF_CSV_FIELDS = ['LABEL_ID', 'sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
+def extract_reef_means_local(arrays_by_date, weights):
+    """
+    Reef means for several dates from local product arrays and the cached
+    sparse coverage matrix (reef_weights.py) — no EE call. Returns
+    {date: ReefTable} like extract_reef_means_batch.
+    """
+    import numpy as np
 
-_storage_client = None
+    dates = list(arrays_by_date)
+    means = {var: weights.means(np.stack([arrays_by_date[d][var] for d in dates]))
+             for var in ['sst', 'sst_anomaly', 'hotspot', 'dhw']}
+    return {d: ReefTable(weights.labels, {var: v[:, j] for var, v in means.items()})
+            for j, d in enumerate(dates)}
 
-def get_storage_client():
-    """Lazy init of GCS client."""
-    global _storage_client
-    if _storage_client is None:
-        from google.cloud import storage
-        _storage_client = storage.Client(project=GEE_PROJECT)
-    return _storage_client
 
+def compute_gbr_summary(reef_table, target_date):
+    """Compute GBR-wide mean ± 95% CI from reef-level data."""
+    return reef_table.summary(target_date, PRODUCTS)
 
-def save_reef_csv(rows, target_date):
-    """Save reef means as compact CSV: gs://bucket/reef_daily/{year}/{YYYYMMDD}.csv"""
-    import csv
-    import io
 
+# ── GCS save functions ───────────────────────────────────────────────────────
+
+def save_reef_csv(reef_table, target_date):
+    """Save reef means as compact CSV: gs://bucket/reef_daily/{year}/{YYYYMMDD}.csv"""
     date_str = target_date.strftime('%Y%m%d')
     blob_path = f'reef_daily/{target_date.year}/{date_str}.csv'
 
-    buf = io.StringIO()
-    writer = csv.DictWriter(buf, fieldnames=REEF_CSV_FIELDS)
-    writer.writeheader()
-    writer.writerows(rows)
-
-    client = get_storage_client()
-    bucket = client.bucket(GCS_BUCKET)
-    blob = bucket.blob(blob_path)
-    blob.upload_from_string(buf.getvalue(), content_type='text/csv')
+    transfer.get_manager().upload(blob_path, reef_table.to_csv(), 'text/csv')
     return blob_path
 
 
-def save_to_bigquery_reef(rows, target_date):
+def load_reef_csv(target_date):
+    """ReefTable back from a reef CSV saved by an earlier run."""
+    blob_path = f'reef_daily/{target_date.year}/{target_date.strftime("%Y%m%d")}.csv'
+    return ReefTable.from_csv(transfer.get_manager().download(blob_path).decode())
+
+
+def save_to_bigquery_reef(reef_table, target_date):
     """Insert reef rows into BigQuery."""
-    from google.cloud import bigquery
-    date_str = target_date.isoformat()
-    bq_rows = [{'date': date_str, **r} for r in rows]
-    client = bigquery.Client(project=GEE_PROJECT)
+    bq_rows = reef_table.bq_rows(target_date.isoformat())
+    client = clients.bigquery()
     for i in range(0, len(bq_rows), 500):
         batch = bq_rows[i:i+500]
-        errors = client.insert_rows_json(BQ_REEF_TABLE, batch)
+        with spans.span('bq.insert', table='reef') as s:
+            errors = client.insert_rows_json(BQ_REEF_TABLE, batch)
+            s.add(rows_written=len(batch))
         if errors:
             print(f'    BQ reef insert errors: {errors[:2]}')
 
 
 def save_to_bigquery_summary(row):
     """Insert GBR summary row into BigQuery."""
-    from google.cloud import bigquery
-    client = bigquery.Client(project=GEE_PROJECT)
-    errors = client.insert_rows_json(BQ_TABLE, [row])
+    client = clients.bigquery()
+    with spans.span('bq.insert', table='summary') as s:
+        errors = client.insert_rows_json(BQ_TABLE, [row])
+        s.add(rows_written=1)
     if errors:
         print(f'    BQ summary insert errors: {errors[:2]}')
 
 
-# ── Progress tracking ────────────────────────────────────────────────────────
-
-def load_progress():
-    if PROGRESS_FILE.exists():
-        with open(PROGRESS_FILE) as f:
-            return set(json.load(f).get('completed', []))
-    return set()
-
-
-def save_progress(completed):
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump({'completed': sorted(completed)}, f)
+def mark_bq_loaded(store, dates, table):
+    """
+    Record that `table` ('reef' or 'summary') has these dates, and mark
+    'bq' for the dates both tables have. A resumed run only re-sends
+    the table that is missing, so reef rows are never appended twice.
+    """
+    store.mark('reefs', dates, f'bq_{table}')
+    other = [t for t in BQ_TABLES if t != table][0]
+    both = store.done('reefs', f'bq_{other}', min(dates), max(dates))
+    store.mark('reefs', [d for d in dates if d.isoformat() in both], 'bq')
 
 
 # ══════════════════════════════════════════════════════════════════════════════
 # MAIN BACKFILL LOOP
 # ══════════════════════════════════════════════════════════════════════════════
 
-def backfill(start_date, end_date, resume=False, json_only=False):
+def backfill_chunk(chunk, get_products, extract_rows, export_region, json_only,
+                   store, bq=None, resume=False):
+    """
+    Steps 1-6 for one chunk of dates. Each stage is recorded in the
+    progress store as soon as it finishes and timed as a span (spans.py);
+    returns [(date, ok, message)].
+    With a bq_writer.BigQueryBatchWriter, BigQuery rows are queued for the
+    next load jobs; 'bq_reef' / 'bq_summary' are marked as each table's
+    job succeeds, and 'bq' once both have.
+    With resume, stages an earlier run finished are skipped: no second COG
+    export, and a date whose CSV was saved is read back from it instead
+    of re-running reduceRegions.
+    """
+    results = []
+    done = {d: ({stage for stage, (status, _) in store.status('reefs', d).items()
+                 if status == 'done'} if resume else set())
+            for d in chunk}
+
+    # 1-2. Compute products + export 5-band raster COG (async)
+    products_by_date = {}
+    for current in chunk:
+        if {'exported', 'csv'} <= done[current]:
+            continue  # products no longer needed
+        try:
+            with spans.span('compute', date=current):
+                products = get_products(current)
+            if 'exported' not in done[current]:
+                with spans.span('export', date=current) as s:
+                    export_daily_cog(products, current, export_region)
+                    s.add(ee_round_trips=1)  # task.start()
+            products_by_date[current] = products
+        except Exception as e:
+            store.fail('reefs', [current], 'exported', e)
+            results.append((current, False, f'ERROR: {e}'))
+    store.mark('reefs', [d for d in products_by_date
+                         if 'exported' not in done[d]], 'exported')
+
+    # 3. Extract reef means for the whole chunk (saved CSVs are read back)
+    rows_by_date = {}
+    for current in chunk:
+        if 'csv' in done[current]:
+            try:
+                with spans.span('csv.read', date=current):
+                    rows_by_date[current] = load_reef_csv(current)
+            except Exception as e:
+                results.append((current, False, f'CSV READ ERROR: {e}'))
+    to_extract = {d: p for d, p in products_by_date.items() if 'csv' not in done[d]}
+    if to_extract:
+        try:
+            with spans.span('extract', days=len(to_extract),
+                            first=min(to_extract)):
+                extracted = extract_rows(to_extract)
+            store.mark('reefs', extracted, 'extracted')
+            rows_by_date.update(extracted)
+        except Exception as e:
+            store.fail('reefs', to_extract, 'extracted', e)
+            results += [(d, False, f'EXTRACTION ERROR: {e}')
+                        for d in to_extract]
+
+    for current, reef_rows in rows_by_date.items():
+        stage = 'csv'
+        try:
+            # 4. Save reef CSV
+            if 'csv' not in done[current]:
+                with spans.span('csv', date=current):
+                    save_reef_csv(reef_rows, current)
+                store.mark('reefs', [current], 'csv')
+
+            # 5-6. BigQuery (tables already loaded on an earlier run are skipped)
+            if not json_only:
+                stage = 'bq'
+                loaded = {table for table in BQ_TABLES if store.status(
+                    'reefs', current).get(f'bq_{table}', ('',))[0] == 'done'}
+                with spans.span('bq', date=current):
+                    summary = compute_gbr_summary(reef_rows, current)
+                    if bq is not None:
+                        bq.add_day(current,
+                                   None if 'reef' in loaded
+                                   else reef_rows.bq_rows(current.isoformat()),
+                                   None if 'summary' in loaded else summary)
+                    else:
+                        if 'reef' not in loaded:
+                            save_to_bigquery_reef(reef_rows, current)
+                            mark_bq_loaded(store, [current], 'reef')
+                        if 'summary' not in loaded:
+                            save_to_bigquery_summary(summary)
+                            mark_bq_loaded(store, [current], 'summary')
+                if loaded == set(BQ_TABLES):
+                    store.mark('reefs', [current], 'bq')
+
+            sst_val = reef_rows.first('sst') if len(reef_rows) else '?'
+            results.append((current, True,
+                            f'{len(reef_rows)} reefs  COG + CSV  SST={sst_val}'))
+        except Exception as e:
+            store.fail('reefs', [current], stage, e)
+            results.append((current, False, f'ERROR: {e}'))
+
+    return sorted(results, key=lambda r: r[0])
+
+
+def backfill(start_date, end_date, resume=False, json_only=False, backend='ee',
+             sst_stack=None, climatology=None, extract_batch=EXTRACT_BATCH_DAYS,
+             workers=1, use_reef_weights=False, reefs_geojson=None, bq_mode='load'):
     """
     For each date:
       1. Compute SST, SSTA, HS, DHW, BAA on GEE
       2. Export 5-band raster COG to GCS (async)
-      3. reduceRegions → reef means + BAA
+      3. reduceRegions → reef means + BAA (extract_batch dates per call),
+         or sparse coverage weights locally (use_reef_weights, numpy backend)
       4. Save reef CSV to GCS (reef_daily/)
       5. Save reef rows to BigQuery (unless --json-only)
       6. Compute GBR summary → BigQuery (unless --json-only)
+
+    BigQuery rows go through batched load jobs (bq_writer.py) unless
+    bq_mode='stream', which keeps the per-day streaming inserts.
+
+    With workers > 1, chunks of dates run on a thread pool with at most
+    2 × workers chunks in flight; progress is still printed in date order.
     """
     init_ee()
     print('Loading assets ...')
@@ -484,73 +653,88 @@ def backfill(start_date, end_date, resume=False, json_only=False):
 
     total_days = (end_date - start_date).days + 1
     print(f'Backfill: {start_date} → {end_date} ({total_days} days)')
-    print(f'  Mode: {"GCS only" if json_only else "GCS + BigQuery"}')
-
-    completed = load_progress() if resume else set()
-    if completed:
-        print(f'  Resuming: {len(completed)} dates already done')
+    print(f'  Mode: {"GCS only" if json_only else f"GCS + BigQuery ({bq_mode})"}')
+    print(f'  Backend: {backend}')
+    get_products, local = make_product_source(backend, start_date, end_date, bbox,
+                                              mask, mmm, dc_image, sst_stack,
+                                              climatology)
+
+    if use_reef_weights:
+        if local is None:
+            raise SystemExit('--reef-weights needs --backend numpy')
+        import reef_weights
+        weights = reef_weights.load_or_build(reefs_geojson)
+        print(f'  Reef means: sparse coverage weights ({len(weights.labels)} reefs)')
+
+        def extract_rows(products_by_date):
+            return extract_reef_means_local(
+                {d: local.products(d) for d in products_by_date}, weights)
+    else:
+        def extract_rows(products_by_date):
+            return extract_reef_means_batch(products_by_date, reef_fc)
+
+    store = progress_store.ProgressStore()
+    pending = [start_date + timedelta(days=i) for i in range(total_days)]
+    if resume:
+        # A date is done once its last stage is: the CSV, or BigQuery;
+        # backfill_chunk skips the earlier stages a pending date finished
+        final_stage = 'csv' if json_only else 'bq'
+        pending = store.pending('reefs', final_stage, pending)
+        if len(pending) < total_days:
+            print(f'  Resuming: {total_days - len(pending)} dates already done')
+    chunks = [pending[i:i + extract_batch]
+              for i in range(0, len(pending), extract_batch)]
+    print(f'  Extraction: {extract_batch} date(s) per reduceRegions call, '
+          f'{workers} worker(s)')
+
+    bq = None
+    if not json_only and bq_mode == 'load':
+        bq = bq_writer.BigQueryBatchWriter(
+            BQ_REEF_TABLE, BQ_TABLE,
+            on_flush=lambda dates, table: mark_bq_loaded(store, dates, table),
+            on_error=lambda dates, e, table: store.fail('reefs', dates, f'bq_{table}', e))
 
-    current = start_date
     processed = 0
     errors = 0
     batch_count = 0
+    max_in_flight = 2 * workers
 
-    while current <= end_date:
-        date_str = current.isoformat()
-
-        if date_str in completed:
-            current += timedelta(days=1)
-            continue
-
-        pct = ((current - start_date).days + 1) / total_days * 100
-
-        try:
-            # 1. Compute products
-            products = compute_all_products(current, bbox, mask, mmm, dc_image)
-
-            # 2. Export 5-band raster COG (async)
-            export_daily_cog(products, current, export_region)
-
-            # 3. Extract reef means
-            reef_rows = extract_reef_means(
-                products, current, reef_fc)
-
-            # 4. Save reef CSV
-            save_reef_csv(reef_rows, current)
-
-            # 5-6. BigQuery
-            if not json_only:
-                save_to_bigquery_reef(reef_rows, current)
-                summary = compute_gbr_summary(reef_rows, current)
-                save_to_bigquery_summary(summary)
-
-            completed.add(date_str)
-            processed += 1
-            batch_count += 1
-
-            sst_val = reef_rows[0]['sst'] if reef_rows else '?'
-            print(f'  [{pct:5.1f}%] {date_str}  '
-                  f'{len(reef_rows)} reefs  COG + CSV  SST={sst_val}')
-
-        except Exception as e:
-            errors += 1
-            print(f'  [{pct:5.1f}%] {date_str}  ERROR: {e}')
-
-        if batch_count >= REEF_BATCH_SIZE:
-            batch_count = 0
-            save_progress(completed)
-            active = count_active_tasks()
-            print(f'  --- Checkpoint: {processed} processed, {errors} errors, {active} GEE tasks ---')
-            if active > MAX_QUEUED_TASKS:
-                wait_for_queue_space()
-            time.sleep(1)
-
-        current += timedelta(days=1)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            next_submit = 0
+            for next_report in range(len(chunks)):
+                while (next_submit < len(chunks)
+                       and next_submit - next_report < max_in_flight):
+                    futures[next_submit] = pool.submit(
+                        backfill_chunk, chunks[next_submit], get_products, extract_rows,
+                        export_region, json_only, store, bq, resume)
+                    next_submit += 1
+
+                for current, ok, message in futures.pop(next_report).result():
+                    pct = ((current - start_date).days + 1) / total_days * 100
+                    print(f'  [{pct:5.1f}%] {current.isoformat()}  {message}')
+                    if ok:
+                        processed += 1
+                        batch_count += 1
+                    else:
+                        errors += 1
+
+                if batch_count >= REEF_BATCH_SIZE:
+                    batch_count = 0
+                    active = count_active_tasks()
+                    print(f'  --- Checkpoint: {processed} processed, {errors} errors, {active} GEE tasks ---')
+                    if active > MAX_QUEUED_TASKS:
+                        wait_for_queue_space()
+                    time.sleep(1)
+    finally:
+        if bq is not None:
+            bq.close()  # load whatever is still buffered
 
-    save_progress(completed)
     print(f'\n{"═" * 60}')
     print(f'✓ Complete: {processed} days, {errors} errors.')
     print(f'{"═" * 60}')
+    spans.print_report()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -598,6 +782,7 @@ def annual_max_dhw(year):
         formatOptions={'cloudOptimized': True}
     )
     task.start()
+    get_tracker().track(task, f'annual_max_dhw_{year}')
     print(f'  Export task started for {year}.')
 
 
@@ -605,181 +790,47 @@ def annual_max_dhw(year):
 # POST-PROCESSING: Build derived files from daily CSVs
 # ══════════════════════════════════════════════════════════════════════════════
 
-def build_reef_files():
+def build_reef_files(incremental=False):
     """
     Read all reef_daily/{year}/{date}.csv from GCS and reorganise
-    into one JSON per reef: reef_timeseries/{LABEL_ID}.json
-    Each file: [{date, sst, sst_anomaly, hotspot, dhw, baa}, ...]
+    into one file per reef: reef_timeseries/{LABEL_ID}.json, or .bin
+    with REEF_SERIES_FORMAT=bin (see reef_series.py)
     """
-    import csv
-    import io
-    from google.cloud import storage
-    client = storage.Client(project=GEE_PROJECT)
-    bucket = client.bucket(GCS_BUCKET)
-
-    print('Listing daily reef CSVs ...')
-    blobs = sorted(bucket.list_blobs(prefix='reef_daily/'),
-                   key=lambda b: b.name)
-    csv_blobs = [b for b in blobs if b.name.endswith('.csv')]
-    print(f'  Found {len(csv_blobs)} daily files')
-
-    reef_data = {}  # LABEL_ID → list of daily records
-
-    for i, blob in enumerate(csv_blobs):
-        # Extract date from path: reef_daily/2024/20240101.csv
-        fname = blob.name.split('/')[-1].replace('.csv', '')
-        file_date = f'{fname[:4]}-{fname[4:6]}-{fname[6:8]}'
-
-        text = blob.download_as_text()
-        reader = csv.DictReader(io.StringIO(text))
-        for row in reader:
-            label = row['LABEL_ID']
-            if label not in reef_data:
-                reef_data[label] = []
-            reef_data[label].append({
-                'date': file_date,
-                'sst': _safe_float(row.get('sst')),
-                'sst_anomaly': _safe_float(row.get('sst_anomaly')),
-                'hotspot': _safe_float(row.get('hotspot')),
-                'dhw': _safe_float(row.get('dhw')),
-                'baa': _safe_int(row.get('baa'))
-            })
-        if (i + 1) % 500 == 0:
-            print(f'  Read {i + 1}/{len(csv_blobs)} files ...')
-
-    print(f'  {len(reef_data)} unique reefs')
-
-    for label, data in reef_data.items():
-        data.sort(key=lambda r: r['date'])
-        blob = bucket.blob(f'reef_timeseries/{label}.json')
-        blob.upload_from_string(
-            json.dumps(data, indent=None, separators=(',', ':')),
-            content_type='application/json')
-
-    print(f'✓ Wrote {len(reef_data)} reef files to reef_timeseries/')
-
-
-def _safe_float(v):
-    """Convert string to float, return None for empty/None."""
-    if v is None or v == '' or v == 'None':
-        return None
-    return float(v)
-
-
-def _safe_int(v):
-    """Convert string to int, return None for empty/None."""
-    if v is None or v == '' or v == 'None':
-        return None
-    return int(float(v))
-
-
-def build_parquet():
+    postprocess.run([postprocess.ReefSeriesSink()], incremental=incremental)
+
+
+def build_parquet(days_per_row_group=None, incremental=False):
     """
-    Read all reef_daily/*.csv from GCS and create per-product
-    Parquet files: reef_timeseries/{product}.parquet
-    Columns: LABEL_ID, date, value
+    Stream all reef_daily/*.csv into per-product Parquet files, one per
+    year: reef_timeseries/{product}/{year}.parquet (LABEL_ID, date,
+    value), one row group per `days_per_row_group` days.
     """
-    import pandas as pd
-    from google.cloud import storage
-
-    client = storage.Client(project=GEE_PROJECT)
-    bucket = client.bucket(GCS_BUCKET)
-
-    print('Reading daily reef CSVs for Parquet ...')
-    blobs = sorted(bucket.list_blobs(prefix='reef_daily/'),
-                   key=lambda b: b.name)
-    csv_blobs = [b for b in blobs if b.name.endswith('.csv')]
-    print(f'  Found {len(csv_blobs)} daily files')
-
-    frames = []
-    for i, blob in enumerate(csv_blobs):
-        fname = blob.name.split('/')[-1].replace('.csv', '')
-        file_date = f'{fname[:4]}-{fname[4:6]}-{fname[6:8]}'
-        df = pd.read_csv(io.StringIO(blob.download_as_text()))
-        df['date'] = file_date
-        frames.append(df)
-        if (i + 1) % 500 == 0:
-            print(f'  Read {i + 1}/{len(csv_blobs)} ...')
-
-    print(f'  Concatenating {len(frames)} frames ...')
-    df = pd.concat(frames, ignore_index=True)
-    df['date'] = pd.to_datetime(df['date']).dt.date
-
-    for product in PRODUCTS:
-        if product not in df.columns:
-            continue
-        subset = df[['LABEL_ID', 'date', product]].copy()
-        subset = subset.rename(columns={product: 'value'})
-        subset = subset.sort_values(['LABEL_ID', 'date'])
+    postprocess.run([postprocess.ParquetSink(
+        days_per_row_group or postprocess.PARQUET_ROW_GROUP_DAYS)],
+        incremental=incremental)
 
-        local_path = f'/tmp/{product}.parquet'
-        subset.to_parquet(local_path, index=False)
 
-        blob = bucket.blob(f'reef_timeseries/{product}.parquet')
-        blob.upload_from_filename(local_path)
-        print(f'  ✓ {product}.parquet: {len(subset)} rows')
-
-    print('✓ Parquet files uploaded.')
+def build_gbr_summary(incremental=False):
+    """
+    GBR-wide daily summary (mean ± 95% CI across all reefs) from all
+    reef_daily/*.csv. Output: gbr_summary/gbr_daily.csv
+    """
+    postprocess.run([postprocess.GbrSummarySink()], incremental=incremental)
 
 
-def build_gbr_summary():
+def build_cube(path=None, incremental=False):
     """
-    Read all reef_daily/*.csv from GCS and compute GBR-wide
-    daily summary (mean ± 95% CI across all reefs).
-    Output: gbr_summary/gbr_daily.csv
+    Local memory-mapped (product × reef × day) cube of all reef_daily
+    CSVs (reef_cube.py), appended in place with incremental=True.
     """
-    import pandas as pd
-    from google.cloud import storage
-
-    client = storage.Client(project=GEE_PROJECT)
-    bucket = client.bucket(GCS_BUCKET)
-
-    print('Reading daily reef CSVs for GBR summary ...')
-    blobs = sorted(bucket.list_blobs(prefix='reef_daily/'),
-                   key=lambda b: b.name)
-    csv_blobs = [b for b in blobs if b.name.endswith('.csv')]
-
-    frames = []
-    for blob in csv_blobs:
-        fname = blob.name.split('/')[-1].replace('.csv', '')
-        file_date = f'{fname[:4]}-{fname[4:6]}-{fname[6:8]}'
-        df = pd.read_csv(io.StringIO(blob.download_as_text()))
-        df['date'] = file_date
-        frames.append(df)
-
-    df = pd.concat(frames, ignore_index=True)
-
-    summary_rows = []
-    for d, grp in df.groupby('date'):
-        row = {'date': d}
-        for var in PRODUCTS:
-            if var not in grp.columns:
-                continue
-            vals = pd.to_numeric(grp[var], errors='coerce').dropna()
-            n = len(vals)
-            if n > 0:
-                mean_v = vals.mean()
-                std_v = vals.std() if n > 1 else 0
-                ci95 = 1.96 * (std_v / math.sqrt(n))
-                row[f'{var}_mean'] = round(mean_v, 4)
-                row[f'{var}_std'] = round(std_v, 4)
-                row[f'{var}_ci95_lower'] = round(mean_v - ci95, 4)
-                row[f'{var}_ci95_upper'] = round(mean_v + ci95, 4)
-                row[f'{var}_n_reefs'] = n
-            else:
-                for s in ['mean', 'std', 'ci95_lower', 'ci95_upper']:
-                    row[f'{var}_{s}'] = None
-                row[f'{var}_n_reefs'] = 0
-        summary_rows.append(row)
+    postprocess.run([postprocess.CubeSink(path or reef_cube.CUBE_DIR)],
+                    incremental=incremental)
 
-    summary_df = pd.DataFrame(summary_rows).sort_values('date')
 
-    local_path = '/tmp/gbr_daily.csv'
-    summary_df.to_csv(local_path, index=False)
-
-    blob = bucket.blob('gbr_summary/gbr_daily.csv')
-    blob.upload_from_filename(local_path)
-    print(f'✓ GBR summary: {len(summary_df)} days → gbr_summary/gbr_daily.csv')
+def build_all(incremental=False):
+    """Reef files + Parquet + GBR summary from a single scan of reef_daily/."""
+    postprocess.run([postprocess.ReefSeriesSink(), postprocess.ParquetSink(),
+                     postprocess.GbrSummarySink()], incremental=incremental)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -809,14 +860,46 @@ Examples:
     parser.add_argument('--start', type=str, help='Start date YYYY-MM-DD')
     parser.add_argument('--end', type=str, help='End date YYYY-MM-DD')
     parser.add_argument('--resume', action='store_true',
-                        help='Resume from last checkpoint')
+                        help='Skip dates already done in the progress store')
     parser.add_argument('--json-only', action='store_true',
                         help='GCS files only, skip BigQuery')
+    parser.add_argument('--extract-batch', type=int, default=EXTRACT_BATCH_DAYS,
+                        metavar='K',
+                        help=f'Dates per reduceRegions call (default {EXTRACT_BATCH_DAYS})')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='Concurrent date batches (default 1 = sequential)')
+    parser.add_argument('--log-json', action='store_true',
+                        help='Also print one structured JSON log line per stage')
+    parser.add_argument('--bq-mode', choices=['load', 'stream'], default='load',
+                        help='BigQuery via batched load jobs (default) or '
+                             'per-day streaming inserts')
+
+    # Compute backend
+    parser.add_argument('--backend', choices=['ee', 'numpy'], default='ee',
+                        help='Compute products on EE (default) or locally with NumPy')
+    parser.add_argument('--sst-stack', type=str,
+                        help='Local OISST stack .npz for --backend numpy '
+                             '(default: fetch from EE)')
+    parser.add_argument('--climatology', type=str,
+                        help='Local climatology .npz for --backend numpy '
+                             '(default: fetch EE assets)')
+    parser.add_argument('--reef-weights', action='store_true',
+                        help='Reef means from cached sparse coverage weights '
+                             '(--backend numpy) instead of reduceRegions')
+    parser.add_argument('--reefs-geojson', type=str,
+                        help='Reef polygons for --reef-weights (default: EE asset)')
 
     # Rasters
     parser.add_argument('--rasters', action='store_true',
                         help='Export raster COGs (async GEE tasks)')
 
+    # Accumulated heat stress (range mode, local)
+    parser.add_argument('--accumulated-hs', action='store_true',
+                        help='Multi-window accumulated HotSpot for a date range (NumPy)')
+    parser.add_argument('--windows', type=int, nargs='+', default=[12],
+                        metavar='WEEKS', help='Accumulation windows in weeks')
+    parser.add_argument('--out', type=str, help='Output .npz for --accumulated-hs')
+
     # Annual max
     parser.add_argument('--annual-max', type=int,
                         help='Annual max DHW for one year')
@@ -826,31 +909,52 @@ Examples:
 
     # Post-processing
     parser.add_argument('--build-reef-files', action='store_true',
-                        help='Build per-reef JSON files from daily JSONs')
+                        help='Build per-reef series files from daily CSVs')
     parser.add_argument('--build-parquet', action='store_true',
                         help='Build per-product Parquet files')
     parser.add_argument('--build-gbr-summary', action='store_true',
                         help='Build GBR-wide summary CSV')
     parser.add_argument('--build-all', action='store_true',
                         help='Build reef files + parquet + summary')
+    parser.add_argument('--build-cube', nargs='?', const=reef_cube.CUBE_DIR,
+                        metavar='DIR',
+                        help='Build the local memory-mapped reef × day cube')
+    parser.add_argument('--local-storage', type=str, metavar='DIR',
+                        default=transfer.LOCAL_STORAGE_DIR,
+                        help='Use a local directory mirroring the bucket instead of GCS '
+                             '(raster COG exports still go to GCS)')
+    parser.add_argument('--sync-to-gcs', action='store_true',
+                        help='Upload new/changed files from --local-storage to GCS')
+    parser.add_argument('--incremental', action='store_true',
+                        help='With --build-*: only read daily CSVs not yet in '
+                             'the post-processing manifest')
 
     args = parser.parse_args()
+    transfer.LOCAL_STORAGE_DIR = args.local_storage
+    spans.STRUCTURED_LOGS = spans.STRUCTURED_LOGS or args.log_json
+
+    # Local storage → GCS
+    if args.sync_to_gcs:
+        if not args.local_storage:
+            raise SystemExit('--sync-to-gcs needs --local-storage DIR')
+        import local_storage
+        local_storage.sync_to_gcs(args.local_storage)
 
     # Post-processing
-    if args.build_all:
+    elif args.build_all:
         init_ee()
-        build_reef_files()
-        build_parquet()
-        build_gbr_summary()
+        build_all(args.incremental)
     elif args.build_reef_files:
         init_ee()
-        build_reef_files()
+        build_reef_files(incremental=args.incremental)
     elif args.build_parquet:
         init_ee()
-        build_parquet()
+        build_parquet(incremental=args.incremental)
     elif args.build_gbr_summary:
         init_ee()
-        build_gbr_summary()
+        build_gbr_summary(incremental=args.incremental)
+    elif args.build_cube:
+        build_cube(args.build_cube, incremental=args.incremental)
 
     # Annual max
     elif args.annual_max:
@@ -863,12 +967,25 @@ Examples:
             except Exception as e:
                 print(f'  ERROR {y}: {e}')
 
+    # Accumulated heat stress
+    elif args.accumulated_hs and args.start and args.end:
+        accumulated_hs_range(
+            start_date=date.fromisoformat(args.start),
+            end_date=date.fromisoformat(args.end),
+            weeks=args.windows,
+            out_path=args.out,
+            sst_stack=args.sst_stack,
+            climatology=args.climatology)
+
     # Raster export
     elif args.rasters and args.start and args.end:
         backfill_rasters(
             start_date=date.fromisoformat(args.start),
             end_date=date.fromisoformat(args.end),
-            resume=args.resume)
+            resume=args.resume,
+            backend=args.backend,
+            sst_stack=args.sst_stack,
+            climatology=args.climatology)
 
     # Reef extraction (default with dates)
     elif args.start and args.end:
@@ -876,6 +993,14 @@ Examples:
             start_date=date.fromisoformat(args.start),
             end_date=date.fromisoformat(args.end),
             resume=args.resume,
-            json_only=args.json_only)
+            json_only=args.json_only,
+            extract_batch=max(1, args.extract_batch),
+            workers=max(1, args.workers),
+            use_reef_weights=args.reef_weights,
+            reefs_geojson=args.reefs_geojson,
+            backend=args.backend,
+            sst_stack=args.sst_stack,
+            climatology=args.climatology,
+            bq_mode=args.bq_mode)
     else:
         parser.print_help()
\ No newline at end of file
@@ -0,0 +1,365 @@
+"""
+benchmark.py — Microbenchmarks for the pipeline's local hot paths
+=================================================================
+Times the code that runs on our own CPUs (not on EE) against synthetic
+fixtures with production-shaped data:
+
+    reef_rows        ReefTable.from_features over one reduceRegions batch
+                     (BATCH_DAYS date-suffixed bands), i.e. everything
+                     extract_reef_means_batch does after its getInfo;
+                     the reduceRegions itself runs on EE and is not timed
+    reef_means_local backfill_reefs.extract_reef_means_local: sparse
+                     coverage weights over BATCH_DAYS days of rasters
+                     (needs scipy and earthengine-api importable)
+    classify_baa     vectorized BAA classes for one day of reefs
+    reef_writers     ReefTable.to_csv + bq_rows (daily CSV / BigQuery rows)
+    gbr_summary      compute_gbr_summary for one day
+    summary_merge    RunningStats over every day, built in 4 shards + merged
+    raster_products  local_compute.compute_all_products over the raster stack
+    reef_files       postprocess.ReefSeriesSink over the reef_daily fixtures
+    parquet          postprocess.ParquetSink
+    gbr_summary_csv  postprocess.GbrSummarySink
+
+Fixtures default to 4,658 reefs × 365 days and a 64 × 48 × 365 raster
+stack, a quick run while working on a change. --check defaults to the
+full archive (ARCHIVE_DAYS; the reef_daily fixture is then ~2.5 GB on
+disk), since the sinks scale with the archive and a regression that
+only shows at that size is the one that matters. Daily CSVs are written
+once, as a local bucket mirror (local_storage.py) under
+--fixtures/{reefs}x{days}, and reused by later runs.
+
+Every run appends one JSON line to --history (commit, parameters, min
+and median seconds per benchmark) and is compared with the last run
+with the same parameters; slowdowns beyond --threshold are reported as
+regressions, and --check turns them into a non-zero exit status.
+
+Usage:
+    python benchmark.py                               # all, 365 days
+    python benchmark.py --only gbr_summary parquet --repeats 5
+
+    # Required before deploying: full archive, fails on a regression
+    python benchmark.py --check
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import platform
+import statistics
+import subprocess
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+N_REEFS = 4658
+N_DAYS = 365
+ARCHIVE_DAYS = 16000  # 1981-09-01 → today; --check default
+BATCH_DAYS = 8        # backfill_reefs.EXTRACT_BATCH_DAYS
+START_DATE = date(1981, 9, 1)
+FIXTURE_DIR = Path(os.environ.get('BENCH_FIXTURE_DIR', '.bench_fixtures'))
+HISTORY_FILE = Path(os.environ.get('BENCH_HISTORY', 'benchmark_history.jsonl'))
+REGRESSION_THRESHOLD = 0.2  # 20 % slower than the last comparable run
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SYNTHETIC DATA
+# ══════════════════════════════════════════════════════════════════════════════
+
+def reef_labels(n_reefs):
+    return [f'{10000 + i}-{i % 97:03d}' for i in range(n_reefs)]
+
+
+def reef_day(rng, n_reefs):
+    """One day of reef means: {product: float64 array}, ~2 % missing."""
+    sst = rng.normal(27.0, 1.5, n_reefs)
+    columns = {
+        'sst': sst,
+        'sst_anomaly': rng.normal(0.2, 0.6, n_reefs),
+        'hotspot': np.maximum(sst - 28.5, 0),
+        'dhw': np.abs(rng.normal(1.0, 2.0, n_reefs)),
+    }
+    for values in columns.values():
+        values[rng.random(n_reefs) < 0.02] = np.nan
+    return columns
+
+
+def reef_features(labels, columns):
+    """reduceRegions-style feature dicts (properties only)."""
+    cols = {var: [None if v != v else v for v in values.tolist()]
+            for var, values in columns.items()}
+    return [{'type': 'Feature', 'geometry': None,
+             'properties': {'LABEL_ID': label,
+                            **{var: cols[var][i] for var in cols}}}
+            for i, label in enumerate(labels)]
+
+
+def reef_weights(rng, labels, cells_per_reef=3):
+    """ReefWeights with a few partially covered cells per reef."""
+    import local_compute
+    from scipy import sparse
+    from reef_weights import ReefWeights
+    n_pixels = local_compute.GRID_SHAPE[0] * local_compute.GRID_SHAPE[1]
+    n = len(labels) * cells_per_reef
+    matrix = sparse.csr_matrix(
+        (rng.random(n), (np.repeat(np.arange(len(labels)), cells_per_reef),
+                         rng.integers(0, n_pixels, n))),
+        shape=(len(labels), n_pixels))
+    return ReefWeights(labels, matrix, 'benchmark')
+
+
+def raster_stack(rng, n_days):
+    """(dates, sst, mmm, dc, mask) on the 64 × 48 export grid."""
+    import local_compute
+    rows, cols = local_compute.GRID_SHAPE
+    mask = rng.random((rows, cols)) < 0.6
+    mmm = rng.normal(28.5, 0.5, (rows, cols)).astype(np.float32)
+    doy = np.arange(366)[:, None, None]
+    dc = (mmm - 1.5 + 1.5 * np.cos(2 * np.pi * (doy - 45) / 366)).astype(np.float32)
+    dates = [START_DATE + timedelta(days=i) for i in range(n_days)]
+    doy_idx = np.array([min(d.timetuple().tm_yday, 366) - 1 for d in dates])
+    sst = dc[doy_idx] + rng.normal(0, 0.8, (n_days, rows, cols)).astype(np.float32)
+    return dates, sst, mmm, dc, mask
+
+
+def write_reef_daily(root, n_reefs, n_days, seed=0):
+    """reef_daily/{year}/{YYYYMMDD}.csv under root, skipped if already written."""
+    from reef_results import ReefTable
+
+    root = Path(root)
+    marker = root / '.reef_daily_complete'
+    if marker.exists():
+        return
+    print(f'Writing {n_days} reef_daily fixtures ({n_reefs} reefs) to {root} ...')
+    rng = np.random.default_rng(seed)
+    labels = reef_labels(n_reefs)
+    for i in range(n_days):
+        d = START_DATE + timedelta(days=i)
+        path = root / 'reef_daily' / str(d.year) / f'{d:%Y%m%d}.csv'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(ReefTable(labels, reef_day(rng, n_reefs)).to_csv(), newline='')
+    marker.touch()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BENCHMARKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def make_benchmarks(n_reefs, n_days, fixtures):
+    """{name: (setup, fn)}; setup() builds inputs untimed, fn(inputs) is timed."""
+    from reef_results import REEF_CSV_FIELDS, ReefTable, RunningStats, classify_baa
+
+    products = REEF_CSV_FIELDS[1:]
+    fixtures = Path(fixtures) / f'{n_reefs}x{n_days}'
+
+    rng = np.random.default_rng(0)
+    labels = reef_labels(n_reefs)
+    day = date(2024, 3, 15)
+
+    def one_day():
+        return ReefTable(labels, reef_day(rng, n_reefs))
+
+    def summary_merge(_):
+        shards = [RunningStats(products) for _ in range(4)]
+        for i in range(n_days):
+            columns = {var: rng.normal(27.0, 1.5, n_reefs) for var in products}
+            shards[i % 4].add((START_DATE + timedelta(days=i)).isoformat(), columns)
+        total = RunningStats(products)
+        for shard in shards:
+            total.merge(shard)
+        return total.rows()
+
+    batch = [day + timedelta(days=i) for i in range(BATCH_DAYS)]
+
+    def reef_batch():
+        columns = {}
+        for d in batch:
+            columns.update({f'{var}_{d:%Y%m%d}': values
+                            for var, values in reef_day(rng, n_reefs).items()})
+        return reef_features(labels, columns)
+
+    def reef_rows(features):
+        return {d: ReefTable.from_features(features, f'_{d:%Y%m%d}') for d in batch}
+
+    def local_batch():
+        import local_compute
+        lead_in = local_compute.DHW_WINDOW - 1
+        dates, sst, mmm, dc, mask = raster_stack(rng, BATCH_DAYS + lead_in)
+        _, arrays = local_compute.compute_all_products(
+            dates, sst, mmm, dc, mask, lead_in=lead_in)
+        arrays_by_date = {d: {var: arrays[var][i] for var in arrays}
+                          for i, d in enumerate(batch)}
+        return arrays_by_date, reef_weights(rng, labels)
+
+    def reef_means_local(inputs):
+        import backfill_reefs
+        return backfill_reefs.extract_reef_means_local(*inputs)
+
+    def raster_products(inputs):
+        import local_compute
+        return local_compute.compute_all_products(*inputs)
+
+    def run_sink(make_sink):
+        def fn(_):
+            import postprocess
+            import transfer
+            from local_storage import LocalBucket
+            manager = transfer.TransferManager(LocalBucket(fixtures))
+            postprocess.run([make_sink()], transfer=manager, cache=None)
+        return fn
+
+    def sinks():
+        import postprocess
+        return {
+            'reef_files': lambda: postprocess.ReefSeriesSink(gzip=False),
+            'parquet': lambda: postprocess.ParquetSink(tmp_dir=str(fixtures)),
+            'gbr_summary_csv': lambda: postprocess.GbrSummarySink(
+                local_path=str(fixtures / 'gbr_daily.csv')),
+        }
+
+    def reef_daily_fixture():
+        write_reef_daily(fixtures, n_reefs, n_days)
+
+    benchmarks = {
+        'reef_rows': (reef_batch, reef_rows),
+        'reef_means_local': (local_batch, reef_means_local),
+        'classify_baa': (one_day, lambda t: classify_baa(t['hotspot'], t['dhw'])),
+        'reef_writers': (one_day, lambda t: (t.to_csv(), t.bq_rows(day.isoformat()))),
+        'gbr_summary': (one_day, lambda t: t.summary(day, products)),
+        'summary_merge': (lambda: None, summary_merge),
+        'raster_products': (lambda: raster_stack(rng, n_days), raster_products),
+    }
+    for name, make_sink in sinks().items():
+        benchmarks[name] = (reef_daily_fixture, run_sink(make_sink))
+    return benchmarks
+
+
+def time_benchmark(setup, fn, repeats):
+    """
+    Seconds for each of `repeats` calls of fn(setup()) (setup untimed,
+    the pipeline's progress output silenced).
+    """
+    inputs = setup()
+    times = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn(inputs)
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# HISTORY
+# ══════════════════════════════════════════════════════════════════════════════
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_comparable(history, params):
+    """Most recent history entry recorded with the same parameters."""
+    if not history.exists():
+        return None
+    last = None
+    with open(history) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get('params') == params:
+                last = entry
+    return last
+
+
+def append_history(history, entry):
+    with open(history, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reefs', type=int, default=N_REEFS)
+    parser.add_argument('--days', type=int,
+                        help=f'Days of fixtures (default {N_DAYS}; '
+                             f'{ARCHIVE_DAYS} with --check)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help='Run only these benchmarks')
+    parser.add_argument('--fixtures', type=Path, default=FIXTURE_DIR,
+                        help=f'Local bucket mirror for fixtures (default {FIXTURE_DIR})')
+    parser.add_argument('--history', type=Path, default=HISTORY_FILE,
+                        help=f'JSON-lines results history (default {HISTORY_FILE})')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Relative slowdown reported as a regression (default 0.2)')
+    parser.add_argument('--check', action='store_true',
+                        help='Pre-deploy run: full archive unless --days, '
+                             'exit with status 1 if any benchmark regressed')
+    args = parser.parse_args(argv)
+    if args.days is None:
+        args.days = ARCHIVE_DAYS if args.check else N_DAYS
+
+    benchmarks = make_benchmarks(args.reefs, args.days, args.fixtures)
+    names = args.only or list(benchmarks)
+    unknown = set(names) - set(benchmarks)
+    if unknown:
+        parser.error(f'unknown benchmark(s): {", ".join(sorted(unknown))}')
+
+    params = {'reefs': args.reefs, 'days': args.days}
+    previous = last_comparable(args.history, params)
+    baseline = previous['results'] if previous else {}
+
+    print(f'Benchmarks: {args.reefs} reefs × {args.days} days, '
+          f'best of {args.repeats}')
+    print(f'{"name":18s} {"min (s)":>10s} {"median (s)":>11s} {"vs last":>9s}')
+    results = {}
+    regressions = []
+    for name in names:
+        setup, fn = benchmarks[name]
+        times = time_benchmark(setup, fn, args.repeats)
+        results[name] = {'min': min(times), 'median': statistics.median(times)}
+        change = ''
+        if name in baseline:
+            ratio = results[name]['min'] / baseline[name]['min'] - 1
+            change = f'{ratio:+8.1%}'
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += '  REGRESSION'
+        print(f'{name:18s} {results[name]["min"]:10.4f} '
+              f'{results[name]["median"]:11.4f} {change:>9s}')
+
+    append_history(args.history, {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'params': params,
+        'repeats': args.repeats,
+        'results': results,
+    })
+    if previous:
+        print(f'Compared with {previous.get("commit")} ({previous["timestamp"]})')
+    print(f'Results appended to {args.history}')
+
+    if regressions:
+        print(f'✗ {len(regressions)} regression(s) > {args.threshold:.0%}: '
+              f'{", ".join(regressions)}')
+        if args.check:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+blob_cache.py — Read-through on-disk cache of immutable GCS objects
+===================================================================
+Historical reef_daily/{year}/{date}.csv objects never change once
+written, yet every post-processing run downloaded all ~16k of them
+again. BlobCache stores each downloaded object under a key derived from
+its name, generation and CRC32C (all already present in list_blobs()
+results), so:
+
+  * a rewritten object gets a new generation → a new key, never a
+    stale hit; TransferManager downloads with if_generation_match, so
+    an overwrite during the read is not cached under the old key;
+  * a second run over the archive only lists the bucket;
+  * the cache is bounded by REEF_CACHE_MAX_MB and evicts the least
+    recently used files (mtime is touched on every hit).
+
+An LRU gets no hits on a sequential scan larger than itself, so each
+cache must hold its whole working set. The default 4096 MB fits the
+~2.6 GB reef_daily archive with room for growth. The reef series files
+ReefSeriesSink reads back and rewrites each refresh have their own
+cache ('series', REEF_SERIES_CACHE_DIR / REEF_SERIES_CACHE_MAX_MB):
+~6.5 GB of JSON, ~1 GB as .bin. Kept in one cache, they would evict
+the daily CSVs.
+
+TransferManager.download(blob, cache=...) reads through it; postprocess
+uses 'daily' for every daily CSV. Set a cache's size to 0 to disable it.
+Objects without a CRC32C have no key and are never cached. This includes
+every local_storage.LocalBlob, so with LOCAL_STORAGE_DIR the cache is
+silently unused; the files are already on disk.
+
+Usage:
+    cache = get_cache()               # or get_cache('series')
+    data = cache.get(blob)            # None on a miss
+    cache.put(blob, data)
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get('REEF_CACHE_DIR', '.reef_cache'))
+CACHE_MAX_MB = int(os.environ.get('REEF_CACHE_MAX_MB', '4096'))
+SERIES_CACHE_DIR = Path(os.environ.get('REEF_SERIES_CACHE_DIR', '.reef_series_cache'))
+SERIES_CACHE_MAX_MB = int(os.environ.get('REEF_SERIES_CACHE_MAX_MB', '8192'))
+CACHES = {'daily': (CACHE_DIR, CACHE_MAX_MB),
+          'series': (SERIES_CACHE_DIR, SERIES_CACHE_MAX_MB)}
+EVICT_TO = 0.9  # after eviction, total size ≤ EVICT_TO × max
+
+
+class BlobCache:
+    """Size-bounded LRU directory of object bytes keyed by object version."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.size = sum(p.stat().st_size for p in self._files())
+
+    def _files(self):
+        return (p for p in self.root.glob('*/*') if not p.name.startswith('.tmp-'))
+
+    @staticmethod
+    def key(blob):
+        """Cache key for one object version, or None if it has no version."""
+        if blob.generation is None or blob.crc32c is None:
+            return None
+        ident = f'{blob.name}@{blob.generation}:{blob.crc32c}'
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.root / key[:2] / key[2:]
+
+    def get(self, blob):
+        key = self.key(blob)
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # LRU: most recently used
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, blob, data):
+        key = self.key(blob)
+        if key is None or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        existed = path.exists()
+        os.replace(tmp, path)
+        with self._lock:
+            if not existed:
+                self.size += len(data)
+            over = self.size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used files until size ≤ EVICT_TO × max."""
+        with self._lock:
+            files = []
+            for p in self._files():
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime_ns, st.st_size, p))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            target = EVICT_TO * self.max_bytes
+            for _, size, p in files:
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+            self.size = total
+
+    def __str__(self):
+        return (f'{self.hits} hits, {self.misses} misses, '
+                f'{self.size / 1024 / 1024:.1f} of {self.max_bytes / 1024 / 1024:.0f} MB')
+
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def get_cache(kind='daily'):
+    """Process-wide BlobCache of one kind (CACHES), or None when its size is 0."""
+    root, max_mb = CACHES[kind]
+    if max_mb <= 0:
+        return None
+    with _cache_lock:
+        if kind not in _caches:
+            _caches[kind] = BlobCache(root, max_mb * 1024 * 1024)
+    return _caches[kind]
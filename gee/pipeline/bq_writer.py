@@ -0,0 +1,138 @@
+"""
+bq_writer.py — Buffered BigQuery load jobs for bulk backfills
+=============================================================
+Streaming inserts (insert_rows_json) cost per row, count against
+streaming quotas and need ~10 calls per day of 4,658 reef rows. During
+a backfill BigQueryBatchWriter instead buffers many days of reef and
+GBR-summary rows as NDJSON in memory and appends them with one load job
+per table (free, not quota-limited by rows), flushing when either
+
+    BQ_BATCH_ROWS reef rows are buffered   (default 250,000 ≈ 53 days)
+    BQ_BATCH_SECONDS have passed           (default 300)
+
+and on close(). A row field the table does not have fails the load job
+(and is reported), as it failed the streaming insert.
+
+Each table is loaded on its own, and the callbacks report which dates
+reached which table (or failed to): if the summary load fails after the
+reef load committed, only the summary rows are retried later, so a
+resumed backfill never appends the same reef rows twice.
+
+NDJSON rather than Parquet: ISO date strings load straight into the
+DATE columns and None becomes NULL without building an Arrow schema.
+
+The single-day Cloud Function (main.py) keeps streaming inserts.
+
+Usage:
+    writer = BigQueryBatchWriter(reef_table, summary_table,
+                                 on_flush=lambda dates, table: ...)
+    writer.add_day(d, reef_rows, summary_row)    # thread-safe
+    writer.add_day(d, None, summary_row)         # reef rows already loaded
+    writer.close()
+"""
+
+import io
+import os
+import json
+import time
+import threading
+
+import clients
+import spans
+
+BQ_BATCH_ROWS = int(os.environ.get('BQ_BATCH_ROWS', '250000'))
+BQ_BATCH_SECONDS = float(os.environ.get('BQ_BATCH_SECONDS', '300'))
+
+
+def load_ndjson(client, table, data):
+    """Append NDJSON bytes to `table` with one load job; returns the job."""
+    from google.cloud import bigquery
+    config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+    job = client.load_table_from_file(io.BytesIO(data), table, job_config=config)
+    job.result()
+    return job
+
+
+class BigQueryBatchWriter:
+    """
+    Collects reef + summary rows per day and loads them in batches;
+    on_flush(dates, table) / on_error(dates, exc, table) per table
+    ('reef' or 'summary').
+    """
+
+    def __init__(self, reef_table, summary_table, max_rows=BQ_BATCH_ROWS,
+                 max_seconds=BQ_BATCH_SECONDS, on_flush=None, on_error=None,
+                 client=None):
+        self.tables = {'reef': reef_table, 'summary': summary_table}
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self._client = client
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.buffers = {name: io.BytesIO() for name in self.tables}
+        self.dates = {name: [] for name in self.tables}
+        self.n_rows = 0
+        self.started = time.time()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = clients.bigquery()
+        return self._client
+
+    def add_day(self, d, reef_rows, summary_row):
+        """
+        Buffer one day (None skips a table that already has the day);
+        flushes when the batch is full or old enough.
+        """
+        rows = {'reef': reef_rows,
+                'summary': None if summary_row is None else [summary_row]}
+        lines = {name: ''.join(json.dumps(r, separators=(',', ':')) + '\n'
+                               for r in rows[name]).encode()
+                 for name in self.tables if rows[name] is not None}
+        with self._lock:
+            for name, data in lines.items():
+                self.buffers[name].write(data)
+                self.dates[name].append(d)
+            self.n_rows += len(reef_rows or ())
+            due = (self.n_rows >= self.max_rows
+                   or time.time() - self.started >= self.max_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Load everything buffered so far (one job per table)."""
+        with self._lock:
+            if not any(self.dates.values()):
+                return
+            buffers, all_dates = self.buffers, self.dates
+            self._reset()
+        for name, buf in buffers.items():
+            dates = sorted(all_dates[name])
+            if not dates:
+                continue
+            data = buf.getvalue()
+            n_rows = data.count(b'\n')
+            try:
+                with spans.span('bq.load', table=name, days=len(dates)) as s:
+                    load_ndjson(self.client, self.tables[name], data)
+                    s.add(bytes_up=len(data), rows_written=n_rows)
+            except Exception as e:
+                print(f'    BQ {name} load job failed for {len(dates)} day(s) '
+                      f'({dates[0]} → {dates[-1]}): {e}')
+                if self.on_error:
+                    self.on_error(dates, e, name)
+                continue
+            print(f'    BQ load: {n_rows} {name} rows '
+                  f'({dates[0]} → {dates[-1]})')
+            if self.on_flush:
+                self.on_flush(dates, name)
+
+    def close(self):
+        self.flush()
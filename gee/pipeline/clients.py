@@ -0,0 +1,119 @@
+"""
+clients.py — Process-wide Google Cloud clients and Earth Engine session
+=======================================================================
+Every BigQuery insert, GCS write and EE entry point used to build its own
+client, paying for credential discovery, token refresh and a new TLS
+connection each time (once per day, per batch, per Cloud Function call).
+This registry creates each client lazily on first use and hands the same
+instance to every later caller:
+
+    bigquery()   google.cloud.bigquery.Client
+    storage()    google.cloud.storage.Client
+    init_ee()    ee.Initialize() once per process
+
+  * creation is guarded by a lock, so concurrent backfill workers share
+    one client (both clients are thread-safe once built);
+  * each client's HTTP session is widened to HTTP_POOL_SIZE connections
+    so those workers reuse sockets instead of queuing for one;
+  * module globals outlive a request, so warm Cloud Function instances
+    keep their authenticated sessions between invocations;
+  * a forked child (multiprocessing) starts with an empty registry
+    instead of inheriting the parent's sockets.
+
+Usage:
+    import clients
+    clients.bigquery().insert_rows_json(table, rows)
+    clients.storage().bucket(name)
+    clients.init_ee()
+"""
+
+import os
+import threading
+
+GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
+HTTP_POOL_SIZE = int(os.environ.get('CLIENT_POOL_SIZE',
+                                    os.environ.get('GCS_TRANSFER_WORKERS', '16')))
+
+_clients = {}
+_pid = os.getpid()
+_lock = threading.RLock()
+
+
+def _widen_pool(client, size=HTTP_POOL_SIZE):
+    """Let `size` threads share the client's HTTP session without queuing."""
+    http = getattr(client, '_http', None)
+    if http is None or not hasattr(http, 'mount'):
+        return
+    import requests
+    adapter = requests.adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    http.mount('https://', adapter)
+
+
+def get(name, factory):
+    """The registered object `name`, created with factory() on first use."""
+    global _pid
+    with _lock:
+        if _pid != os.getpid():  # forked: don't share the parent's sessions
+            _clients.clear()
+            _pid = os.getpid()
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def reset(name=None):
+    """Drop one (or every) cached client, e.g. after credentials change."""
+    with _lock:
+        if name is None:
+            _clients.clear()
+        else:
+            _clients.pop(name, None)
+
+
+# ── Google Cloud ─────────────────────────────────────────────────────────────
+
+def bigquery():
+    def make():
+        from google.cloud import bigquery
+        client = bigquery.Client(project=GEE_PROJECT)
+        _widen_pool(client)
+        return client
+    return get('bigquery', make)
+
+
+def storage():
+    def make():
+        from google.cloud import storage
+        client = storage.Client(project=GEE_PROJECT)
+        _widen_pool(client)
+        return client
+    return get('storage', make)
+
+
+# ── Earth Engine ─────────────────────────────────────────────────────────────
+
+def init_ee(authenticate=False):
+    """
+    Initialise EE once per process. Falls back to application-default
+    credentials (Cloud Functions' service account), or to the interactive
+    ee.Authenticate() flow with authenticate=True (local scripts).
+    """
+    def make():
+        import ee
+        try:
+            ee.Initialize(project=GEE_PROJECT)
+        except Exception:
+            if authenticate:
+                ee.Authenticate()
+                ee.Initialize(project=GEE_PROJECT)
+            else:
+                credentials = None
+                try:
+                    import google.auth
+                    credentials, _ = google.auth.default(
+                        scopes=['https://www.googleapis.com/auth/earthengine'])
+                except Exception:
+                    pass
+                ee.Initialize(credentials=credentials, project=GEE_PROJECT)
+        return ee
+    return get('ee', make)
@@ -0,0 +1,189 @@
+"""
+hotspot_state.py — Rolling 84-day HotSpot checkpoint for the daily DHW step
+==========================================================================
+DHW is Σ(HS/7) over the trailing 84 days with HS ≥ 1 °C. Rather than
+re-reading and re-summing the whole window every day, the daily run keeps
+a ring buffer of thresholded HotSpot rasters plus their running sum:
+
+    gs://bucket/state/hotspot_ring.npz
+        ring:     float32 (84, 64, 48)  thresholded HS, slot = ordinal % 84
+        hs_sum:   float64 (64, 48)      Σ ring
+        mmm:      float32 (64, 48)      MMM used to threshold
+        mask:     bool    (64, 48)      ocean mask
+        end_date: ISO date of the newest day in the ring
+        built:    ISO date of the last full recompute
+        climatology: version (asset updateTime) of the MMM in `mmm`
+
+Each run adds the new day(s) and subtracts the expired ones, which costs
+one OISST image instead of 84. A full recompute happens when the
+checkpoint is missing, older than the window, ahead of the requested
+date, older than STATE_MAX_AGE days (OISST preliminary days are
+replaced by final values about two weeks later), or built from a
+different climatology version than the caller's, so a re-exported MMM
+takes effect on the next run.
+
+The ring only advances over days OISST has published: if the requested
+date has no data yet, nothing is saved and the next run picks up from
+the last stored day.
+"""
+
+import io
+from datetime import date, timedelta
+
+import numpy as np
+
+import local_compute
+
+DHW_WINDOW = local_compute.DHW_WINDOW
+STATE_BLOB = 'state/hotspot_ring.npz'
+STATE_MAX_AGE = 28  # days between full recomputes
+
+
+class NoData(ValueError):
+    """OISST has not published the requested day yet."""
+
+
+class HotSpotRing:
+    """Ring buffer of thresholded HotSpot rasters with a running sum."""
+
+    def __init__(self, mmm, mask, end_date, built=None, ring=None, hs_sum=None,
+                 climatology=None):
+        shape = (DHW_WINDOW,) + mmm.shape
+        self.mmm = mmm
+        self.mask = mask
+        self.end_date = end_date
+        self.built = built or end_date
+        self.climatology = climatology
+        self.ring = ring if ring is not None else np.zeros(shape, np.float32)
+        self.hs_sum = (hs_sum if hs_sum is not None
+                       else self.ring.sum(axis=0, dtype=np.float64))
+
+    @classmethod
+    def build(cls, end_date, dates, sst, mmm, mask, climatology=None):
+        """Full recompute from an SST stack covering the 84 days to end_date."""
+        state = cls(mmm, mask, end_date - timedelta(days=DHW_WINDOW),
+                    climatology=climatology)
+        for d, day_sst in zip(dates, sst):
+            state.advance(d, day_sst)
+        state.built = end_date
+        return state
+
+    def _slot(self, d):
+        return d.toordinal() % DHW_WINDOW
+
+    def advance(self, d, day_sst):
+        """Add day d (the day after end_date) and drop the day 84 days earlier."""
+        if d != self.end_date + timedelta(days=1):
+            raise ValueError(f'expected {self.end_date + timedelta(days=1)}, got {d}')
+        hs = local_compute.get_hotspot(
+            local_compute.get_sst(day_sst, self.mask), self.mmm)
+        thr = local_compute.threshold_hotspot(hs)
+        slot = self._slot(d)
+        self.hs_sum -= self.ring[slot]
+        self.ring[slot] = thr
+        self.hs_sum += thr
+        self.end_date = d
+
+    def dhw(self):
+        dhw = self.hs_sum / 7
+        return np.where(self.mask, dhw, np.nan).astype(np.float32)
+
+    def needs_rebuild(self, target_date, climatology=None):
+        gap = (target_date - self.end_date).days
+        return (gap < 0 or gap >= DHW_WINDOW
+                or (target_date - self.built).days > STATE_MAX_AGE
+                or self.climatology != climatology)
+
+    # ── (De)serialisation ────────────────────────────────────────────────────
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf, ring=self.ring, hs_sum=self.hs_sum, mmm=self.mmm,
+            mask=self.mask, end_date=self.end_date.isoformat(),
+            built=self.built.isoformat(), climatology=str(self.climatology or ''))
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as f:
+            climatology = str(f['climatology']) if 'climatology' in f else ''
+            return cls(f['mmm'], f['mask'].astype(bool),
+                       date.fromisoformat(str(f['end_date'])),
+                       built=date.fromisoformat(str(f['built'])),
+                       ring=f['ring'], hs_sum=f['hs_sum'],
+                       climatology=climatology or None)
+
+
+# ── GCS checkpoint ───────────────────────────────────────────────────────────
+
+def load_checkpoint(bucket, blob_path=STATE_BLOB):
+    blob = bucket.blob(blob_path)
+    if not blob.exists():
+        return None
+    return HotSpotRing.from_bytes(blob.download_as_bytes())
+
+
+def save_checkpoint(state, bucket, blob_path=STATE_BLOB):
+    bucket.blob(blob_path).upload_from_string(
+        state.to_bytes(), content_type='application/octet-stream')
+
+
+def _until_last_data(dates, sst, mask):
+    """
+    Trim a fetched stack after its last day with data: days OISST has
+    not published yet must not enter the ring as HotSpot 0. Gaps before
+    that day are kept (and reported), so the ring stays contiguous.
+    """
+    missing = set(local_compute.missing_days(dates, sst, mask))
+    with_data = [i for i, d in enumerate(dates) if d not in missing]
+    n = with_data[-1] + 1 if with_data else 0
+    local_compute.warn_missing_days(dates[:n], sst[:n], mask)
+    return dates[:n], sst[:n]
+
+
+def dhw_for_date(target_date, bucket, climatology, blob_path=STATE_BLOB):
+    """
+    DHW (64, 48) for target_date from the checkpoint, fetching only the
+    days that entered the window since the last run. `climatology` is the
+    current MMM version; a checkpoint built from another one is rebuilt.
+    The checkpoint is written back unless target_date is older than it.
+    Raises NoData, without saving, if OISST has no data for target_date
+    yet.
+    """
+    if not climatology:
+        raise ValueError('climatology version unknown')
+    state = load_checkpoint(bucket, blob_path)
+
+    if state is None or state.needs_rebuild(target_date, climatology):
+        if state is None:
+            reason = 'missing'
+        elif state.climatology != climatology:
+            reason = f'built from climatology {state.climatology}'
+        else:
+            reason = f'stale ({state.end_date})'
+        print(f'  HotSpot checkpoint {reason}: full {DHW_WINDOW}-day recompute')
+        mmm, _, mask = local_compute.fetch_climatology()
+        dates, sst = _until_last_data(*local_compute.fetch_oisst_stack(
+            target_date - timedelta(days=DHW_WINDOW - 1), target_date), mask)
+        if not dates or dates[-1] != target_date:
+            raise NoData(f'no OISST data for {target_date}')
+        ahead = state is not None and state.end_date > target_date
+        state = HotSpotRing.build(target_date, dates, sst, mmm, mask,
+                                  climatology=climatology)
+        if ahead:
+            return state.dhw()
+    elif state.end_date < target_date:
+        dates, sst = _until_last_data(*local_compute.fetch_oisst_stack(
+            state.end_date + timedelta(days=1), target_date), state.mask)
+        for d, day_sst in zip(dates, sst):
+            state.advance(d, day_sst)
+        if state.end_date != target_date:
+            raise NoData(f'no OISST data for {target_date} '
+                         f'(checkpoint has data to {state.end_date})')
+        print(f'  HotSpot checkpoint advanced by {len(dates)} day(s)')
+    else:
+        print(f'  HotSpot checkpoint already at {target_date}')
+        return state.dhw()
+
+    save_checkpoint(state, bucket, blob_path)
+    return state.dhw()
@@ -0,0 +1,173 @@
+"""
+local_climatology.py — MM / MMM / daily climatology from a local OISST stack
+============================================================================
+NumPy alternative to precompute_climatology.py. Instead of 12 EE
+collections of 28 yearly means, 12 linearRegression reductions and a
+366-band asset export, it reads an OISST stack on the export grid
+(the .npz used by --sst-stack, dates + (time, 64, 48) °C) and:
+
+  1. averages each (year, month) of CLIM_START–CLIM_END per pixel
+     (days without data skipped, like ImageCollection.mean());
+  2. fits sst = a + b · (year − TARGET_YEAR) for all 12 months × all
+     pixels in one batched np.linalg.lstsq call, so MM = a (the fit
+     evaluated at TARGET_YEAR, as in the EE script); pixels missing some
+     years are fitted on the years they have;
+  3. MMM = max over the 12 MMs;
+  4. DC = the same anchor_doys linear interpolation between monthly
+     MMs, as one (366 × 12) weight matrix applied to every pixel.
+
+The result is written as an .npz (mm, mmm, dc, mask, plus the
+parameters) that local_compute.load_climatology_npz, the --climatology
+option of backfill_reefs.py and LOCAL_CLIMATOLOGY in main.py read
+directly. It is on the grid of the input stack, so a stack fetched with
+local_compute.fetch_oisst_stack gives the pipeline's 64 × 48 grid.
+
+Usage:
+    # Fetch 1985–2012 OISST once (computePixels, ~28 requests), then build
+    python local_climatology.py --fetch-stack oisst_1985_2012.npz climatology.npz
+    python local_climatology.py oisst_1985_2012.npz climatology.npz [--mask gbr_mask.npz]
+
+    python backfill_reefs.py --backend numpy --climatology climatology.npz ...
+"""
+
+import sys
+import argparse
+from datetime import date
+
+import numpy as np
+
+import local_compute
+
+# Same climatology definition as precompute_climatology.py
+CLIM_START = 1985
+CLIM_END = 2012
+TARGET_YEAR = 1988.2857
+ANCHOR_DOYS = [15, 46, 74, 105, 135, 166, 196, 227, 258, 288, 319, 349]
+
+
+def monthly_means(dates, sst, start_year=CLIM_START, end_year=CLIM_END):
+    """(n_years, 12, y, x) mean SST per year and month; NaN where no data."""
+    years = np.array([d.year for d in dates])
+    months = np.array([d.month for d in dates])
+    out = np.full((end_year - start_year + 1, 12) + sst.shape[1:], np.nan,
+                  dtype=np.float64)
+    for i, year in enumerate(range(start_year, end_year + 1)):
+        for m in range(12):
+            days = sst[(years == year) & (months == m + 1)]
+            if len(days):
+                valid = np.isfinite(days)
+                n = valid.sum(axis=0)
+                total = np.where(valid, days, 0).sum(axis=0, dtype=np.float64)
+                out[i, m] = np.divide(total, n, out=out[i, m], where=n > 0)
+    return out
+
+
+def fit_monthly_means(means, start_year=CLIM_START, target_year=TARGET_YEAR):
+    """
+    MM (12, y, x): per month and pixel, the least-squares line through
+    the yearly means evaluated at target_year. Columns with every year
+    present are solved together in one lstsq call; the rest use the
+    same normal equations restricted to their valid years (NaN if < 2).
+    """
+    n_years = means.shape[0]
+    x = np.arange(start_year, start_year + n_years) - target_year
+    design = np.column_stack([np.ones(n_years), x])
+    y = means.reshape(n_years, -1)  # (years, 12 · pixels)
+
+    mm = np.full(y.shape[1], np.nan)
+    complete = np.isfinite(y).all(axis=0)
+    if complete.any():
+        coef, *_ = np.linalg.lstsq(design, y[:, complete], rcond=None)
+        mm[complete] = coef[0]
+
+    partial = ~complete & (np.isfinite(y).sum(axis=0) >= 2)
+    if partial.any():
+        yp = y[:, partial]
+        w = np.isfinite(yp)
+        n = w.sum(axis=0)
+        x_mean = (w * x[:, None]).sum(axis=0) / n
+        y_mean = np.where(w, yp, 0).sum(axis=0) / n
+        dx = np.where(w, x[:, None] - x_mean, 0)
+        slope = (dx * np.where(w, yp - y_mean, 0)).sum(axis=0) / (dx * dx).sum(axis=0)
+        mm[partial] = y_mean - slope * x_mean  # the line at x = 0 (target_year)
+
+    return mm.reshape(means.shape[1:])
+
+
+def daily_weights(anchor_doys=ANCHOR_DOYS):
+    """
+    (366, 12) weights: DC[doy] = W[doy] @ MM, linear between the monthly
+    anchors and wrapping Dec → Jan (precompute_climatology.py's loop).
+    """
+    anchor_ext = [anchor_doys[-1] - 365] + list(anchor_doys) + [anchor_doys[0] + 365]
+    month_idx = [11] + list(range(12)) + [0]
+    weights = np.zeros((366, 12))
+    for doy in range(1, 367):
+        lo = 0
+        for k in range(len(anchor_ext) - 1):
+            if anchor_ext[k] <= doy < anchor_ext[k + 1]:
+                lo = k
+                break
+        frac = (doy - anchor_ext[lo]) / (anchor_ext[lo + 1] - anchor_ext[lo])
+        weights[doy - 1, month_idx[lo]] += 1 - frac
+        weights[doy - 1, month_idx[lo + 1]] += frac
+    return weights
+
+
+def build(dates, sst, mask=None):
+    """{'mm', 'mmm', 'dc', 'mask'} float32/bool arrays from an SST stack."""
+    means = monthly_means(dates, sst)
+    mm = fit_monthly_means(means)
+    mmm = np.fmax.reduce(mm, axis=0)  # max over months with a fit
+    dc = np.tensordot(daily_weights(), mm, axes=1)
+    if mask is None:
+        mask = np.isfinite(mmm)
+    return {'mm': mm.astype(np.float32), 'mmm': mmm.astype(np.float32),
+            'dc': dc.astype(np.float32), 'mask': np.asarray(mask, bool)}
+
+
+def save(path, climatology):
+    np.savez_compressed(path, clim_start=CLIM_START, clim_end=CLIM_END,
+                        target_year=TARGET_YEAR, **climatology)
+
+
+def fetch_stack(path, start_year=CLIM_START, end_year=CLIM_END):
+    """Download the climatology years of OISST (EE computePixels) to an .npz."""
+    from clients import init_ee
+    init_ee(authenticate=True)
+    dates, sst = local_compute.fetch_oisst_stack(date(start_year, 1, 1),
+                                                 date(end_year, 12, 31))
+    np.savez_compressed(path, dates=np.array([d.isoformat() for d in dates]), sst=sst)
+    print(f'  ✓ {len(dates)} days of OISST → {path}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build MM/MMM/DC locally with NumPy')
+    parser.add_argument('stack', help='OISST stack .npz (dates, sst)')
+    parser.add_argument('out', help='Output climatology .npz')
+    parser.add_argument('--fetch-stack', action='store_true',
+                        help=f'Download {CLIM_START}–{CLIM_END} OISST to `stack` first')
+    parser.add_argument('--mask', type=str,
+                        help='.npz with a boolean `mask` (e.g. an existing '
+                             'climatology); default: pixels with an MMM')
+    args = parser.parse_args(argv)
+
+    if args.fetch_stack:
+        fetch_stack(args.stack)
+    print(f'Loading {args.stack} ...')
+    dates, sst = local_compute.load_sst_npz(args.stack)
+    mask = None
+    if args.mask:
+        with np.load(args.mask) as f:
+            mask = f['mask'].astype(bool)
+
+    print(f'Fitting 12 monthly regressions over {CLIM_START}–{CLIM_END} '
+          f'for {sst.shape[1]} × {sst.shape[2]} pixels ...')
+    climatology = build(dates, sst, mask)
+    save(args.out, climatology)
+    print(f'  ✓ MM (12), MMM, DC (366), mask ({int(climatology["mask"].sum())} '
+          f'pixels) → {args.out}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""
+local_compute.py — NumPy compute backend for the daily DHW products
+====================================================================
+Vectorized NumPy implementation of the product math in main.py and
+backfill_reefs.py (get_sst, get_anomaly, get_hotspot, get_dhw, get_baa),
+applied to (time, y, x) arrays on the 64×48 export grid.
+
+Inputs come either from local .npz files or from a handful of
+ee.data.computePixels calls (one per ~year of OISST), so a full
+1981–present reprocess needs minutes of local CPU instead of one EE
+evaluation per day.
+
+File formats:
+    SST stack (.npz)     dates: ISO strings (time,)
+                         sst:   float32 °C (time, 64, 48), NaN = no data
+    Climatology (.npz)   mmm:   float32 °C (64, 48)
+                         dc:    float32 °C (366, 64, 48)
+                         mask:  bool (64, 48), True = ocean pixel to use
+
+Usage:
+    from local_compute import NumpyBackend
+    backend = NumpyBackend.from_ee()            # or .from_npz('clim.npz')
+    backend.compute_range(date(2024, 1, 1), date(2024, 12, 31),
+                          windows=(28, 56))       # + dhw_4wk, dhw_8wk
+    arrays = backend.products(date(2024, 3, 15))      # dict of 2-D arrays
+    images = backend.ee_products(date(2024, 3, 15))   # dict of ee.Image
+
+Prerequisites:
+    pip install numpy earthengine-api
+"""
+
+import os
+import math
+from datetime import date, timedelta
+
+import numpy as np
+
+# ── Config ───────────────────────────────────────────────────────────────────
+OISST_COLLECTION = 'NOAA/CDR/OISST/V2_1'
+GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
+ASSET_FOLDER = f'projects/{GEE_PROJECT}/assets/coral_dhw'
+MASK_ASSET = f'{ASSET_FOLDER}/gbr_mask'
+
+DHW_WINDOW = 84       # days (12 weeks)
+HS_THRESHOLD = 1.0    # °C — only HS ≥ 1 contributes to DHW
+
+# Grid spec (matches R gbr_mask raster: 64 rows × 48 cols)
+EXPORT_CRS = 'EPSG:4326'
+EXPORT_CRS_TRANSFORM = [0.25, 0, 141, 0, -0.25, -8.75]
+GRID_SHAPE = (64, 48)  # (rows, cols)
+
+NODATA = -9999.0
+FETCH_CHUNK_DAYS = 366  # bands per computePixels call
+
+PRODUCTS = ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PRODUCT MATH  (arrays are (time, y, x) unless noted; NaN = masked)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def get_sst(sst, mask):
+    """Apply the ocean mask to an SST stack (°C)."""
+    return np.where(mask, sst, np.nan).astype(np.float32)
+
+
+def get_anomaly(sst, dates, dc):
+    """SST anomaly = SST − daily climatology for each day-of-year."""
+    doy_idx = np.array([min(d.timetuple().tm_yday, 366) - 1 for d in dates])
+    return (sst - dc[doy_idx]).astype(np.float32)
+
+
+def get_hotspot(sst, mmm):
+    """HotSpot = max(SST − MMM, 0); NaN stays NaN."""
+    return np.maximum(sst - mmm, 0).astype(np.float32)
+
+
+def threshold_hotspot(hotspot):
+    """HotSpot values ≥ HS_THRESHOLD, 0 elsewhere (missing days count as 0)."""
+    return np.where(hotspot >= HS_THRESHOLD, hotspot, 0).astype(np.float32)
+
+
+def accumulated_heat_stress(hotspot, mask, windows=(DHW_WINDOW,)):
+    """
+    Σ(HS/7) over trailing windows (days), HS ≥ 1 °C, for every day.
+
+    One cumulative sum of thresholded HotSpot along the time axis serves
+    every window: S[t] − S[t − w] is the sum over the w days ending at t.
+    The first w−1 days only see a partial window, so callers pass a lead-in
+    of max(windows)−1 days and drop it from the result.
+    Returns {window: (time, y, x) float32}.
+    """
+    thr = threshold_hotspot(hotspot)
+    csum = np.zeros((thr.shape[0] + 1,) + thr.shape[1:], dtype=np.float64)
+    np.cumsum(thr, axis=0, dtype=np.float64, out=csum[1:])
+
+    out = {}
+    t = np.arange(1, thr.shape[0] + 1)
+    for w in windows:
+        total = csum[t] - csum[np.maximum(t - w, 0)]
+        out[w] = np.where(mask, total / 7, np.nan).astype(np.float32)
+    return out
+
+
+def get_dhw(hotspot, mask, window=DHW_WINDOW):
+    """DHW = Σ(HS/7) over the trailing `window` days, HS ≥ 1 °C."""
+    return accumulated_heat_stress(hotspot, mask, (window,))[window]
+
+
+# ── BAA = Bleaching Alert Area classification ────────────────────────────────
+# Same classes as get_baa() in main.py / R categorize_baa().
+def get_baa(hotspot, dhw):
+    hs_ge1 = hotspot >= 1
+    baa = np.select(
+        [hs_ge1 & (dhw >= 20),
+         hs_ge1 & (dhw >= 16),
+         hs_ge1 & (dhw >= 12),
+         hs_ge1 & (dhw >= 8),
+         hs_ge1 & (dhw >= 4),
+         hs_ge1,
+         (hotspot > 0) & (dhw < 4)],
+        [7, 6, 5, 4, 3, 2, 1], default=0).astype(np.float32)
+    return np.where(np.isnan(hotspot), np.nan, baa).astype(np.float32)
+
+
+def window_name(window):
+    """Product name for an accumulation window: 84 → 'dhw', 28 → 'dhw_4wk'."""
+    if window == DHW_WINDOW:
+        return 'dhw'
+    return f'dhw_{window // 7}wk' if window % 7 == 0 else f'dhw_{window}d'
+
+
+def compute_all_products(dates, sst, mmm, dc, mask, lead_in=0, windows=()):
+    """
+    Compute SST, SSTA, HS, DHW, BAA for every day of an SST stack.
+
+    `sst` must cover a contiguous daily axis; the first `lead_in` days only
+    feed the DHW window and are dropped from the returned arrays. Extra
+    accumulation `windows` (days) come from the same cumulative sum and
+    are returned as e.g. 'dhw_4wk'.
+    """
+    sst = get_sst(sst, mask)
+    hotspot = get_hotspot(sst, mmm)
+    accumulated = accumulated_heat_stress(
+        hotspot, mask, sorted(set(windows) | {DHW_WINDOW}))
+    out_dates = dates[lead_in:]
+    sst, hotspot = sst[lead_in:], hotspot[lead_in:]
+    dhw = accumulated.pop(DHW_WINDOW)[lead_in:]
+    arrays = {
+        'sst': sst,
+        'sst_anomaly': get_anomaly(sst, out_dates, dc),
+        'hotspot': hotspot,
+        'dhw': dhw,
+        'baa': get_baa(hotspot, dhw),
+    }
+    for w, values in accumulated.items():
+        arrays[window_name(w)] = values[lead_in:]
+    return out_dates, arrays
+
+
+def compute_summary(arrays, target_date):
+    """
+    GBR-wide pixel summary for one day, same row layout as
+    main.compute_summary (EE stdDev is the population std).
+    """
+    row = {'date': target_date.isoformat()}
+    for var in ['sst', 'sst_anomaly', 'hotspot', 'dhw']:
+        vals = arrays[var][np.isfinite(arrays[var])].astype(np.float64)
+        n = vals.size
+        if n > 0:
+            mean_v = float(vals.mean())
+            std_v = float(vals.std())
+            ci95 = 1.96 * (std_v / math.sqrt(n))
+            row[f'{var}_mean'] = round(mean_v, 4)
+            row[f'{var}_std'] = round(std_v, 4)
+            row[f'{var}_ci95_lower'] = round(mean_v - ci95, 4)
+            row[f'{var}_ci95_upper'] = round(mean_v + ci95, 4)
+            row[f'{var}_n_pixels'] = int(n)
+        else:
+            for suffix in ['mean', 'std', 'ci95_lower', 'ci95_upper']:
+                row[f'{var}_{suffix}'] = None
+            row[f'{var}_n_pixels'] = 0
+    return row
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# INPUTS: local .npz files or EE computePixels
+# ══════════════════════════════════════════════════════════════════════════════
+
+def daily_dates(start_date, end_date):
+    return [start_date + timedelta(days=i)
+            for i in range((end_date - start_date).days + 1)]
+
+
+def _grid():
+    a, b, c, d, e, f = EXPORT_CRS_TRANSFORM
+    return {
+        'dimensions': {'width': GRID_SHAPE[1], 'height': GRID_SHAPE[0]},
+        'affineTransform': {'scaleX': a, 'shearX': b, 'translateX': c,
+                            'shearY': d, 'scaleY': e, 'translateY': f},
+        'crsCode': EXPORT_CRS,
+    }
+
+
+def _compute_pixels(image):
+    """Fetch an ee.Image on the export grid as a structured NumPy array."""
+    import ee
+    import spans
+    with spans.span('ee.computePixels') as s:
+        arr = ee.data.computePixels({
+            'expression': image.unmask(NODATA, False),
+            'fileFormat': 'NUMPY_NDARRAY',
+            'grid': _grid(),
+        })
+        s.add(ee_round_trips=1, bytes_down=arr.nbytes)
+    return arr
+
+
+def _band(arr, name):
+    values = np.asarray(arr[name], dtype=np.float32)
+    return np.where(values == NODATA, np.nan, values)
+
+
+def fetch_oisst_stack(start_date, end_date):
+    """
+    Download OISST SST (°C) for [start_date, end_date] on the export grid.
+    Returns (dates, sst) with NaN for days OISST does not have.
+    """
+    import ee
+    dates = daily_dates(start_date, end_date)
+    index = {d.strftime('%Y%m%d'): i for i, d in enumerate(dates)}
+    sst = np.full((len(dates),) + GRID_SHAPE, np.nan, dtype=np.float32)
+
+    for i in range(0, len(dates), FETCH_CHUNK_DAYS):
+        chunk = dates[i:i + FETCH_CHUNK_DAYS]
+        t1 = ee.Date(chunk[0].isoformat())
+        t2 = ee.Date((chunk[-1] + timedelta(days=1)).isoformat())
+        coll = ee.ImageCollection(OISST_COLLECTION).select('sst').filterDate(t1, t2)
+        arr = _compute_pixels(coll.toBands().multiply(0.01))
+        for name in arr.dtype.names:
+            key = name[:8]  # band names are '{YYYYMMDD}_sst'
+            if key in index:
+                sst[index[key]] = _band(arr, name)
+        print(f'    Fetched OISST {chunk[0]} → {chunk[-1]}')
+
+    return dates, sst
+
+
+def fetch_climatology():
+    """Download MMM, 366-band daily climatology and the ocean mask."""
+    import ee
+    mmm = ee.Image(f'{ASSET_FOLDER}/mmm_climatology').rename('mmm_sst')
+    dc_image = ee.Image(f'{ASSET_FOLDER}/daily_climatology')
+    mask = ee.Image(MASK_ASSET).rename('mask')
+    arr = _compute_pixels(mmm.addBands(dc_image).addBands(mask))
+    dc = np.stack([_band(arr, f'dc_{doy:03d}') for doy in range(1, 367)])
+    return _band(arr, 'mmm_sst'), dc, np.nan_to_num(_band(arr, 'mask')) > 0
+
+
+def load_sst_npz(path):
+    with np.load(path) as f:
+        dates = [date.fromisoformat(str(d)) for d in f['dates']]
+        return dates, f['sst'].astype(np.float32)
+
+
+def load_climatology_npz(path):
+    with np.load(path) as f:
+        mmm = f['mmm'].astype(np.float32)
+        mask = f['mask'].astype(bool) if 'mask' in f else np.isfinite(mmm)
+        return mmm, f['dc'].astype(np.float32), mask
+
+
+def missing_days(dates, sst, mask):
+    """Dates whose SST has no finite value on any ocean pixel."""
+    has_data = np.isfinite(sst[:, mask]).any(axis=1)
+    return [d for d, ok in zip(dates, has_data) if not ok]
+
+
+def warn_missing_days(dates, sst, mask):
+    """
+    Warn about days without data inside the DHW window of a later day
+    that has data: they count as HotSpot 0, so that day's DHW comes out
+    too low. Trailing days (OISST not published yet) are not reported;
+    has_data() already skips them. Returns the dates reported.
+    """
+    missing = missing_days(dates, sst, mask)
+    with_data = sorted(set(dates) - set(missing))
+    gaps = [d for d in missing if with_data and d < with_data[-1]]
+    if gaps:
+        print(f'  ⚠ {len(gaps)} day(s) without SST inside the DHW window '
+              f'({gaps[0]} → {gaps[-1]}); they count as HotSpot 0, '
+              f'so DHW up to {DHW_WINDOW} days later is underestimated')
+    return gaps
+
+
+def slice_stack(dates, sst, start_date, end_date):
+    """Reindex a stack onto the contiguous daily axis [start_date, end_date]."""
+    want = daily_dates(start_date, end_date)
+    index = {d: i for i, d in enumerate(dates)}
+    out = np.full((len(want),) + sst.shape[1:], np.nan, dtype=np.float32)
+    for j, d in enumerate(want):
+        if d in index:
+            out[j] = sst[index[d]]
+    return want, out
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EE INTEROP
+# ══════════════════════════════════════════════════════════════════════════════
+
+def to_ee_image(values, name):
+    """
+    Turn a (64, 48) array into an ee.Image on the export grid, so the
+    existing COG export and reduceRegions code can consume local results.
+    """
+    import ee
+    rows, cols = GRID_SHAPE
+    res, _, x_min, _, _, y_max = EXPORT_CRS_TRANSFORM
+    filled = np.where(np.isfinite(values), np.round(values, 4), NODATA)
+
+    lonlat = ee.Image.pixelLonLat()
+    col = (lonlat.select('longitude').subtract(x_min).divide(res)
+           .floor().clamp(0, cols - 1).toInt())
+    row = (lonlat.select('latitude').multiply(-1).add(y_max).divide(res)
+           .floor().clamp(0, rows - 1).toInt())
+
+    img = ee.Image(ee.Array(filled.tolist())).arrayGet(ee.Image.cat([row, col]))
+    return img.updateMask(img.neq(NODATA)).rename(name)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BACKEND
+# ══════════════════════════════════════════════════════════════════════════════
+
+class NumpyBackend:
+    """
+    Local product computation. Call compute_range() once for the dates
+    you need, then read per-day products as arrays or as ee.Image.
+    """
+
+    name = 'numpy'
+
+    def __init__(self, mmm, dc, mask, sst_stack=None):
+        self.mmm = mmm
+        self.dc = dc
+        self.mask = mask
+        self.sst_stack = sst_stack  # optional .npz path; None → fetch from EE
+        self.dates = []
+        self.arrays = {}
+        self._index = {}
+
+    @classmethod
+    def from_ee(cls, sst_stack=None):
+        return cls(*fetch_climatology(), sst_stack=sst_stack)
+
+    @classmethod
+    def from_npz(cls, climatology_path, sst_stack=None):
+        return cls(*load_climatology_npz(climatology_path), sst_stack=sst_stack)
+
+    def load_sst(self, start_date, end_date):
+        if self.sst_stack:
+            return slice_stack(*load_sst_npz(self.sst_stack), start_date, end_date)
+        return fetch_oisst_stack(start_date, end_date)
+
+    def compute_range(self, start_date, end_date, windows=()):
+        """
+        Compute all products for [start_date, end_date] in one pass, plus
+        any extra accumulation windows (days) into self.arrays.
+        """
+        lead_in = max((DHW_WINDOW,) + tuple(windows)) - 1
+        dates, sst = self.load_sst(start_date - timedelta(days=lead_in), end_date)
+        warn_missing_days(dates, sst, self.mask)
+        out_dates, arrays = compute_all_products(
+            dates, sst, self.mmm, self.dc, self.mask,
+            lead_in=lead_in, windows=windows)
+        self._index = {}
+        self.dates, self.arrays = out_dates, arrays
+        self._index = {d: i for i, d in enumerate(out_dates)}
+        return self.dates, self.arrays
+
+    def has_data(self, target_date):
+        i = self._index.get(target_date)
+        return i is not None and bool(np.isfinite(self.arrays['sst'][i]).any())
+
+    def products(self, target_date):
+        """
+        Per-day products as (64, 48) arrays. A date outside compute_range()
+        is computed on its own and not stored, so threads reading the
+        precomputed range never see it replaced underneath them.
+        """
+        i = self._index.get(target_date)
+        if i is None:
+            lead_in = DHW_WINDOW - 1
+            dates, sst = self.load_sst(target_date - timedelta(days=lead_in), target_date)
+            warn_missing_days(dates, sst, self.mask)
+            out_dates, arrays = compute_all_products(
+                dates, sst, self.mmm, self.dc, self.mask, lead_in=lead_in)
+            if target_date not in out_dates:
+                raise ValueError(f'No SST stack covers {target_date}')
+            i = list(out_dates).index(target_date)
+            return {p: arrays[p][i] for p in PRODUCTS}
+        return {p: self.arrays[p][i] for p in PRODUCTS}
+
+    def save_range(self, path):
+        """Write every computed array plus the date axis to a .npz file."""
+        np.savez_compressed(
+            path, dates=np.array([d.isoformat() for d in self.dates]),
+            **self.arrays)
+
+    def ee_products(self, target_date):
+        """Per-day products as ee.Image, named like the EE backend's."""
+        return {p: to_ee_image(v, p) for p, v in self.products(target_date).items()}
@@ -0,0 +1,165 @@
+"""
+local_storage.py — Local-directory stand-in for the GCS bucket
+==============================================================
+LocalBucket mirrors gs://bucket/ as a directory tree (reef_daily/,
+reef_timeseries/, gbr_summary/, state/, ...) and implements the part of
+the google.cloud.storage Bucket/Blob API the pipeline uses, so
+transfer.py, postprocess.py and hotspot_state.py run unchanged at disk
+speed and without cloud access:
+
+    bucket.blob(name) → exists, reload, delete, download_as_bytes,
+                        download_as_text, download_to_filename,
+                        upload_from_string, upload_from_filename
+                        (+ name, size, generation, crc32c)
+    bucket.list_blobs(prefix=...)
+
+Select it with LOCAL_STORAGE_DIR=/path (or backfill_reefs.py
+--local-storage /path); sync_to_gcs() then publishes the tree to the
+real bucket, uploading only objects that are missing or differ.
+
+Notes:
+  * generation is the file's mtime in ns and crc32c is None, so the
+    post-processing manifest still detects rewritten files;
+  * writes go to a temp file and are renamed into place (atomic);
+  * gzip content-encoded uploads are stored decompressed.
+"""
+
+import os
+import gzip
+import base64
+import hashlib
+import mimetypes
+import shutil
+import tempfile
+from pathlib import Path
+
+
+class LocalBlob:
+    """One file under the bucket root, addressed by its object name."""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = bucket.root / name
+        self.content_encoding = None
+        self.crc32c = None
+        self.reload()
+
+    def reload(self):
+        try:
+            st = self.path.stat()
+            self.size, self.generation = st.st_size, st.st_mtime_ns
+        except FileNotFoundError:
+            self.size = self.generation = None
+
+    def exists(self):
+        return self.path.is_file()
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+    def download_as_bytes(self, **kwargs):
+        return self.path.read_bytes()
+
+    def download_as_text(self, **kwargs):
+        return self.download_as_bytes().decode()
+
+    def download_to_filename(self, filename, **kwargs):
+        shutil.copyfile(self.path, filename)
+
+    # ── Writes (temp file + rename) ──────────────────────────────────────────
+    def _write(self, fill):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                fill(f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.reload()
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        if isinstance(data, str):
+            data = data.encode()
+        if self.content_encoding == 'gzip':
+            data = gzip.decompress(data)
+        self._write(lambda f: f.write(data))
+
+    def upload_from_filename(self, filename, content_type=None, **kwargs):
+        def fill(f):
+            with open(filename, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        self._write(fill)
+
+
+class LocalBucket:
+    """Directory tree with the bucket's object layout."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.name = str(self.root)
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name):
+        blob = self.blob(name)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix=''):
+        """Blobs whose name starts with `prefix`, in name order."""
+        base = self.root / prefix.rsplit('/', 1)[0] if '/' in prefix else self.root
+        names = []
+        for dirpath, _, files in os.walk(base):
+            for fname in files:
+                if fname.startswith('.tmp-'):
+                    continue
+                name = (Path(dirpath) / fname).relative_to(self.root).as_posix()
+                if name.startswith(prefix):
+                    names.append(name)
+        return [self.blob(n) for n in sorted(names)]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PUBLISH
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return base64.b64encode(digest.digest()).decode()
+
+
+def sync_to_gcs(local_root, prefix='', manager=None):
+    """
+    Upload every file under local_root/prefix to the GCS bucket unless an
+    object with the same size and MD5 is already there. Returns the
+    number of objects uploaded.
+    """
+    import transfer
+    manager = manager or transfer.TransferManager(transfer.get_gcs_bucket())
+    local = LocalBucket(local_root)
+
+    remote = {b.name: (b.size, b.md5_hash)
+              for b in manager.bucket.list_blobs(prefix=prefix)}
+    todo = []
+    local_blobs = local.list_blobs(prefix)
+    for blob in local_blobs:
+        size, md5 = remote.get(blob.name, (None, None))
+        if size == blob.size and md5 == _md5(blob.path):
+            continue
+        content_type = mimetypes.guess_type(blob.name)[0]
+        if blob.name.endswith('.csv'):
+            content_type = 'text/csv'
+        todo.append((blob.name, str(blob.path), content_type))
+
+    print(f'Syncing {local_root} → gs://{manager.bucket.name}/{prefix}: '
+          f'{len(todo)} of {len(local_blobs)} object(s) to upload ...')
+    manager.upload_files(todo)
+    print(f'✓ Sync complete. {manager.stats}')
+    return len(todo)
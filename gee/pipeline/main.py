@@ -11,6 +11,23 @@ Cloud Function config:
     Timeout:     300 s
     Entry point: process_daily
     Trigger:     Pub/Sub topic (dhw-daily-trigger)
+
+EE round trips: availability, GBR summary and reef means for a day are
+planned into one ee.Dictionary and evaluated with a single getInfo()
+(plan_day); reef LABEL_IDs are cached per reef-asset version
+(REEF_INDEX_CACHE), so the reef results carry neither geometry nor labels.
+A day with data is one getInfo(), plus one getAsset() for the reef-asset
+version on a cold instance. With DHW_STATE=on add the checkpoint's OISST
+read (and a getAsset() for the climatology version on a cold instance);
+that read settles availability, so the plan drops its own check.
+
+Cold starts: only ee and functions_framework are imported at module load
+(every request needs both); BigQuery, NumPy/reef_results and the local
+backend are imported on first use. The EE session, asset handles and the
+NumPy climatology are memoised in clients.py, so warm instances reuse
+them. Measure with:
+
+    python main.py --measure-startup
 """
 
 import ee
@@ -21,7 +38,9 @@ import base64
 from datetime import date, timedelta
 
 import functions_framework
-from google.cloud import bigquery
+
+import clients
+import spans
 
 # ── Configuration ────────────────────────────────────────────────────────────
 GCS_BUCKET = os.environ.get('GCS_BUCKET', 'YOUR-GCS-BUCKET')
@@ -37,6 +56,18 @@ ASSET_FOLDER = f'projects/{GEE_PROJECT}/assets/coral_dhw'
 BQ_REEF_TABLE = os.environ.get(
     'BQ_REEF_TABLE', f'{GEE_PROJECT}.coral_dhw.reef_daily')
 
+# 'ee' builds products as EE expressions; 'numpy' fetches the OISST window
+# once and computes them locally (see local_compute.py)
+COMPUTE_BACKEND = os.environ.get('COMPUTE_BACKEND', 'ee')
+LOCAL_CLIMATOLOGY = os.environ.get('LOCAL_CLIMATOLOGY')  # optional .npz path
+
+# Keep the 84-day HotSpot window as a GCS checkpoint (see hotspot_state.py);
+# opt-in until it has run alongside the full EE window for a while
+DHW_STATE = os.environ.get('DHW_STATE', 'off') == 'on'
+
+# Reef LABEL_IDs (in reduceRegions order) cached per reef-asset version
+REEF_INDEX_CACHE = os.environ.get('REEF_INDEX_CACHE', '/tmp/reef_index.json')
+
 DHW_WINDOW = 84       # days (12 weeks)
 HS_THRESHOLD = 1.0    # °C — only HS ≥ 1 contributes to DHW
 
@@ -53,43 +84,93 @@ SCALE = 27830  # metres (~0.25°), used only for reduceRegion
 
 # ── Earth Engine initialization ──────────────────────────────────────────────
 def init_ee():
-    """Initialize EE. Cloud Functions use the default service account."""
-    try:
-        ee.Initialize(project=GEE_PROJECT)
-    except Exception:
-        credentials, _ = None, None
-        try:
-            import google.auth
-            credentials, _ = google.auth.default(
-                scopes=['https://www.googleapis.com/auth/earthengine'])
-        except Exception:
-            pass
-        ee.Initialize(credentials=credentials, project=GEE_PROJECT)
+    """
+    Initialize EE. Cloud Functions use the default service account; warm
+    instances reuse the session (clients.py).
+    """
+    clients.init_ee()
 
 
 # ── Load pre-computed climatology and mask from EE assets ─────────────────────
 def load_climatology():
     """
-    Load MMM, daily climatology, and binary ocean mask.
+    Load MMM, daily climatology, and binary ocean mask (built once per
+    instance; the handles are lazy EE expressions, safe to reuse).
 
     Returns (mmm, dc_image, mask):
         mmm:      ee.Image, single band 'mmm_sst'
         dc_image: ee.Image, 366 bands 'dc_001' ... 'dc_366'
         mask:     ee.Image, binary (1=ocean, 0=land/outside GBR)
     """
-    mmm = ee.Image(f'{ASSET_FOLDER}/mmm_climatology')
-    dc_image = ee.Image(f'{ASSET_FOLDER}/daily_climatology')
-    mask = ee.Image(MASK_ASSET).selfMask()  # 0→NoData, 1→valid
-    return mmm, dc_image, mask
+    def make():
+        mmm = ee.Image(f'{ASSET_FOLDER}/mmm_climatology')
+        dc_image = ee.Image(f'{ASSET_FOLDER}/daily_climatology')
+        mask = ee.Image(MASK_ASSET).selfMask()  # 0→NoData, 1→valid
+        return mmm, dc_image, mask
+    return clients.get('main.climatology', make)
+
+
+def load_bbox():
+    return clients.get('main.bbox', lambda: ee.Geometry.Rectangle(EXPORT_BOUNDS))
+
+
+def load_reefs():
+    return clients.get('main.reefs', lambda: ee.FeatureCollection(REEF_ASSET))
+
+
+# ── Reef index (LABEL_IDs in collection order) per asset version ─────────────
+def reef_asset_version():
+    """The reef asset's updateTime, looked up once per instance."""
+    def fetch():
+        try:
+            return ee.data.getAsset(REEF_ASSET).get('updateTime')
+        except Exception as e:
+            print(f'  Reef asset version unavailable ({e})')
+            return None
+    return clients.get('main.reef_version', fetch)
+
+
+def cached_reef_labels():
+    """LABEL_IDs for the current reef asset version, or None if not cached."""
+    index = clients.get('main.reef_index', dict)
+    version = reef_asset_version()
+    if version is None:
+        return None
+    if index.get('version') != version:
+        try:
+            with open(REEF_INDEX_CACHE) as f:
+                index.update(json.load(f))
+        except (OSError, ValueError):
+            return None
+    if index.get('asset') == REEF_ASSET and index.get('version') == version:
+        return index['labels']
+    return None
+
+
+def store_reef_labels(labels):
+    version = reef_asset_version()
+    if version is None:
+        return
+    index = {'asset': REEF_ASSET, 'version': version, 'labels': list(labels)}
+    clients.get('main.reef_index', dict).update(index)
+    try:
+        with open(REEF_INDEX_CACHE, 'w') as f:
+            json.dump(index, f)
+    except OSError as e:
+        print(f'  Could not write {REEF_INDEX_CACHE}: {e}')
 
 
 # ── Check if OISST data exists for a date ────────────────────────────────────
-def data_available(target_date, bbox):
+def oisst_count(target_date, bbox):
+    """Number of OISST images for target_date (server-side ee.Number)."""
     t1 = ee.Date(target_date.isoformat())
     t2 = t1.advance(1, 'day')
-    count = (ee.ImageCollection('NOAA/CDR/OISST/V2_1')
-             .filterDate(t1, t2).filterBounds(bbox).size().getInfo())
-    return count > 0
+    return (ee.ImageCollection('NOAA/CDR/OISST/V2_1')
+            .filterDate(t1, t2).filterBounds(bbox).size())
+
+
+def data_available(target_date, bbox):
+    return spans.get_info(oisst_count(target_date, bbox), 'ee.available') > 0
 
 
 # ── Get raw SST for a date ───────────────────────────────────────────────────
@@ -135,6 +216,54 @@ def get_dhw(target_date, mmm, bbox, mask):
     return thresholded.sum().divide(7).updateMask(mask).rename('dhw')
 
 
+def climatology_version():
+    """The MMM asset's updateTime, looked up once per instance."""
+    def fetch():
+        try:
+            return ee.data.getAsset(f'{ASSET_FOLDER}/mmm_climatology').get('updateTime')
+        except Exception as e:
+            print(f'  Climatology version unavailable ({e})')
+            return None
+    return clients.get('main.climatology_version', fetch)
+
+
+def get_dhw_checkpointed(target_date, mask):
+    """
+    DHW from the rolling HotSpot checkpoint: reads only the day(s) that
+    entered the window since the last run. The checkpoint is rebuilt when
+    the MMM asset changes. Raises hotspot_state.NoData if OISST has no
+    data for target_date, so a returned DHW also settles availability.
+    Returns None, logging why, if the checkpoint cannot be used.
+    """
+    import hotspot_state
+    try:
+        import local_compute
+        import transfer
+        values = hotspot_state.dhw_for_date(
+            target_date, transfer.get_bucket(), climatology_version())
+        return local_compute.to_ee_image(values, 'dhw').updateMask(mask)
+    except hotspot_state.NoData:
+        raise
+    except Exception as e:
+        print(f'  ⚠ HotSpot checkpoint not used for {target_date} '
+              f'({type(e).__name__}: {e}); falling back to the full EE window')
+        return None
+
+
+def get_products(target_date, bbox, mmm, dc_image, mask, dhw=None):
+    """
+    EE backend products for one day (masked to GBR ocean pixels). DHW is
+    summed over the full EE window unless given (e.g. from the checkpoint).
+    """
+    sst = get_sst(target_date, bbox, mask)
+    anomaly = get_anomaly(sst, target_date, dc_image)
+    hotspot = get_hotspot(sst, mmm)
+    if dhw is None:
+        dhw = get_dhw(target_date, mmm, bbox, mask)
+    return {'sst': sst, 'sst_anomaly': anomaly, 'hotspot': hotspot, 'dhw': dhw,
+            'baa': get_baa(hotspot, dhw)}
+
+
 # ── BAA = Bleaching Alert Area classification ───────────────────────────────
 # Matches R categorize_baa():
 #   0: No Stress        (HS ≤ 0)
@@ -185,29 +314,39 @@ def export_daily_cog(sst, anomaly, hotspot, dhw, baa, target_date, export_region
         formatOptions={'cloudOptimized': True}
     )
     task.start()
-    return task.status()['id']
+    return task.id
 
 
 # ── Compute GBR-wide summary stats ──────────────────────────────────────────
-def compute_summary(sst, anomaly, hotspot, dhw, target_date, bbox):
-    """
-    Compute spatial mean, stdDev, count, and 95% CI for each product.
-    95% CI = mean ± 1.96 × (stdDev / √n)
-    """
+def summary_stats(sst, anomaly, hotspot, dhw, bbox):
+    """Server-side mean / stdDev / count per product (ee.Dictionary)."""
     combined = (sst.rename('sst')
                 .addBands(anomaly.rename('sst_anomaly'))
                 .addBands(hotspot.rename('hotspot'))
                 .addBands(dhw.rename('dhw')))
 
-    stats = combined.reduceRegion(
+    return combined.reduceRegion(
         reducer=(ee.Reducer.mean()
                  .combine(ee.Reducer.stdDev(), sharedInputs=True)
                  .combine(ee.Reducer.count(), sharedInputs=True)),
         geometry=bbox,
         scale=SCALE,
         maxPixels=1e8
-    ).getInfo()
+    )
+
+
+def compute_summary(sst, anomaly, hotspot, dhw, target_date, bbox):
+    """
+    Compute spatial mean, stdDev, count, and 95% CI for each product.
+    95% CI = mean ± 1.96 × (stdDev / √n)
+    """
+    stats = spans.get_info(summary_stats(sst, anomaly, hotspot, dhw, bbox),
+                           'ee.summary')
+    return summary_row(stats, target_date)
+
 
+def summary_row(stats, target_date):
+    """BigQuery summary row from evaluated summary_stats()."""
     row = {'date': target_date.isoformat()}
 
     for var in ['sst', 'sst_anomaly', 'hotspot', 'dhw']:
@@ -231,18 +370,23 @@ def compute_summary(sst, anomaly, hotspot, dhw, target_date, bbox):
 
 
 def save_to_bigquery(row):
-    client = bigquery.Client(project=GEE_PROJECT)
-    errors = client.insert_rows_json(BQ_TABLE, [row])
+    client = clients.bigquery()
+    with spans.span('bq.insert', table='summary') as s:
+        errors = client.insert_rows_json(BQ_TABLE, [row])
+        s.add(rows_written=1)
     if errors:
         raise RuntimeError(f'BigQuery insert errors: {errors}')
 
 
 # ── Reef-level extraction ────────────────────────────────────────────────────
-def extract_reef_means(sst, anomaly, hotspot, dhw, target_date, reef_fc):
+REEF_VALUES = ['sst', 'sst_anomaly', 'hotspot', 'dhw']
+
+
+def reef_means(sst, anomaly, hotspot, dhw, reef_fc, with_labels=True):
     """
-    Compute area-weighted mean of each product for every reef polygon.
-    BAA is derived from reef-level HS and DHW means.
-    Returns list of dicts (LABEL_ID + 5 values).
+    Server-side reef means as a geometry-free FeatureCollection (same
+    order as reef_fc). LABEL_ID is left out when the caller has the
+    cached label list.
     """
     combined = (sst.rename('sst')
                 .addBands(anomaly.rename('sst_anomaly'))
@@ -253,80 +397,123 @@ def extract_reef_means(sst, anomaly, hotspot, dhw, target_date, reef_fc):
         collection=reef_fc,
         reducer=ee.Reducer.mean(),
         scale=250
-    ).getInfo()
-
-    rows = []
-    for feat in results['features']:
-        p = feat['properties']
-        s = round(p['sst'], 4) if p.get('sst') is not None else None
-        a = round(p['sst_anomaly'], 4) if p.get('sst_anomaly') is not None else None
-        h = round(p['hotspot'], 4) if p.get('hotspot') is not None else None
-        d = round(p['dhw'], 4) if p.get('dhw') is not None else None
-
-        # BAA from continuous reef-level means (matches R categorize_baa)
-        if h is not None and d is not None:
-            if h >= 1 and d >= 20:
-                b = 7
-            elif h >= 1 and d >= 16:
-                b = 6
-            elif h >= 1 and d >= 12:
-                b = 5
-            elif h >= 1 and d >= 8:
-                b = 4
-            elif h >= 1 and d >= 4:
-                b = 3
-            elif h >= 1:
-                b = 2
-            elif h > 0 and d < 4:
-                b = 1
-            else:
-                b = 0
-        else:
-            b = None
+    )
+    columns = (['LABEL_ID'] if with_labels else []) + REEF_VALUES
+    return results.select(columns, None, False)
 
-        rows.append({
-            'LABEL_ID': p.get('LABEL_ID', ''),
-            'sst': s, 'sst_anomaly': a,
-            'hotspot': h, 'dhw': d, 'baa': b
-        })
 
-    return rows
+def reef_table(features, labels=None):
+    """ReefTable from evaluated reef_means() features (+ cached labels)."""
+    from reef_results import ReefTable
+
+    table = ReefTable.from_features(features)
+    if labels is not None:
+        if len(labels) != len(table):
+            raise ValueError(f'{len(table)} reef results but {len(labels)} '
+                             'cached labels')
+        table.labels = list(labels)
+    return table
+
+
+def extract_reef_means(sst, anomaly, hotspot, dhw, target_date, reef_fc):
+    """
+    Compute area-weighted mean of each product for every reef polygon.
+    BAA is derived from reef-level HS and DHW means.
+    Returns a ReefTable (LABEL_ID + 5 columns).
+    """
+    results = spans.get_info(reef_means(sst, anomaly, hotspot, dhw, reef_fc),
+                             'ee.reduceRegions')
+    return reef_table(results['features'])
+
+
+# ── Request planner: one EE evaluation per day ──────────────────────────────
+def plan_day(products, target_date, bbox, reef_fc, labels, summary=True,
+             check=True):
+    """
+    One ee.Dictionary holding everything _run needs from EE for a day:
 
+        available  OISST image count for target_date      (check=True)
+        summary    GBR-wide reduceRegion stats             (summary=True)
+        reefs      reduceRegions means, no geometry
 
-def save_reef_to_bigquery(rows, target_date):
+    summary and reefs are wrapped in ee.Algorithms.If(available, ...),
+    so nothing is reduced server-side for a day that has no data yet.
+    """
+    sst, anomaly, hotspot, dhw = (products[p] for p in REEF_VALUES)
+    parts = {'reefs': reef_means(sst, anomaly, hotspot, dhw, reef_fc,
+                                 with_labels=labels is None)}
+    if summary:
+        parts['summary'] = summary_stats(sst, anomaly, hotspot, dhw, bbox)
+    if not check:
+        return ee.Dictionary(parts)
+    available = oisst_count(target_date, bbox)
+    return ee.Dictionary({
+        'available': available,
+        'result': ee.Algorithms.If(available.gt(0), ee.Dictionary(parts), None),
+    })
+
+
+def evaluate_plan(plan, products, target_date, bbox, reef_fc, labels,
+                  summary=True, check=True):
+    """
+    getInfo() the plan; returns {'summary': ..., 'reefs': ...}, or None
+    when check=True and target_date has no OISST data.
+
+    If the combined request fails, the parts are evaluated separately so
+    one failing part (e.g. a reef reduceRegions timeout) does not lose
+    the other; its exception is returned under 'summary_error' /
+    'reefs_error'.
+    """
+    try:
+        out = spans.get_info(plan, 'ee.evaluate')
+        if check:
+            return out['result'] if out['available'] else None
+        return out
+    except Exception as e:
+        print(f'  Combined EE request failed ({e}), evaluating parts separately')
+
+    if check and not data_available(target_date, bbox):
+        return None
+    sst, anomaly, hotspot, dhw = (products[p] for p in REEF_VALUES)
+    out = {}
+    if summary:
+        try:
+            out['summary'] = spans.get_info(
+                summary_stats(sst, anomaly, hotspot, dhw, bbox), 'ee.summary')
+        except Exception as e:
+            out['summary_error'] = e
+    try:
+        out['reefs'] = spans.get_info(
+            reef_means(sst, anomaly, hotspot, dhw, reef_fc,
+                       with_labels=labels is None), 'ee.reduceRegions')
+    except Exception as e:
+        out['reefs_error'] = e
+    return out
+
+
+def save_reef_to_bigquery(reef_table, target_date):
     """Insert reef-level rows into BigQuery reef_daily table."""
-    date_str = target_date.isoformat()
-    bq_rows = [{'date': date_str, **r} for r in rows]
-    client = bigquery.Client(project=GEE_PROJECT)
-    errors = client.insert_rows_json(BQ_REEF_TABLE, bq_rows)
+    bq_rows = reef_table.bq_rows(target_date.isoformat())
+    client = clients.bigquery()
+    with spans.span('bq.insert', table='reef') as s:
+        errors = client.insert_rows_json(BQ_REEF_TABLE, bq_rows)
+        s.add(rows_written=len(bq_rows))
     if errors:
         raise RuntimeError(f'BigQuery reef insert errors: {errors[:3]}')
 
 
-def save_reef_csv_to_gcs(rows, target_date):
+def save_reef_csv_to_gcs(reef_table, target_date):
     """
     Save reef means as compact CSV to GCS.
     Path: gs://bucket/reef_daily/{year}/{YYYYMMDD}.csv
     Columns: LABEL_ID,sst,sst_anomaly,hotspot,dhw,baa
     """
-    from google.cloud import storage
-    import csv
-    import io
+    import transfer
 
     date_str = target_date.strftime('%Y%m%d')
     blob_path = f'reef_daily/{target_date.year}/{date_str}.csv'
-
-    buf = io.StringIO()
-    writer = csv.DictWriter(buf,
-                            fieldnames=['LABEL_ID', 'sst', 'sst_anomaly',
-                                        'hotspot', 'dhw', 'baa'])
-    writer.writeheader()
-    writer.writerows(rows)
-
-    client = storage.Client(project=GEE_PROJECT)
-    bucket = client.bucket(GCS_BUCKET)
-    blob = bucket.blob(blob_path)
-    blob.upload_from_string(buf.getvalue(), content_type='text/csv')
+    with spans.span('gcs.upload'):
+        transfer.get_manager().upload(blob_path, reef_table.to_csv(), 'text/csv')
     return blob_path
 
 
@@ -361,44 +548,121 @@ def process_daily(cloud_event):
     return _run(target)
 
 
+def _compute_local(target_date):
+    """
+    NumPy backend: one computePixels fetch of the 84-day OISST window, then
+    all products and the GBR summary locally. Returns (date, products, row)
+    with products as ee.Image, or a message string if no data is available.
+    """
+    import local_compute
+
+    def fetch():
+        if LOCAL_CLIMATOLOGY:
+            return local_compute.load_climatology_npz(LOCAL_CLIMATOLOGY)
+        return local_compute.fetch_climatology()
+
+    # Climatology arrays are fetched once per instance; the backend (which
+    # holds this request's OISST window) is new every time
+    backend = local_compute.NumpyBackend(*clients.get('main.np_climatology', fetch))
+
+    prev = target_date - timedelta(days=1)
+    backend.compute_range(prev, target_date)
+    if not backend.has_data(target_date):
+        print(f'  No data for {target_date}, trying {prev}')
+        if not backend.has_data(prev):
+            msg = f'No OISST data available for {target_date} or {prev}'
+            print(f'  {msg}')
+            return msg
+        target_date = prev
+
+    row = local_compute.compute_summary(backend.products(target_date), target_date)
+    return target_date, backend.ee_products(target_date), row
+
+
 def _run(target_date):
-    """Core logic: compute products, export, save stats."""
+    """
+    Core logic: compute products, export, save stats. The whole run and
+    each stage are spans (spans.py): one JSON log line per stage on Cloud
+    Functions, with EE round trips, bytes and rows written.
+    """
+    spans.reset()  # warm instances keep spans' totals between invocations
+    with spans.span('run', date=target_date):
+        return _run_day(target_date)
+
+
+def _run_day(target_date):
     print(f'[DHW Pipeline] Processing {target_date.isoformat()}')
 
     init_ee()
 
     # Bounding box for spatial filters and exports; mask for pixel selection
-    bbox = ee.Geometry.Rectangle(EXPORT_BOUNDS)
+    bbox = load_bbox()
     export_region = bbox
-
-    # Check data availability (OISST has ~1 day latency)
-    if not data_available(target_date, bbox):
+    reef_fc = load_reefs()
+    labels = cached_reef_labels()
+
+    if COMPUTE_BACKEND == 'numpy':
+        with spans.span('compute.local'):
+            local = _compute_local(target_date)
+        if isinstance(local, str):
+            return local
+        target_date, products, row = local
+        sst, anomaly, hotspot, dhw, baa = (
+            products[p] for p in ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa'])
+        # Summary and availability are local; reef means are the only EE request
+        plan = plan_day(products, target_date, bbox, reef_fc, labels,
+                        summary=False, check=False)
+        result = evaluate_plan(plan, products, target_date, bbox, reef_fc, labels,
+                               summary=False, check=False)
+    else:
+        # Load pre-computed climatology + mask
+        mmm, dc_image, mask = load_climatology()
+
+        # Availability + GBR summary + reef means in one EE request; OISST
+        # has ~1 day latency, so the day before is planned only on a miss.
+        # With DHW_STATE the checkpoint reads the new OISST day(s) first:
+        # a DHW from it proves the day has data, so the plan skips the
+        # availability check, and a day without data costs no plan.
         prev = target_date - timedelta(days=1)
-        print(f'  No data for {target_date}, trying {prev}')
-        if data_available(prev, bbox):
-            target_date = prev
+        for candidate in (target_date, prev):
+            dhw = None
+            if DHW_STATE:
+                import hotspot_state
+                try:
+                    dhw = get_dhw_checkpointed(candidate, mask)
+                except hotspot_state.NoData:
+                    if candidate == target_date:
+                        print(f'  No data for {target_date}, trying {prev}')
+                    continue
+            check = dhw is None
+            products = get_products(candidate, bbox, mmm, dc_image, mask, dhw=dhw)
+            plan = plan_day(products, candidate, bbox, reef_fc, labels, check=check)
+            result = evaluate_plan(plan, products, candidate, bbox, reef_fc, labels,
+                                   check=check)
+            if result is not None:
+                target_date = candidate
+                break
+            if candidate == target_date:
+                print(f'  No data for {target_date}, trying {prev}')
         else:
             msg = f'No OISST data available for {target_date} or {prev}'
             print(f'  {msg}')
             return msg
 
-    # Load pre-computed climatology + mask
-    mmm, dc_image, mask = load_climatology()
-
-    # Compute products (masked to GBR ocean pixels)
-    sst = get_sst(target_date, bbox, mask)
-    anomaly = get_anomaly(sst, target_date, dc_image)
-    hotspot = get_hotspot(sst, mmm)
-    dhw = get_dhw(target_date, mmm, bbox, mask)
-    baa = get_baa(hotspot, dhw)
+        if 'summary_error' in result:
+            raise result['summary_error']
+        row = summary_row(result['summary'], target_date)
+        sst, anomaly, hotspot, dhw, baa = (
+            products[p] for p in ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa'])
 
     # Export single 5-band COG (sst, sst_anomaly, hotspot, dhw, baa)
-    task_id = export_daily_cog(sst, anomaly, hotspot, dhw, baa,
-                               target_date, export_region)
+    with spans.span('ee.export') as s:
+        task_id = export_daily_cog(sst, anomaly, hotspot, dhw, baa,
+                                   target_date, export_region)
+        s.add(ee_round_trips=1)
     print(f'  Started GEE export task: {task_id}')
 
-    # Compute and save GBR-wide summary (synchronous)
-    row = compute_summary(sst, anomaly, hotspot, dhw, target_date, bbox)
+    # Save GBR-wide summary
     print(f'  GBR summary: SST={row["sst_mean"]}°C  '
           f'Anom={row["sst_anomaly_mean"]}°C  '
           f'HS={row["hotspot_mean"]}°C  '
@@ -413,12 +677,11 @@ def _run(target_date):
 
     # ── Reef-level extraction ────────────────────────────────────────────────
     try:
-        reef_fc = ee.FeatureCollection(REEF_ASSET)
-        reef_count = reef_fc.size().getInfo()
-        print(f'  Extracting means for {reef_count} reefs ...')
-
-        reef_rows = extract_reef_means(
-            sst, anomaly, hotspot, dhw, target_date, reef_fc)
+        if 'reefs_error' in result:
+            raise result['reefs_error']
+        reef_rows = reef_table(result['reefs']['features'], labels)
+        if labels is None:
+            store_reef_labels(reef_rows.labels)
         print(f'  Extracted {len(reef_rows)} reef rows')
 
         # Save to BigQuery
@@ -441,4 +704,56 @@ def _run(target_date):
         'task': task_id,
         'summary': row,
         'reef_count': len(reef_rows)
-    })
\ No newline at end of file
+    })
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# STARTUP MEASUREMENT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def measure_startup(repeats=3):
+    """
+    Report what a cold instance pays before _run() does real work
+    (module import in a fresh interpreter, EE init, asset handles) and
+    what a warm invocation pays for the same steps.
+    """
+    import sys
+    import time
+    import subprocess
+
+    code = ('import time; t = time.perf_counter(); import main; '
+            'print(time.perf_counter() - t)')
+    imports = [float(subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()[-1])
+        for _ in range(repeats)]
+
+    def timed(fn):
+        t = time.perf_counter()
+        fn()
+        return time.perf_counter() - t
+
+    steps = [('init_ee', init_ee), ('load_climatology', load_climatology),
+             ('load_bbox', load_bbox), ('load_reefs', load_reefs)]
+    print(f'{"step":20s} {"cold (s)":>10s} {"warm (s)":>10s}')
+    print(f'{"import main":20s} {min(imports):10.3f} {"-":>10s}')
+    for name, fn in steps:
+        cold = timed(fn)
+        warm = min(timed(fn) for _ in range(repeats))
+        print(f'{name:20s} {cold:10.3f} {warm:10.6f}')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Daily DHW Cloud Function')
+    parser.add_argument('--measure-startup', action='store_true',
+                        help='Report cold/warm import and init time')
+    parser.add_argument('--date', type=str,
+                        help='Run the pipeline locally for YYYY-MM-DD')
+    args = parser.parse_args()
+    if args.measure_startup:
+        measure_startup()
+    elif args.date:
+        print(_run(date.fromisoformat(args.date)))
+    else:
+        parser.print_help()
@@ -0,0 +1,536 @@
+"""
+postprocess.py — Single-scan post-processing of reef_daily CSVs
+================================================================
+Lists gs://bucket/reef_daily/ once, downloads and parses each daily CSV
+once (pyarrow), and hands every parsed day to a set of pluggable sinks:
+
+    ReefSeriesSink   reef_timeseries/{LABEL_ID}.json   per-reef series
+    ParquetSink      reef_timeseries/{product}/{year}.parquet
+                                                       per-product Parquet
+    GbrSummarySink   gbr_summary/gbr_daily.csv         GBR-wide summary
+    CubeSink         {REEF_CUBE_DIR}/cube.npy          local memory-mapped cube
+
+A sink implements add(file_date, table) for each day in date order and
+finish(transfer) to write its output. backfill_reefs.py --build-all runs
+all three over one scan instead of reading the archive three times.
+Downloads and uploads go through transfer.TransferManager, so many
+objects are in flight at once, and daily CSVs are read through the
+on-disk blob_cache, so a repeat run only lists the bucket.
+
+Incremental mode:
+    A manifest (state/postprocess_manifest.json) records, per sink, the
+    generation and CRC32C of every reef_daily object it has consumed.
+    With incremental=True only the new or changed CSVs are downloaded,
+    and each sink rewrites just the part of its output they touch,
+    dropping the days whose CSV changed or disappeared: the reef files
+    of the reefs in those days, the Parquet years they fall in, the
+    summary rows. A sink without a manifest entry is rebuilt in full.
+    CubeSink keeps its consumed list in its own local index.json
+    (consumed()/commit()), since the cube lives on the machine that
+    built it.
+
+Usage:
+    import postprocess
+    postprocess.run([postprocess.ParquetSink(), postprocess.GbrSummarySink()])
+    postprocess.run([postprocess.ReefSeriesSink()], incremental=True)
+"""
+
+import io
+import os
+import json
+from datetime import date
+
+import numpy as np
+
+import blob_cache
+import reef_cube
+import reef_series
+import spans
+import transfer as gcs
+from reef_results import REEF_CSV_FIELDS, RunningStats
+
+PRODUCTS = REEF_CSV_FIELDS[1:]
+DAILY_PREFIX = 'reef_daily/'
+SERIES_PREFIX = 'reef_timeseries/'
+# Single-file-per-product layout, superseded by {product}/{year}.parquet
+LEGACY_PARQUET = {p: f'{SERIES_PREFIX}{p}.parquet' for p in PRODUCTS}
+MANIFEST_BLOB = 'state/postprocess_manifest.json'
+PARQUET_ROW_GROUP_DAYS = 30  # daily files per Parquet row group (bounds memory)
+CUBE_FLUSH_DAYS = 64         # days buffered between writes into the cube
+GZIP_REEF_FILES = os.environ.get('GZIP_REEF_FILES', '0') == '1'
+# json until the frontend reads reef_series.py's .bin files
+REEF_SERIES_FORMAT = os.environ.get('REEF_SERIES_FORMAT', 'json')  # json | bin
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SCAN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def list_daily_blobs(bucket):
+    """All reef_daily/{year}/{YYYYMMDD}.csv blobs in date order."""
+    blobs = sorted(bucket.list_blobs(prefix=DAILY_PREFIX), key=lambda b: b.name)
+    return [b for b in blobs if b.name.endswith('.csv')]
+
+
+def blob_date(name):
+    """reef_daily/2024/20240101.csv → date(2024, 1, 1)."""
+    fname = name.split('/')[-1].replace('.csv', '')
+    return date(int(fname[:4]), int(fname[4:6]), int(fname[6:8]))
+
+
+def parse_daily_csv(data):
+    """Parse one daily CSV (bytes) into a pyarrow Table."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    convert = pa_csv.ConvertOptions(column_types={
+        'LABEL_ID': pa.string(), **{p: pa.float64() for p in PRODUCTS}})
+    return pa_csv.read_csv(io.BytesIO(data), convert_options=convert)
+
+
+# ── Manifest ─────────────────────────────────────────────────────────────────
+def blob_fingerprint(blob):
+    """Identity of one object version: generation + CRC32C."""
+    return [str(blob.generation), blob.crc32c]
+
+
+def load_manifest(transfer, blob_path=MANIFEST_BLOB):
+    """{sink name: {blob name: fingerprint}} of consumed daily CSVs."""
+    if not transfer.bucket.blob(blob_path).exists():
+        return {}
+    return json.loads(transfer.download(blob_path))
+
+
+def save_manifest(manifest, transfer, blob_path=MANIFEST_BLOB):
+    transfer.upload(blob_path, json.dumps(manifest, separators=(',', ':')),
+                    'application/json', gzip=False)
+
+
+def plan_sink(sink, consumed, fingerprints, transfer):
+    """
+    Blob names `sink` must read. With a manifest entry the sink is asked
+    to resume from its existing output minus changed/removed days;
+    returns None when it is already up to date.
+    """
+    if consumed is None:
+        return set(fingerprints)
+    changed = {n for n, fp in fingerprints.items() if consumed.get(n) != fp}
+    dropped = {blob_date(n) for n in consumed
+               if n not in fingerprints or n in changed}
+    if not changed and not dropped:
+        return None
+    if sink.resume(transfer, dropped, {blob_date(n) for n in changed}):
+        print(f'  {sink.name}: {len(changed)} new/changed, '
+              f'{len(dropped)} replaced/removed day(s)')
+        return changed
+    print(f'  {sink.name}: cannot append in order, full rebuild')
+    return set(fingerprints)
+
+
+def run(sinks, bucket=None, incremental=False, transfer=None, cache=None):
+    """
+    Scan the daily CSVs once, feed each sink the days it needs, then let
+    each write out. Every CSV is downloaded at most once per run, and
+    not at all if it is already in the cache (default blob_cache).
+    """
+    transfer = transfer or (gcs.TransferManager(bucket) if bucket
+                            else gcs.get_manager())
+    cache = cache or blob_cache.get_cache()
+    with spans.span('postprocess', sinks=[s.name for s in sinks]):
+        _run(sinks, incremental, transfer, cache)
+    spans.print_report()
+
+
+def _run(sinks, incremental, transfer, cache):
+    print('Listing daily reef CSVs ...')
+    csv_blobs = list_daily_blobs(transfer.bucket)
+    fingerprints = {b.name: blob_fingerprint(b) for b in csv_blobs}
+    manifest = load_manifest(transfer)
+
+    plans = []  # (sink, blob names to read)
+    for sink in sinks:
+        if not incremental:
+            consumed = None
+        elif hasattr(sink, 'consumed'):
+            consumed = sink.consumed()
+        else:
+            consumed = manifest.get(sink.name)
+        names = plan_sink(sink, consumed, fingerprints, transfer)
+        if names is None:
+            print(f'  {sink.name}: up to date')
+            continue
+        plans.append((sink, names))
+
+    needed = [b for b in csv_blobs if any(b.name in n for _, n in plans)]
+    print(f'  Found {len(csv_blobs)} daily files, reading {len(needed)} → '
+          f'{", ".join(s.name for s, _ in plans) or "nothing to do"}')
+
+    for i, (blob, data) in enumerate(transfer.download_many(needed, cache)):
+        table = parse_daily_csv(data)
+        file_date = blob_date(blob.name)
+        for sink, names in plans:
+            if blob.name in names:
+                sink.add(file_date, table)
+        if (i + 1) % 500 == 0:
+            print(f'  Read {i + 1}/{len(needed)} files ...')
+
+    for sink, _ in plans:
+        sink.finish(transfer)
+        if hasattr(sink, 'commit'):
+            sink.commit(fingerprints)
+        else:
+            manifest[sink.name] = fingerprints
+            save_manifest(manifest, transfer)
+    print(f'  Transfers: {transfer.stats}')
+    if cache is not None:
+        print(f'  Cache: {cache}')
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# SINKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ReefSeriesSink:
+    """
+    One file per reef: reef_timeseries/{LABEL_ID}.json with
+    [{date, sst, sst_anomaly, hotspot, dhw, baa}, ...] (default), or
+    reef_timeseries/{LABEL_ID}.bin in the compact reef_series.py format.
+
+    On resume only the reefs present in the new days are read and
+    rewritten (every reef if an existing day was replaced or deleted). Files
+    are read and written through the 'series' blob cache, so a daily
+    refresh on the same machine downloads nothing but the new CSVs.
+    """
+    def __init__(self, gzip=GZIP_REEF_FILES, fmt=REEF_SERIES_FORMAT):
+        self.reef_data = {}  # LABEL_ID → list of daily records
+        self.gzip = gzip
+        self.fmt = fmt
+        self.ext = f'.{fmt}'
+        self.name = f'reef_files{self.ext}'  # manifest entry per format
+        self.drop = None       # ISO dates to remove; None = full build
+        self.existing = {}     # LABEL_ID → blob, when resuming
+        self.rewrite_all = False
+
+    def encode(self, records):
+        if self.fmt == 'json':
+            return (json.dumps(records, indent=None, separators=(',', ':')),
+                    'application/json')
+        return reef_series.encode_records(records), 'application/octet-stream'
+
+    def decode(self, data):
+        if self.fmt == 'json':
+            return json.loads(data)
+        return reef_series.to_records(reef_series.decode(data))
+
+    def resume(self, transfer, drop_dates, new_dates):
+        """Update the existing per-reef files in finish(), minus `drop_dates`."""
+        self.drop = {d.isoformat() for d in drop_dates}
+        self.existing = {b.name[len(SERIES_PREFIX):-len(self.ext)]: b
+                         for b in transfer.bucket.list_blobs(prefix=SERIES_PREFIX)
+                         if b.name.endswith(self.ext)}
+        # A replaced or deleted day may have held reefs the new CSVs lack
+        self.rewrite_all = bool(drop_dates)
+        return True
+
+    def add(self, file_date, table):
+        date_str = file_date.isoformat()
+        cols = {p: table[p].to_pylist() if p in table.column_names
+                else [None] * table.num_rows for p in PRODUCTS}
+        cols['baa'] = [None if v is None else int(v) for v in cols['baa']]
+        for label, *vals in zip(table['LABEL_ID'].to_pylist(),
+                                *(cols[p] for p in PRODUCTS)):
+            self.reef_data.setdefault(label, []).append(
+                {'date': date_str, **dict(zip(PRODUCTS, vals))})
+
+    def finish(self, transfer):
+        cache = blob_cache.get_cache('series')
+        if self.drop is None:
+            print(f'  {len(self.reef_data)} unique reefs')
+
+            def files():
+                for label, data in self.reef_data.items():
+                    data.sort(key=lambda r: r['date'])
+                    yield (f'{SERIES_PREFIX}{label}{self.ext}', *self.encode(data),
+                           self.gzip)
+
+            transfer.upload_many(files(), cache=cache)
+            print(f'✓ Wrote {len(self.reef_data)} reef files to {SERIES_PREFIX}')
+            return
+
+        labels = set(self.reef_data)
+        if self.rewrite_all:
+            labels |= set(self.existing)
+
+        def update(label):
+            records = self.reef_data.get(label, [])
+            blob = self.existing.get(label)
+            if blob is not None:
+                replaced = self.drop | {r['date'] for r in records}
+                records = [r for r in self.decode(transfer.download(blob, cache))
+                           if r['date'] not in replaced] + records
+            records.sort(key=lambda r: r['date'])
+            return transfer.upload(f'{SERIES_PREFIX}{label}{self.ext}',
+                                   *self.encode(records), self.gzip, cache=cache)
+
+        n = sum(1 for _ in transfer.map(update, sorted(labels)))
+        print(f'✓ Updated {n} of {len(set(self.existing) | labels)} reef files '
+              f'in {SERIES_PREFIX}')
+
+
+class ParquetSink:
+    """
+    Per-product Parquet, one file per year:
+    reef_timeseries/{product}/{year}.parquet
+    Columns: LABEL_ID (string), date (date32), value (float64; int64 for
+    baa, as pandas read it) — ordered by date, then LABEL_ID. Read a
+    product as one dataset, e.g. pyarrow.dataset.dataset('.../sst/').
+
+    Days arrive in date order, so only the current year's five
+    ParquetWriters are open, each receiving one row group per
+    `days_per_row_group` days: memory is bounded by one row group. On
+    resume only the years that gain or lose days are downloaded, merged
+    with their new days and rewritten, so a daily refresh touches one
+    year of rows per product whatever the archive length.
+
+    This layout replaces the single reef_timeseries/{product}.parquet per
+    product (sorted by LABEL_ID, then date), which had to be rewritten
+    whole for every new day. Those files are not resumed from: the first
+    run rebuilds every year, then deletes them (LEGACY_PARQUET).
+    """
+    name = 'parquet_by_year'  # manifest entry (single-file layout was 'parquet')
+
+    def __init__(self, days_per_row_group=PARQUET_ROW_GROUP_DAYS, tmp_dir='/tmp'):
+        import pyarrow as pa
+        self.pa = pa
+        self.schemas = {p: pa.schema([
+            ('LABEL_ID', pa.string()), ('date', pa.date32()),
+            ('value', pa.int64() if p == 'baa' else pa.float64())])
+            for p in PRODUCTS}
+        self.tmp_dir = tmp_dir
+        self.days_per_row_group = days_per_row_group
+        self.year = None
+        self.writers = {}
+        self.pending = {p: [] for p in PRODUCTS}
+        self.n_rows = {p: 0 for p in PRODUCTS}
+        self.n_days = 0
+        self.resumed = set()   # years whose existing files are merged
+        self.written = {}      # year → {product: local path, or None if now empty}
+        self.drop = pa.array([], pa.date32())
+
+    def _path(self, product, year):
+        return os.path.join(self.tmp_dir, f'{product}_{year}.parquet')
+
+    def resume(self, transfer, drop_dates, new_dates):
+        """Download the existing files of the years that change."""
+        existing = {b.name for b in transfer.bucket.list_blobs(prefix=SERIES_PREFIX)
+                    if b.name.endswith('.parquet')
+                    and b.name not in LEGACY_PARQUET.values()}
+        if not existing:
+            return False
+        self.drop = self.pa.array(sorted(drop_dates), self.pa.date32())
+        self.resumed = {d.year for d in set(drop_dates) | set(new_dates)}
+        for year in self.resumed:
+            for p in PRODUCTS:
+                name = f'{SERIES_PREFIX}{p}/{year}.parquet'
+                if name in existing:
+                    transfer.bucket.blob(name).download_to_filename(
+                        self._path(p, year) + '.prev')
+        return True
+
+    def add(self, file_date, table):
+        pa = self.pa
+        if file_date.year != self.year:
+            self._close_year()
+            self.year = file_date.year
+        dates = pa.array([file_date] * table.num_rows, pa.date32())
+        for p in PRODUCTS:
+            if p not in table.column_names:
+                continue
+            values = table[p].cast(self.schemas[p].field('value').type)
+            self.pending[p].append(pa.Table.from_arrays(
+                [table['LABEL_ID'], dates, values], schema=self.schemas[p]))
+            self.n_rows[p] += table.num_rows
+        self.n_days += 1
+        if self.year not in self.resumed and self.n_days % self.days_per_row_group == 0:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered days of a new year as one row group per product."""
+        import pyarrow.parquet as pq
+        for p in PRODUCTS:
+            if not self.pending[p]:
+                continue
+            if p not in self.writers:
+                self.writers[p] = pq.ParquetWriter(self._path(p, self.year),
+                                                   self.schemas[p])
+            self.writers[p].write_table(self.pa.concat_tables(self.pending[p]))
+            self.pending[p] = []
+
+    def _close_year(self):
+        if self.year is None:
+            return
+        if self.year in self.resumed:
+            self._merge_year(self.year)
+            return
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.written[self.year] = {p: self._path(p, self.year) for p in self.writers}
+        self.writers = {}
+
+    def _merge_year(self, year):
+        """Existing rows of `year` minus dropped days, plus the new days."""
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        paths = {}
+        for p in PRODUCTS:
+            parts = []
+            prev = self._path(p, year) + '.prev'
+            if os.path.exists(prev):
+                old = pq.read_table(prev)
+                os.remove(prev)
+                parts.append(old.filter(pc.invert(pc.is_in(old['date'], value_set=self.drop)))
+                             .cast(self.schemas[p]))
+            parts += self.pending[p]
+            self.pending[p] = []
+            table = self.pa.concat_tables(parts) if parts else None
+            if table is None or table.num_rows == 0:
+                paths[p] = None
+                continue
+            # Stable sort: days in order, reefs as written in each daily file
+            table = table.take(pc.sort_indices(table, [('date', 'ascending')]))
+            paths[p] = self._path(p, year)
+            per_day = table.num_rows // pc.count_distinct(table['date']).as_py()
+            pq.write_table(table, paths[p],
+                           row_group_size=per_day * self.days_per_row_group)
+        self.written[year] = paths
+        self.resumed.discard(year)
+
+    def finish(self, transfer):
+        self._close_year()
+        for year in sorted(self.resumed):  # years that only lost days
+            self._merge_year(year)
+        uploads, deletes = [], []
+        for year, paths in sorted(self.written.items()):
+            for p, path in paths.items():
+                name = f'{SERIES_PREFIX}{p}/{year}.parquet'
+                if path is None:
+                    deletes.append(name)
+                else:
+                    uploads.append((name, path, None))
+        transfer.upload_files(uploads)
+        for name in deletes + list(LEGACY_PARQUET.values()):
+            blob = transfer.bucket.blob(name)
+            if blob.exists():
+                blob.delete()
+                if name in LEGACY_PARQUET.values():
+                    print(f'  ✓ Removed single-file {name}')
+        for path in (path for _, path, _ in uploads):
+            os.remove(path)
+        for product in PRODUCTS:
+            print(f'  ✓ {product}: {self.n_rows[product]} new rows')
+        print(f'✓ Parquet: {len(self.written)} year(s) written to '
+              f'{SERIES_PREFIX}{{product}}/{{year}}.parquet')
+
+
+class GbrSummarySink:
+    """
+    GBR-wide daily summary (mean ± 95% CI across all reefs):
+    gbr_summary/gbr_daily.csv — one row per day. Days are folded into a
+    RunningStats accumulator as they arrive; resumed rows are kept as-is.
+    """
+    name = 'gbr_summary'
+
+    def __init__(self, local_path='/tmp/gbr_daily.csv'):
+        self.local_path = local_path
+        self.rows = []
+        self.stats = RunningStats(PRODUCTS)
+
+    def resume(self, transfer, drop_dates, new_dates):
+        """Start from the existing summary rows, minus `drop_dates`."""
+        import pandas as pd
+        if not transfer.bucket.blob('gbr_summary/gbr_daily.csv').exists():
+            return False
+        drop = {d.isoformat() for d in drop_dates}
+        existing = pd.read_csv(io.BytesIO(transfer.download('gbr_summary/gbr_daily.csv')),
+                               dtype={'date': str})
+        existing = existing.astype(object).where(existing.notna(), None)
+        self.rows = [r for r in existing.to_dict('records') if r['date'] not in drop]
+        return True
+
+    def add(self, file_date, table):
+        columns = {p: table[p].to_numpy(zero_copy_only=False)
+                   for p in PRODUCTS if p in table.column_names}
+        self.stats.add(file_date.isoformat(), columns)
+
+    def finish(self, transfer):
+        import pandas as pd
+        summary_df = pd.DataFrame(self.rows + self.stats.rows()).sort_values('date')
+        summary_df.to_csv(self.local_path, index=False)
+
+        transfer.upload_file('gbr_summary/gbr_daily.csv', self.local_path)
+        print(f'✓ GBR summary: {len(summary_df)} days → gbr_summary/gbr_daily.csv')
+
+
+class CubeSink:
+    """
+    Local memory-mapped (product × reef × day) cube (reef_cube.py).
+    Days are buffered and written in blocks of consecutive columns.
+    """
+    name = 'reef_cube'
+
+    def __init__(self, path=reef_cube.CUBE_DIR, flush_days=CUBE_FLUSH_DAYS):
+        self.path = path
+        self.flush_days = flush_days
+        self.cube = None
+        self.pending = []  # (date, labels, (n_products, n_reefs) values)
+
+    def consumed(self):
+        index = reef_cube.read_index(self.path)
+        return index.get('consumed') if index else None
+
+    def resume(self, transfer, drop_dates, new_dates):
+        """Reopen the cube for writing and blank the replaced days."""
+        self.cube = reef_cube.ReefCube.open(self.path, mode='r+')
+        for d in drop_dates:
+            self.cube.clear(d)
+        return True
+
+    def add(self, file_date, table):
+        n = table.num_rows
+        values = np.stack([table[p].to_numpy(zero_copy_only=False)
+                           if p in table.column_names else np.full(n, np.nan)
+                           for p in PRODUCTS]).astype(np.float32)
+        self.pending.append((file_date, table['LABEL_ID'].to_pylist(), values))
+        if len(self.pending) >= self.flush_days:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.cube is None:
+            first_date, labels, _ = self.pending[0]
+            self.cube = reef_cube.ReefCube.create(self.path, labels, first_date)
+        # One block write per run of consecutive days with the same reefs
+        run_start = 0
+        for i in range(1, len(self.pending) + 1):
+            if (i < len(self.pending)
+                    and self.pending[i][1] == self.pending[run_start][1]
+                    and (self.pending[i][0] - self.pending[i - 1][0]).days == 1):
+                continue
+            first_date, labels, _ = self.pending[run_start]
+            block = np.stack([v for _, _, v in self.pending[run_start:i]], axis=2)
+            self.cube.write(first_date, labels, block)
+            run_start = i
+        self.pending = []
+
+    def finish(self, transfer):
+        self.flush()
+        if self.cube is None:
+            return
+        self.cube.data.flush()
+        print(f'✓ Reef cube: {len(self.cube.labels)} reefs × {self.cube.n_days} days '
+              f'({self.cube.start} →) in {self.path}/')
+
+    def commit(self, fingerprints):
+        if self.cube is not None:
+            self.cube.save_index(consumed=fingerprints)
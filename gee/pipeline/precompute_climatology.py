@@ -14,11 +14,15 @@ Usage:
 Then wait for the 3 export tasks to finish in the GEE Tasks tab
 or monitor via:
     earthengine task list
+
+For the NumPy backend, local_climatology.py builds the same MM / MMM /
+DC from a local OISST stack into an .npz, without EE exports.
 """
 
 import ee
 import os
-import time
+
+from task_tracker import get_tracker
 
 # ── Config ───────────────────────────────────────────────────────────────────
 GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
@@ -122,36 +126,29 @@ def export_asset(image, name, description):
         maxPixels=1e10
     )
     task.start()
-    return task
+    return get_tracker().track(task, description)
 
 
-tasks = [
+futures = [
     export_asset(mm_image, 'mm_climatology', 'MM_Climatology_12bands'),
     export_asset(mmm_image, 'mmm_climatology', 'MMM_Climatology'),
     export_asset(dc_image, 'daily_climatology', 'Daily_Climatology_366bands'),
 ]
 
-print(f'\nStarted {len(tasks)} export tasks.')
+print(f'\nStarted {len(futures)} export tasks.')
 print(f'Monitor at: https://code.earthengine.google.com/tasks')
 print(f'Or run: earthengine task list\n')
 
-# ── Poll until complete ──────────────────────────────────────────────────────
+# ── Wait until complete (shared tracker: one task-list read per poll) ───────
 print('Waiting for exports to complete ...')
-while True:
-    statuses = [t.status()['state'] for t in tasks]
-    print(f'  Status: {statuses}')
-
-    if all(s == 'COMPLETED' for s in statuses):
-        print('\n✓ All exports completed successfully!')
-        print(f'  MM:  {ASSET_FOLDER}/mm_climatology')
-        print(f'  MMM: {ASSET_FOLDER}/mmm_climatology')
-        print(f'  DC:  {ASSET_FOLDER}/daily_climatology')
-        break
-    elif any(s == 'FAILED' for s in statuses):
-        for t in tasks:
-            s = t.status()
-            if s['state'] == 'FAILED':
-                print(f'  FAILED: {s["description"]} — {s.get("error_message", "")}')
-        break
-
-    time.sleep(30)
+statuses = get_tracker().wait(futures)
+
+if all(s['state'] == 'COMPLETED' for s in statuses):
+    print('\n✓ All exports completed successfully!')
+    print(f'  MM:  {ASSET_FOLDER}/mm_climatology')
+    print(f'  MMM: {ASSET_FOLDER}/mmm_climatology')
+    print(f'  DC:  {ASSET_FOLDER}/daily_climatology')
+else:
+    for s in statuses:
+        if s['state'] != 'COMPLETED':
+            print(f'  {s["state"]}: {s.get("description", "")} — {s.get("error_message", "")}')
@@ -0,0 +1,154 @@
+"""
+progress_store.py — Durable per-date, per-stage backfill progress (SQLite)
+=========================================================================
+Replaces backfill_reefs_progress.json, which rewrote one sorted list of
+every completed key on each checkpoint. Each (job, stage, date) is one
+row, so recording progress is a single small transaction and "which
+dates still need stage X" is one range scan of the primary key.
+
+    job     'reefs' (reef backfill) or 'rasters' (COG export)
+    stage   'exported' → 'extracted' → 'csv' → 'bq_reef' + 'bq_summary'
+            → 'bq' (once both BigQuery tables have the day)
+    status  'done' or 'failed' (with the error message)
+
+The database runs in WAL mode with a busy timeout, and every thread
+gets its own connection, so backfill workers (and separate processes)
+can record progress concurrently. An existing
+backfill_reefs_progress.json is imported once on first open.
+
+Usage:
+    store = ProgressStore()
+    store.mark('reefs', [date(2024, 1, 1)], 'csv')
+    todo = store.pending('reefs', 'bq', dates)
+    print(store.counts())
+
+    python progress_store.py [backfill_reefs_progress.sqlite]   # summary
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+PROGRESS_DB = Path(os.environ.get('BACKFILL_PROGRESS_DB',
+                                  'backfill_reefs_progress.sqlite'))
+LEGACY_PROGRESS_FILE = Path('backfill_reefs_progress.json')
+STAGES = ('exported', 'extracted', 'csv', 'bq_reef', 'bq_summary', 'bq')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS progress (
+    job     TEXT NOT NULL,
+    stage   TEXT NOT NULL,
+    date    TEXT NOT NULL,
+    status  TEXT NOT NULL,
+    message TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job, stage, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+'''
+
+
+class ProgressStore:
+    """SQLite-backed (job, stage, date) → status map."""
+
+    def __init__(self, path=PROGRESS_DB, legacy_file=LEGACY_PROGRESS_FILE):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+        if legacy_file is not None:
+            self.import_legacy(legacy_file)
+
+    def _conn(self):
+        """Per-thread connection (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ── Updates ──────────────────────────────────────────────────────────────
+    def mark(self, job, dates, stage, status='done', message=None):
+        """Record `stage` for each date in one transaction."""
+        now = time.time()
+        rows = [(job, stage, d.isoformat(), status, message, now) for d in dates]
+        with self._conn() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def fail(self, job, dates, stage, message):
+        self.mark(job, dates, stage, 'failed', str(message)[:500])
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+    def done(self, job, stage, start=None, end=None):
+        """ISO dates with `stage` done, optionally within [start, end]."""
+        query = 'SELECT date FROM progress WHERE job = ? AND stage = ? AND status = ?'
+        args = [job, stage, 'done']
+        if start is not None:
+            query += ' AND date >= ?'
+            args.append(start.isoformat())
+        if end is not None:
+            query += ' AND date <= ?'
+            args.append(end.isoformat())
+        return {row[0] for row in self._conn().execute(query, args)}
+
+    def pending(self, job, stage, dates):
+        """The dates (in order) that do not yet have `stage` done."""
+        dates = list(dates)
+        if not dates:
+            return []
+        done = self.done(job, stage, min(dates), max(dates))
+        return [d for d in dates if d.isoformat() not in done]
+
+    def status(self, job, d):
+        """{stage: (status, message)} for one date."""
+        rows = self._conn().execute(
+            'SELECT stage, status, message FROM progress WHERE job = ? AND date = ?',
+            (job, d.isoformat()))
+        return {stage: (status, message) for stage, status, message in rows}
+
+    def counts(self):
+        """{(job, stage, status): n} over the whole store."""
+        rows = self._conn().execute(
+            'SELECT job, stage, status, COUNT(*) FROM progress '
+            'GROUP BY job, stage, status ORDER BY job, stage, status')
+        return {(job, stage, status): n for job, stage, status, n in rows}
+
+    # ── Migration ────────────────────────────────────────────────────────────
+    def import_legacy(self, legacy_file):
+        """
+        One-off import of backfill_reefs_progress.json: 'raster_{date}'
+        keys → rasters/exported, bare dates → every reef stage done.
+        """
+        legacy_file = Path(legacy_file)
+        conn = self._conn()
+        key = f'imported:{legacy_file.resolve()}'
+        if not legacy_file.exists() or conn.execute(
+                'SELECT 1 FROM meta WHERE key = ?', (key,)).fetchone():
+            return
+        with open(legacy_file) as f:
+            completed = json.load(f).get('completed', [])
+        now = time.time()
+        rows = []
+        for item in completed:
+            if item.startswith('raster_'):
+                rows.append(('rasters', 'exported', item[len('raster_'):], 'done', None, now))
+            else:
+                rows += [('reefs', stage, item, 'done', None, now) for stage in STAGES]
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO progress VALUES (?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('INSERT INTO meta VALUES (?, ?)', (key, str(len(completed))))
+        print(f'  Imported {len(completed)} entries from {legacy_file}')
+
+
+if __name__ == '__main__':
+    store = ProgressStore(sys.argv[1] if len(sys.argv) > 1 else PROGRESS_DB)
+    for (job, stage, status), n in store.counts().items():
+        print(f'  {job:8s} {stage:10s} {status:7s} {n:7d}')
@@ -0,0 +1,179 @@
+"""
+reef_cube.py — Memory-mapped (product × reef × day) cube of reef means
+======================================================================
+A dense float32 array of every reef's daily values, stored as a .npy
+file so any process can np.load(..., mmap_mode='r') it and share pages:
+
+    {cube_dir}/cube.npy      float32 (n_products, n_reefs, capacity)
+    {cube_dir}/index.json    products, LABEL_IDs (row order), start date,
+                             n_days filled, consumed reef_daily objects
+
+Column c is start + c days; missing values are NaN. Each reef's series
+is contiguous, so a reef/product slice is a zero-copy view; a day's
+cross-section is a strided zero-copy view. The day axis keeps spare
+capacity and grows geometrically, so appending new days is amortised
+O(new days); new reefs or days before `start` trigger one copy.
+
+The cube is filled by postprocess.CubeSink (backfill_reefs.py
+--build-cube [--incremental]).
+
+Usage:
+    cube = ReefCube.open('reef_cube')
+    dhw = cube.series('19-001', 'dhw', date(2016, 1, 1), date(2017, 12, 31))
+    snapshot = cube.day(date(2024, 3, 1))        # (n_products, n_reefs)
+
+    python reef_cube.py reef_cube 19-001 dhw 2016-01-01 2017-12-31
+"""
+
+import os
+import sys
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+PRODUCTS = ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
+CUBE_DIR = os.environ.get('REEF_CUBE_DIR', 'reef_cube')
+MIN_GROWTH_DAYS = 366
+
+
+def read_index(path):
+    """index.json of a cube directory, or None if there is no cube."""
+    index_path = os.path.join(path, 'index.json')
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+class ReefCube:
+    """Dense reef × day arrays backed by a memory-mapped .npy file."""
+
+    def __init__(self, path, data, labels, start, n_days, products=PRODUCTS):
+        self.path = path
+        self.data = data
+        self.labels = list(labels)
+        self.rows = {label: i for i, label in enumerate(self.labels)}
+        self.start = start
+        self.n_days = n_days
+        self.products = list(products)
+
+    @classmethod
+    def open(cls, path=CUBE_DIR, mode='r'):
+        """Map an existing cube ('r' read-only, 'r+' to append)."""
+        index = read_index(path)
+        if index is None:
+            raise FileNotFoundError(f'No reef cube in {path}')
+        data = np.load(os.path.join(path, 'cube.npy'), mmap_mode=mode)
+        return cls(path, data, index['labels'], date.fromisoformat(index['start']),
+                   index['n_days'], index['products'])
+
+    @classmethod
+    def create(cls, path, labels, start, capacity=MIN_GROWTH_DAYS):
+        os.makedirs(path, exist_ok=True)
+        data = _new_array(os.path.join(path, 'cube.npy'),
+                          (len(PRODUCTS), len(labels), capacity))
+        return cls(path, data, labels, start, 0)
+
+    # ── Lookup (zero-copy views) ─────────────────────────────────────────────
+    def column(self, d):
+        return (d - self.start).days
+
+    def dates(self, start=None, end=None):
+        c0, c1 = self._span(start, end)
+        return np.datetime64(self.start, 'D') + np.arange(c0, c1)
+
+    def _span(self, start, end):
+        c0 = 0 if start is None else max(self.column(start), 0)
+        c1 = self.n_days if end is None else min(self.column(end) + 1, self.n_days)
+        return c0, max(c1, c0)
+
+    def series(self, label, product='dhw', start=None, end=None):
+        """One reef's daily values over [start, end] (inclusive)."""
+        c0, c1 = self._span(start, end)
+        return self.data[self.products.index(product), self.rows[label], c0:c1]
+
+    def day(self, d, product=None):
+        """All reefs on day d: (n_products, n_reefs), or (n_reefs,) for one product."""
+        c = self.column(d)
+        if not 0 <= c < self.n_days:
+            raise KeyError(f'{d} not in cube ({self.start} + {self.n_days} days)')
+        if product is None:
+            return self.data[:, :, c]
+        return self.data[self.products.index(product), :, c]
+
+    # ── Writing ──────────────────────────────────────────────────────────────
+    def ensure(self, labels, first, last):
+        """Make room for `labels` and days [first, last], growing if needed."""
+        new_labels = [label for label in dict.fromkeys(labels) if label not in self.rows]
+        shift = max((self.start - first).days, 0)
+        needed = max(self.column(last) + 1, self.n_days) + shift
+        capacity = self.data.shape[2]
+        if not new_labels and not shift and needed <= capacity:
+            return
+        if needed > capacity or shift:
+            capacity = max(needed, capacity + max(capacity // 2, MIN_GROWTH_DAYS))
+        self._grow(self.labels + new_labels, capacity, shift)
+
+    def _grow(self, labels, capacity, shift):
+        """Copy into a larger array: more rows, more days, or an earlier start."""
+        target = os.path.join(self.path, 'cube.npy')
+        tmp = target + '.tmp'
+        data = _new_array(tmp, (len(self.products), len(labels), capacity))
+        n_rows = len(self.labels)
+        for p in range(len(self.products)):
+            data[p, :n_rows, shift:shift + self.n_days] = self.data[p, :, :self.n_days]
+        data.flush()
+        del data
+        self.data = None
+        os.replace(tmp, target)
+        self.data = np.load(target, mmap_mode='r+')
+        self.labels = list(labels)
+        self.rows = {label: i for i, label in enumerate(self.labels)}
+        self.start -= timedelta(days=shift)
+        self.n_days += shift
+
+    def write(self, first, labels, block):
+        """Write block (n_products, len(labels), k) for days first … first+k-1."""
+        k = block.shape[2]
+        self.ensure(labels, first, first + timedelta(days=k - 1))
+        c0 = self.column(first)
+        if list(labels) == self.labels:
+            self.data[:, :, c0:c0 + k] = block
+        else:
+            rows = np.array([self.rows[label] for label in labels])
+            self.data[:, rows, c0:c0 + k] = block
+        self.n_days = max(self.n_days, c0 + k)
+
+    def clear(self, d):
+        """Blank one day (NaN for every reef and product)."""
+        c = self.column(d)
+        if 0 <= c < self.n_days:
+            self.data[:, :, c] = np.nan
+
+    def save_index(self, consumed=None):
+        """Flush the array and atomically rewrite index.json."""
+        self.data.flush()
+        index = {'products': self.products, 'labels': self.labels,
+                 'start': self.start.isoformat(), 'n_days': self.n_days,
+                 'consumed': consumed}
+        tmp = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(tmp, os.path.join(self.path, 'index.json'))
+
+
+def _new_array(path, shape):
+    data = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+    data[:] = np.nan
+    return data
+
+
+if __name__ == '__main__':
+    cube_dir, label = sys.argv[1], sys.argv[2]
+    product = sys.argv[3] if len(sys.argv) > 3 else 'dhw'
+    start = date.fromisoformat(sys.argv[4]) if len(sys.argv) > 4 else None
+    end = date.fromisoformat(sys.argv[5]) if len(sys.argv) > 5 else None
+    cube = ReefCube.open(cube_dir)
+    for d, v in zip(cube.dates(start, end), cube.series(label, product, start, end)):
+        print(f'{d},{"" if np.isnan(v) else round(float(v), 4)}')
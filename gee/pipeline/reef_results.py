@@ -0,0 +1,235 @@
+"""
+reef_results.py — Columnar reef-level results shared by main.py and backfill_reefs.py
+====================================================================================
+A ReefTable holds one day's reef means as a struct of arrays keyed by
+LABEL_ID (sst, sst_anomaly, hotspot, dhw as float64 with NaN = missing,
+baa as float with NaN = missing). Rounding and BAA binning are NumPy
+vectorized, and writers (CSV, BigQuery rows, GBR summary) read the
+columns directly instead of building one dict per reef.
+
+BAA from continuous reef-level means (matches R categorize_baa):
+    uses local_compute.get_baa, None when either HS or DHW is missing.
+
+GBR-wide summaries come from RunningStats, a mergeable (count, mean, M2)
+accumulator per date × product: days can be added one at a time and
+partial accumulators (e.g. from shards of the archive) merged exactly
+(Chan et al.), so no step needs more than one day of reef rows.
+"""
+
+import csv
+import io
+import math
+
+import numpy as np
+
+import local_compute
+
+VALUE_COLUMNS = ['sst', 'sst_anomaly', 'hotspot', 'dhw']
+REEF_CSV_FIELDS = ['LABEL_ID', 'sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
+
+
+def classify_baa(hotspot, dhw):
+    """Vectorized BAA class (0–7) per reef; NaN where HS or DHW is missing."""
+    baa = local_compute.get_baa(hotspot, dhw).astype(np.float64)
+    baa[np.isnan(dhw)] = np.nan
+    return baa
+
+
+class ReefTable:
+    """One day of reef means as columns."""
+
+    def __init__(self, labels, columns):
+        self.labels = list(labels)
+        self.columns = {var: np.round(np.asarray(columns[var], np.float64), 4)
+                        for var in VALUE_COLUMNS}
+        self.columns['baa'] = classify_baa(self.columns['hotspot'],
+                                           self.columns['dhw'])
+
+    @classmethod
+    def from_features(cls, features, suffix=''):
+        """From reduceRegions output properties (band names + suffix)."""
+        props = [f['properties'] for f in features]
+        labels = [p.get('LABEL_ID', '') for p in props]
+        columns = {var: np.array([p.get(f'{var}{suffix}') for p in props],
+                                 dtype=np.float64)
+                   for var in VALUE_COLUMNS}
+        return cls(labels, columns)
+
+    @classmethod
+    def from_csv(cls, text):
+        """From a reef_daily CSV written by to_csv() (BAA is re-derived)."""
+        rows = list(csv.DictReader(io.StringIO(text)))
+        columns = {var: np.array([float(r[var]) if r[var] else np.nan for r in rows],
+                                 dtype=np.float64)
+                   for var in VALUE_COLUMNS}
+        return cls([r['LABEL_ID'] for r in rows], columns)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, var):
+        return self.columns[var]
+
+    def first(self, var):
+        """Value of `var` for the first reef (None if empty or missing)."""
+        if not self.labels or np.isnan(self.columns[var][0]):
+            return None
+        return float(self.columns[var][0])
+
+    # ── Writers ──────────────────────────────────────────────────────────────
+    def _python_columns(self):
+        """Columns as Python lists with None for NaN and int BAA."""
+        out = {'LABEL_ID': self.labels}
+        for var in VALUE_COLUMNS:
+            out[var] = [None if v != v else v for v in self.columns[var].tolist()]
+        out['baa'] = [None if v != v else int(v) for v in self.columns['baa'].tolist()]
+        return out
+
+    def to_rows(self):
+        """List of dicts (LABEL_ID + 5 values), the pre-columnar format."""
+        cols = self._python_columns()
+        return [dict(zip(REEF_CSV_FIELDS, vals))
+                for vals in zip(*(cols[f] for f in REEF_CSV_FIELDS))]
+
+    def bq_rows(self, date_str):
+        """BigQuery rows for insert_rows_json."""
+        cols = self._python_columns()
+        return [{'date': date_str, **dict(zip(REEF_CSV_FIELDS, vals))}
+                for vals in zip(*(cols[f] for f in REEF_CSV_FIELDS))]
+
+    def to_csv(self):
+        """CSV text: LABEL_ID,sst,sst_anomaly,hotspot,dhw,baa."""
+        cols = self._python_columns()
+        text = [[('' if v is None else str(v)) for v in cols[f]]
+                for f in REEF_CSV_FIELDS[1:]]
+        buf = io.StringIO()
+        buf.write(','.join(REEF_CSV_FIELDS) + '\r\n')
+        for label, *vals in zip(self.labels, *text):
+            buf.write(_csv_field(label) + ',' + ','.join(vals) + '\r\n')
+        return buf.getvalue()
+
+    def summary(self, target_date, products=None):
+        """GBR-wide mean ± 95% CI across reefs (sample std), per product."""
+        return summarise(self.columns, target_date.isoformat(),
+                         products or REEF_CSV_FIELDS[1:])
+
+
+def summarise(columns, date_str, products):
+    """
+    GBR-wide summary row from reef-level columns: mean, sample std,
+    95% CI = mean ± 1.96 × std / √n and n_reefs per product (NaN skipped).
+    """
+    stats = RunningStats(products)
+    stats.add(date_str, columns)
+    return stats.row(date_str)
+
+
+class RunningStats:
+    """
+    Per date × product count / mean / M2 (sum of squared deviations),
+    updated with Welford/Chan combination so accumulators built over
+    different reefs or days can be merged without revisiting the data.
+    """
+
+    def __init__(self, products):
+        self.products = list(products)
+        self.dates = []      # ISO date strings, in insertion order
+        self._index = {}
+        shape = (0, len(self.products))
+        self.count = np.zeros(shape, np.int64)
+        self.mean = np.zeros(shape, np.float64)
+        self.m2 = np.zeros(shape, np.float64)
+        self.seen = np.zeros(shape, bool)  # product present on that date
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _rows(self, date_strs):
+        """Row indices for date_strs, adding (and growing storage for) new dates."""
+        for d in date_strs:
+            if d not in self._index:
+                self._index[d] = len(self.dates)
+                self.dates.append(d)
+        if len(self.dates) > len(self.count):
+            capacity = max(len(self.dates), 2 * len(self.count), 64)
+            for name in ('count', 'mean', 'm2', 'seen'):
+                old = getattr(self, name)
+                new = np.zeros((capacity, len(self.products)), old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        return np.array([self._index[d] for d in date_strs], np.intp)
+
+    def _combine(self, rows, n_b, mean_b, m2_b, seen_b):
+        n_a, mean_a = self.count[rows], self.mean[rows]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        frac = np.divide(n_b, n, out=np.zeros(n.shape), where=n > 0)
+        self.mean[rows] = mean_a + delta * frac
+        self.m2[rows] += m2_b + delta * delta * n_a * frac
+        self.count[rows] = n
+        self.seen[rows] |= seen_b
+
+    def add(self, date_str, columns):
+        """Fold one batch of reef values ({product: array}) into date_str."""
+        present = np.array([p in columns for p in self.products])
+        n_b = np.zeros(len(self.products), np.int64)
+        mean_b = np.zeros(len(self.products))
+        m2_b = np.zeros(len(self.products))
+        for j, var in enumerate(self.products):
+            if var not in columns:
+                continue
+            v = np.asarray(columns[var], np.float64)
+            v = v[np.isfinite(v)]
+            if v.size:
+                # Same reductions as values.mean() / values.std(ddof=1)
+                n_b[j], mean_b[j] = v.size, v.mean()
+                dev = v - mean_b[j]
+                m2_b[j] = (dev * dev).sum()
+        rows = self._rows([date_str])
+        self._combine(rows, n_b[None], mean_b[None], m2_b[None], present[None])
+        return self
+
+    def merge(self, other):
+        """Fold another accumulator (same products) into this one."""
+        if other.products != self.products:
+            raise ValueError(f'Cannot merge {other.products} into {self.products}')
+        k = len(other.dates)
+        rows = self._rows(other.dates)
+        self._combine(rows, other.count[:k], other.mean[:k], other.m2[:k],
+                      other.seen[:k])
+        return self
+
+    def row(self, date_str):
+        """Summary row (same fields as summarise) for one date."""
+        i = self._index[date_str]
+        row = {'date': date_str}
+        for j, var in enumerate(self.products):
+            if not self.seen[i, j]:
+                continue
+            n = int(self.count[i, j])
+            if n > 0:
+                mean_v = float(self.mean[i, j])
+                std_v = math.sqrt(self.m2[i, j] / (n - 1)) if n > 1 else 0
+                ci95 = 1.96 * (std_v / math.sqrt(n))
+                row[f'{var}_mean'] = round(mean_v, 4)
+                row[f'{var}_std'] = round(std_v, 4)
+                row[f'{var}_ci95_lower'] = round(mean_v - ci95, 4)
+                row[f'{var}_ci95_upper'] = round(mean_v + ci95, 4)
+                row[f'{var}_n_reefs'] = n
+            else:
+                for s in ['mean', 'std', 'ci95_lower', 'ci95_upper']:
+                    row[f'{var}_{s}'] = None
+                row[f'{var}_n_reefs'] = 0
+        return row
+
+    def rows(self):
+        """Summary rows for every date, in date order."""
+        return [self.row(d) for d in sorted(self.dates)]
+
+
+def _csv_field(value):
+    """Quote a CSV field the way csv.writer does (minimal quoting)."""
+    value = str(value)
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
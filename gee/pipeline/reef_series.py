@@ -0,0 +1,201 @@
+"""
+reef_series.py — Compact binary per-reef time series (.bin)
+===========================================================
+reef_timeseries/{LABEL_ID}.json repeats six key names and an ISO date
+for every day (~90 bytes/day). This format stores one start date, a
+fixed daily stride and one typed column per product (~9 bytes/day).
+Every array starts on a 4-byte boundary, so a browser can wrap it
+directly in an Int16Array / Float32Array / Uint8Array.
+
+Layout (little-endian):
+
+    header   16 bytes   magic 'RTS1', version u8, n_columns u8,
+                        stride_days u16, start i32 (days since
+                        1970-01-01), n_days u32
+    columns  12 bytes   per column: dtype u8, 3 pad bytes,
+                        divisor f32, offset f32
+    data                per column, in PRODUCTS order: n_days values,
+                        each column padded to 4 bytes
+
+    dtype 1 = int16, value = offset + q / divisor, missing = -32768
+    dtype 0 = float32, missing = NaN (used when a column spans more
+              than the int16 range at the coarsest divisor)
+    dtype 2 = uint8 (BAA 0–7), missing = 255
+
+Continuous products are stored as int16 around an offset, the column's
+midpoint rounded to a whole number, at the finest divisor in DIVISORS
+that fits: 4 decimals (the daily CSVs' precision) while every value is
+within ±3.2767 of the offset, 3 decimals within ±32.767, 2 within
+±327.67. A multi-year SST or DHW column spans more than 6.5, so it keeps
+3 decimals; SSTA and HotSpot usually keep 4. Offset and divisor are
+exact in f32, so decoding and re-encoding at the same divisor is
+lossless; a column only loses a decimal, once, when new days widen its
+range past the current divisor.
+
+Every day between the first and last is a record: to_records() returns
+days with no values as null records, as the JSON layout has them.
+
+Usage:
+    data = encode_records(records)          # [{date, sst, ..., baa}, ...]
+    series = decode(data)                   # {'dates': ..., 'sst': ..., ...}
+    records = to_records(series)            # back to the JSON layout
+
+    python reef_series.py 19-001.bin        # print a summary
+"""
+
+import sys
+import struct
+from datetime import date
+
+import numpy as np
+
+MAGIC = b'RTS1'
+VERSION = 1
+PRODUCTS = ['sst', 'sst_anomaly', 'hotspot', 'dhw', 'baa']
+DIVISORS = (10000, 1000, 100)  # 4, 3 or 2 decimals, finest that fits int16
+
+FLOAT32, INT16, UINT8 = 0, 1, 2
+INT16_MISSING = -32768
+UINT8_MISSING = 255
+EPOCH = date(1970, 1, 1)
+
+_HEADER = struct.Struct('<4sBBHiI')
+_COLUMN = struct.Struct('<B3xff')
+
+
+def _pad4(n):
+    return -n % 4
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ENCODE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _quantise(values, missing):
+    """
+    int16 codes, divisor and offset for one column at the finest divisor
+    that fits, or (None, None, None) if none does.
+    """
+    finite = values[~missing]
+    offset = (float(np.round((finite.min() + finite.max()) / 2))
+              if finite.size else 0.0)
+    filled = np.where(missing, offset, values)
+    for divisor in DIVISORS:
+        # Round v, not v − offset, so a value lands on the same code
+        # whatever offset this build picked (ties included)
+        q = np.round(filled * divisor) - offset * divisor
+        if np.abs(q).max(initial=0) < -INT16_MISSING:
+            return np.where(missing, INT16_MISSING, q).astype('<i2'), divisor, offset
+    return None, None, None
+
+
+def encode(start, columns, stride=1):
+    """
+    Encode daily columns (equal-length sequences, None/NaN = missing)
+    starting at `start` (date) with `stride` days between values.
+    """
+    n_days = len(columns['sst'])
+    descriptors, blocks = [], []
+    for var in PRODUCTS:
+        values = np.array([np.nan if v is None else v for v in columns[var]],
+                          dtype=np.float64)
+        missing = np.isnan(values)
+        if var == 'baa':
+            q = np.where(missing, UINT8_MISSING, values).astype(np.uint8)
+            descriptors.append(_COLUMN.pack(UINT8, 1.0, 0.0))
+        else:
+            q, divisor, offset = _quantise(values, missing)
+            if q is not None:
+                descriptors.append(_COLUMN.pack(INT16, divisor, offset))
+            else:
+                q = values.astype('<f4')
+                descriptors.append(_COLUMN.pack(FLOAT32, 1.0, 0.0))
+        raw = q.tobytes()
+        blocks.append(raw + b'\0' * _pad4(len(raw)))
+
+    header = _HEADER.pack(MAGIC, VERSION, len(PRODUCTS), stride,
+                          (start - EPOCH).days, n_days)
+    return header + b''.join(descriptors) + b''.join(blocks)
+
+
+def encode_records(records):
+    """
+    Encode JSON-layout records ([{date, sst, ..., baa}, ...], any order).
+    Days absent from the records are stored as missing.
+    """
+    if not records:
+        return encode(EPOCH, {var: [] for var in PRODUCTS})
+    by_date = {r['date']: r for r in records}
+    start = date.fromisoformat(min(by_date))
+    n_days = (date.fromisoformat(max(by_date)) - start).days + 1
+    columns = {var: [None] * n_days for var in PRODUCTS}
+    for d, r in by_date.items():
+        i = (date.fromisoformat(d) - start).days
+        for var in PRODUCTS:
+            columns[var][i] = r.get(var)
+    return encode(start, columns)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DECODE
+# ══════════════════════════════════════════════════════════════════════════════
+
+def decode(data):
+    """
+    Decode to {'dates': datetime64[D] array, product: float64 array}
+    with NaN for missing values (BAA included).
+    """
+    magic, version, n_cols, stride, start, n_days = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f'Not a reef series file (magic {magic!r})')
+    if version != VERSION:
+        raise ValueError(f'Unsupported reef series version {version}')
+
+    pos = _HEADER.size + n_cols * _COLUMN.size
+    series = {'dates': (np.datetime64(EPOCH, 'D') + start
+                        + np.arange(n_days, dtype=np.int64) * stride)}
+    for i, var in enumerate(PRODUCTS[:n_cols]):
+        dtype, divisor, offset = _COLUMN.unpack_from(data, _HEADER.size + i * _COLUMN.size)
+        if dtype == INT16:
+            q = np.frombuffer(data, '<i2', n_days, pos)
+            values = np.where(q == INT16_MISSING, np.nan,
+                              offset + q.astype(np.float64) / divisor)
+            size = 2 * n_days
+        elif dtype == UINT8:
+            q = np.frombuffer(data, np.uint8, n_days, pos)
+            values = np.where(q == UINT8_MISSING, np.nan, q.astype(np.float64))
+            size = n_days
+        else:
+            values = np.frombuffer(data, '<f4', n_days, pos).astype(np.float64)
+            size = 4 * n_days
+        series[var] = values
+        pos += size + _pad4(size)
+    return series
+
+
+def to_records(series, decimals=4):
+    """Decoded series → JSON-layout records (None for missing, int BAA)."""
+    cols = {}
+    for var in PRODUCTS:
+        values = series[var]
+        if var == 'baa':
+            cols[var] = [None if v != v else int(v) for v in values.tolist()]
+        else:
+            cols[var] = [None if v != v else v
+                         for v in np.round(values, decimals).tolist()]
+    return [{'date': str(d), **{var: cols[var][i] for var in PRODUCTS}}
+            for i, d in enumerate(series['dates'])]
+
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'rb') as f:
+        series = decode(f.read())
+    dates = series['dates']
+    print(f'{len(dates)} days'
+          + (f', {dates[0]} → {dates[-1]}' if len(dates) else ''))
+    for var in PRODUCTS:
+        values = series[var]
+        n = int(np.isfinite(values).sum())
+        if n:
+            print(f'  {var:12s} n={n:6d}  min={np.nanmin(values):8.3f}  '
+                  f'max={np.nanmax(values):8.3f}')
@@ -0,0 +1,168 @@
+"""
+reef_weights.py — Sparse reef × pixel coverage weights for exact zonal means
+============================================================================
+reduceRegions at scale=250 re-samples every reef polygon at ~100×
+oversampling each day, only to arrive at a fixed weighted average of a
+few 0.25° cells. This module builds that weighting once, exactly:
+
+    W[r, p] = fraction of grid cell p covered by reef polygon r
+
+(the coverage fraction used by exactextractr::exact_extract), stored as
+a sparse CSR matrix of shape (n_reefs, 64 × 48) and cached on disk,
+keyed by the reef asset version (or the GeoJSON file hash).
+
+Reef means for any number of dates are then two sparse × dense products,
+skipping masked (NaN) pixels like reduceRegions does:
+
+    mean = W @ (v · valid) / W @ valid
+
+Usage:
+    python reef_weights.py                       # build from the EE asset
+    python reef_weights.py gbr_reefs.geojson     # build from a local file
+
+    weights = load_or_build()
+    means = weights.means(arrays['dhw'])          # (n_reefs, n_days)
+
+Prerequisites:
+    pip install numpy scipy shapely earthengine-api
+"""
+
+import os
+import sys
+import json
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from local_compute import EXPORT_CRS_TRANSFORM, GRID_SHAPE
+
+GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
+REEF_ASSET = f'projects/{GEE_PROJECT}/assets/coral_dhw/gbr_reefs'
+WEIGHTS_DIR = Path(os.environ.get('REEF_WEIGHTS_DIR', '.reef_weights'))
+
+
+class ReefWeights:
+    """Sparse (n_reefs × n_pixels) coverage-fraction matrix plus reef labels."""
+
+    def __init__(self, labels, matrix, key):
+        self.labels = list(labels)
+        self.matrix = matrix.tocsr()
+        self.key = key
+
+    @classmethod
+    def build(cls, features, key):
+        """Exact polygon/cell coverage fractions for GeoJSON-like features."""
+        import shapely
+        from shapely.geometry import shape
+        from scipy import sparse
+
+        rows_n, cols_n = GRID_SHAPE
+        res, _, x_min, _, _, y_max = EXPORT_CRS_TRANSFORM
+
+        labels, data, indices, indptr = [], [], [], [0]
+        for feat in features:
+            labels.append((feat.get('properties') or {}).get('LABEL_ID', ''))
+            geom = shape(feat['geometry']) if feat.get('geometry') else None
+            if geom is not None and not geom.is_empty:
+                minx, miny, maxx, maxy = geom.bounds
+                c0 = max(int(np.floor((minx - x_min) / res)), 0)
+                c1 = min(int(np.ceil((maxx - x_min) / res)), cols_n)
+                r0 = max(int(np.floor((y_max - maxy) / res)), 0)
+                r1 = min(int(np.ceil((y_max - miny) / res)), rows_n)
+                rr, cc = np.meshgrid(np.arange(r0, r1), np.arange(c0, c1),
+                                     indexing='ij')
+                rr, cc = rr.ravel(), cc.ravel()
+                cells = shapely.box(x_min + cc * res, y_max - (rr + 1) * res,
+                                    x_min + (cc + 1) * res, y_max - rr * res)
+                cover = shapely.area(shapely.intersection(geom, cells)) / res ** 2
+                keep = cover > 0
+                data.extend(cover[keep])
+                indices.extend(rr[keep] * cols_n + cc[keep])
+            indptr.append(len(data))
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, np.float64), np.asarray(indices, np.int32),
+             np.asarray(indptr, np.int64)),
+            shape=(len(labels), rows_n * cols_n))
+        return cls(labels, matrix, key)
+
+    # ── Application ──────────────────────────────────────────────────────────
+    def means(self, values):
+        """
+        Coverage-weighted reef means of (n_days, 64, 48) or (64, 48) values.
+        Returns (n_reefs, n_days) or (n_reefs,), NaN where a reef has no
+        valid pixels.
+        """
+        single = values.ndim == 2
+        flat = values.reshape((1 if single else values.shape[0], -1)).T
+        valid = np.isfinite(flat)
+        num = self.matrix @ np.where(valid, flat, 0).astype(np.float64)
+        den = self.matrix @ valid.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = np.where(den > 0, num / den, np.nan)
+        return out[:, 0] if single else out
+
+    # ── Disk cache ───────────────────────────────────────────────────────────
+    def save(self, path):
+        m = self.matrix
+        np.savez_compressed(path, labels=np.array(self.labels), key=self.key,
+                            data=m.data, indices=m.indices, indptr=m.indptr,
+                            shape=np.array(m.shape))
+
+    @classmethod
+    def load(cls, path):
+        from scipy import sparse
+        with np.load(path) as f:
+            matrix = sparse.csr_matrix(
+                (f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            return cls([str(x) for x in f['labels']], matrix, str(f['key']))
+
+
+def _cache_key(source):
+    return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+def asset_version_key(asset_id=REEF_ASSET):
+    """Cache key from the reef asset's id and last update time."""
+    import ee
+    info = ee.data.getAsset(asset_id)
+    return _cache_key(f'{asset_id}@{info.get("updateTime", "")}')
+
+
+def file_version_key(path):
+    with open(path, 'rb') as f:
+        return _cache_key(hashlib.sha1(f.read()).hexdigest())
+
+
+def load_or_build(geojson=None, asset_id=REEF_ASSET, cache_dir=WEIGHTS_DIR):
+    """
+    Cached weights for the current reef polygons; built on first use.
+    Source is a local GeoJSON if given, otherwise the EE reef asset.
+    """
+    key = file_version_key(geojson) if geojson else asset_version_key(asset_id)
+    path = Path(cache_dir) / f'reef_weights_{key}.npz'
+    if path.exists():
+        return ReefWeights.load(path)
+
+    print(f'  Building reef coverage weights ({"GeoJSON" if geojson else "EE asset"}) ...')
+    if geojson:
+        with open(geojson) as f:
+            features = json.load(f)['features']
+    else:
+        import ee
+        features = ee.FeatureCollection(asset_id).getInfo()['features']
+
+    weights = ReefWeights.build(features, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    weights.save(path)
+    print(f'  ✓ {len(weights.labels)} reefs, {weights.matrix.nnz} reef/cell pairs → {path}')
+    return weights
+
+
+if __name__ == '__main__':
+    geojson_path = sys.argv[1] if len(sys.argv) > 1 else None
+    if geojson_path is None:
+        import clients
+        clients.init_ee()
+    load_or_build(geojson_path)
@@ -0,0 +1,217 @@
+"""
+spans.py — Per-stage timers, round-trip counters and structured logs
+====================================================================
+A span times one stage of the pipeline (EE evaluation, reef
+extraction, GCS upload, BigQuery insert, ...) and carries counters:
+
+    ee_round_trips   synchronous EE requests (getInfo)
+    bytes_down       bytes received (EE results, GCS downloads)
+    bytes_up         bytes sent (GCS uploads, BigQuery loads)
+    rows_written     BigQuery rows
+
+Spans nest per thread; a finished span adds its counters to its parent,
+so a 'day' span reports everything its stages did. Work handed to a
+thread pool joins the submitting thread's span with within(parent).
+Every finished span is recorded process-wide, and report() aggregates
+count / total / p50 / p95 per stage over the last MAX_SAMPLES spans of
+each stage. A warm Cloud Function instance keeps the module between
+invocations, so main._run calls reset() at the start of each one.
+
+With STRUCTURED_LOGS=1 (default when running as a Cloud Function, i.e.
+K_SERVICE is set) each finished span is also printed as one JSON line
+that Cloud Logging parses into jsonPayload:
+
+    {"severity": "INFO", "message": "span extract", "stage": "extract",
+     "duration_ms": 8123.4, "ee_round_trips": 1, "bytes_down": 912345,
+     "date": "2024-01-08"}
+
+Usage:
+    import spans
+    with spans.span('bq.insert', date=d) as s:
+        client.insert_rows_json(table, rows)
+        s.add(rows_written=len(rows))
+    result = spans.get_info(ee_object)          # timed + counted getInfo()
+    spans.print_report()
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import defaultdict, deque
+
+STRUCTURED_LOGS = os.environ.get(
+    'STRUCTURED_LOGS', '1' if os.environ.get('K_SERVICE') else '0') == '1'
+
+_local = threading.local()
+_lock = threading.Lock()
+MAX_SAMPLES = 10000  # durations kept per stage for the percentiles
+
+_durations = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))  # stage → seconds
+_counters = defaultdict(lambda: defaultdict(int))  # stage → counter → total
+
+
+class Span:
+    """One timed stage; use through span()."""
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()  # pool workers may add concurrently
+        self.started = None
+        self.duration = None
+        self.error = None
+
+    def add(self, **counters):
+        """Add to this span's counters (e.g. rows_written=500)."""
+        with self._lock:
+            for name, n in counters.items():
+                self.counters[name] += n
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        _stack().pop()
+        if exc is not None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        if self.parent is not None:
+            self.parent.add(**self.counters)
+        with _lock:
+            _durations[self.stage].append(self.duration)
+            for name, n in self.counters.items():
+                _counters[self.stage][name] += n
+        if STRUCTURED_LOGS:
+            log(f'span {self.stage}', severity='ERROR' if self.error else 'INFO',
+                **self.record())
+        return False
+
+    def record(self):
+        out = {'stage': self.stage, 'duration_ms': round(self.duration * 1000, 1),
+               **self.counters, **self.fields}
+        if self.error:
+            out['error'] = self.error
+        return out
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def span(stage, **fields):
+    """Context manager timing `stage`; extra fields go into its log line."""
+    return Span(stage, {k: _jsonable(v) for k, v in fields.items()})
+
+
+def current():
+    """The innermost open span on this thread, or None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextlib.contextmanager
+def within(parent):
+    """
+    Run a block on another thread (e.g. a pool worker) as part of
+    `parent`, the submitting thread's current(): add() and finished
+    spans count towards it. No-op for parent=None.
+    """
+    if parent is None:
+        yield
+        return
+    stack = _stack()
+    stack.append(parent)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def add(**counters):
+    """Add counters to the current span (no-op outside a span)."""
+    s = current()
+    if s is not None:
+        s.add(**counters)
+
+
+def get_info(ee_object, stage='ee.getInfo'):
+    """ee_object.getInfo() as a span counting one round trip + result bytes."""
+    with span(stage) as s:
+        result = ee_object.getInfo()
+        s.add(ee_round_trips=1,
+              bytes_down=len(json.dumps(result, separators=(',', ':'))))
+    return result
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool, dict, list)) or value is None:
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def log(message, severity='INFO', **fields):
+    """One structured log line (Cloud Logging jsonPayload)."""
+    print(json.dumps({'severity': severity, 'message': message,
+                      **{k: _jsonable(v) for k, v in fields.items()}}),
+          flush=True)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REPORT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _percentile(values, q):
+    """Linear-interpolated percentile of sorted values (numpy's default)."""
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def report():
+    """{stage: {n, total_s, p50_s, p95_s, <counter totals>}} for this process."""
+    with _lock:
+        stages = {stage: list(d) for stage, d in _durations.items()}
+        counters = {stage: dict(c) for stage, c in _counters.items()}
+    out = {}
+    for stage, durations in stages.items():
+        d = sorted(durations)
+        out[stage] = {'n': len(d), 'total_s': sum(d),
+                      'p50_s': _percentile(d, 50), 'p95_s': _percentile(d, 95),
+                      **counters.get(stage, {})}
+    return out
+
+
+def print_report(title='Stage timings'):
+    """Table of report() (and one JSON line when STRUCTURED_LOGS is on)."""
+    stats = report()
+    if not stats:
+        return
+    print(f'\n{title}:')
+    print(f'  {"stage":22s} {"n":>6s} {"total s":>9s} {"p50 s":>8s} {"p95 s":>8s}  counters')
+    for stage, s in sorted(stats.items(), key=lambda kv: -kv[1]['total_s']):
+        extra = '  '.join(f'{k}={v}' for k, v in s.items()
+                          if k not in ('n', 'total_s', 'p50_s', 'p95_s'))
+        print(f'  {stage:22s} {s["n"]:6d} {s["total_s"]:9.2f} '
+              f'{s["p50_s"]:8.3f} {s["p95_s"]:8.3f}  {extra}')
+    if STRUCTURED_LOGS:
+        log('stage report', stages=stats)
+
+
+def reset():
+    """Forget every recorded span (e.g. at the start of an invocation)."""
+    with _lock:
+        _durations.clear()
+        _counters.clear()
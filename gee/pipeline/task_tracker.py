@@ -0,0 +1,178 @@
+"""
+task_tracker.py — Shared tracker for asynchronous Earth Engine tasks
+====================================================================
+One component for every script that waits on EE work (COG exports,
+asset exports, table ingestions):
+
+  * one ee.data.getTaskList() call refreshes the state of every task at
+    once, instead of one status() call per task;
+  * task states are cached locally, and the full list is only re-read
+    when the cache is older than the current poll interval;
+  * the poll interval backs off (×1.5 up to MAX_INTERVAL) while nothing
+    changes and drops back to MIN_INTERVAL as soon as something does;
+  * track() returns a concurrent.futures.Future that resolves with the
+    final status dict, so callers can add_done_callback() or wait();
+  * a tracked task that never appears in the task list resolves as
+    'UNKNOWN' after MISSING_TIMEOUT, so wait() cannot hang on it.
+
+Usage:
+    tracker = get_tracker()
+    future = tracker.track(task)                  # ee.batch.Task or task id
+    future.add_done_callback(lambda f: print(f.result()['state']))
+    tracker.wait_for_slots(MAX_QUEUED_TASKS)      # returns once a slot frees
+    tracker.wait([future])
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+
+import ee
+
+MIN_INTERVAL = 2     # seconds
+MAX_INTERVAL = 60
+BACKOFF = 1.5
+MISSING_TIMEOUT = 600  # seconds a tracked task may be absent from the list
+
+ACTIVE_STATES = ('READY', 'RUNNING')
+DONE_STATES = ('COMPLETED', 'FAILED', 'CANCELLED')
+UNKNOWN = 'UNKNOWN'    # tracked, not (yet) seen in getTaskList()
+
+
+class TaskTracker:
+    """Batched, cached, backing-off poller for EE tasks."""
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                 missing_timeout=MISSING_TIMEOUT):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.missing_timeout = missing_timeout
+        self.interval = min_interval
+        self.states = {}        # task id → last status dict
+        self._futures = {}      # task id → Future
+        self._tracked = {}      # task id → time track() was called
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    # ── Registration ─────────────────────────────────────────────────────────
+    def track(self, task, description=None):
+        """Start tracking a task (ee.batch.Task or id); returns its Future."""
+        task_id = task if isinstance(task, str) else task.id
+        with self._lock:
+            if task_id not in self._futures:
+                future = Future()
+                future.task_id = task_id
+                self._futures[task_id] = future
+                self._tracked[task_id] = time.time()
+                self.states.setdefault(task_id, {
+                    'id': task_id, 'state': UNKNOWN,
+                    'description': description or task_id})
+            return self._futures[task_id]
+
+    # ── Polling ──────────────────────────────────────────────────────────────
+    def refresh(self, force=False):
+        """Re-read all task states in one call, unless the cache is fresh."""
+        with self._lock:
+            if not force and time.time() - self._refreshed < self.interval:
+                return False
+            changed = False
+            for status in ee.data.getTaskList():
+                task_id = status.get('id')
+                old = self.states.get(task_id)
+                if old is None or old.get('state') != status.get('state'):
+                    changed = True
+                self.states[task_id] = status
+            self._refreshed = time.time()
+            self.interval = (self.min_interval if changed
+                             else min(self.interval * BACKOFF, self.max_interval))
+            now = time.time()
+            expired = [tid for tid in self._futures
+                       if self.states[tid].get('state') == UNKNOWN
+                       and now - self._tracked[tid] > self.missing_timeout]
+            for tid in expired:
+                self.states[tid]['error_message'] = (
+                    f'not in the task list after {self.missing_timeout:.0f}s')
+            done = [(tid, f) for tid, f in self._futures.items()
+                    if tid in expired or self.states[tid].get('state') in DONE_STATES]
+            for tid, _ in done:
+                del self._futures[tid]
+                del self._tracked[tid]
+
+        # Resolve outside the lock so callbacks may use the tracker
+        for tid, future in done:
+            future.set_result(self.states[tid])
+        return changed
+
+    def sleep(self):
+        time.sleep(self.interval)
+
+    def active_count(self):
+        """Tasks queued or running in the EE project (cached)."""
+        self.refresh()
+        with self._lock:
+            return sum(1 for s in self.states.values()
+                       if s.get('state') in ACTIVE_STATES)
+
+    def list_tasks(self):
+        self.refresh()
+        with self._lock:
+            return list(self.states.values())
+
+    # ── Waiting ──────────────────────────────────────────────────────────────
+    def wait_for_slots(self, limit, verbose=True):
+        """Block until fewer than `limit` tasks are active; returns the count."""
+        while True:
+            active = self.active_count()
+            if active < limit:
+                return active
+            if verbose:
+                print(f'    Queue full ({active} tasks). Next check in {self.interval:.0f}s ...')
+            self.sleep()
+
+    def wait(self, futures, timeout=None, verbose=True):
+        """Block until all futures resolve; returns their final status dicts."""
+        futures = list(futures)
+        deadline = None if timeout is None else time.time() + timeout
+        while not all(f.done() for f in futures):
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f'{sum(not f.done() for f in futures)} task(s) still running')
+            if self.refresh(force=True) and verbose:
+                states = [self.states.get(f.task_id, {}).get('state')
+                          for f in futures]
+                print(f'  Status: {states}')
+            self.sleep()
+        return [f.result() for f in futures]
+
+
+def wait_for_operation(op_name, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+    """
+    Poll a single EE long-running operation (e.g. table ingestion) with the
+    same adaptive backoff. Returns the final operation dict.
+    """
+    interval = min_interval
+    last = None
+    while True:
+        op = ee.data.getOperation(op_name)
+        state = op.get('metadata', {}).get('state')
+        if state != last:
+            print(f'  {state}')
+            interval = min_interval
+        else:
+            interval = min(interval * BACKOFF, max_interval)
+        last = state
+        if op.get('done') or state in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            return op
+        time.sleep(interval)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """Process-wide TaskTracker."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TaskTracker()
+    return _tracker
@@ -0,0 +1,297 @@
+"""
+transfer.py — Concurrent GCS transfers shared by the pipeline scripts
+=====================================================================
+The process-wide storage.Client from clients.py (its HTTP connection pool
+widened so threads reuse connections), and a TransferManager that moves
+many small objects through a bounded thread pool:
+
+  * download_many() streams (blob, bytes) back in input order while at
+    most 2 × workers transfers are in flight;
+  * upload_many() / upload_files() push objects or local files the same way;
+  * every transfer retries transient errors (429, 5xx, dropped
+    connections) with exponential backoff;
+  * uploads can be gzip content-encoded (GCS decompresses on download
+    for clients that do not accept gzip);
+  * downloads can read through a blob_cache.BlobCache;
+  * objects, bytes, retries and throughput are counted per manager.
+
+With LOCAL_STORAGE_DIR set, get_bucket() returns a local_storage.LocalBucket
+mirroring the bucket layout on disk instead (publish with
+local_storage.sync_to_gcs).
+
+Usage:
+    transfer = get_manager()
+    for blob, data in transfer.download_many(blobs):
+        ...
+    transfer.upload_many((f'reef_timeseries/{k}.json', v, 'application/json')
+                         for k, v in files.items())
+    print(transfer.stats)
+"""
+
+import os
+import time
+import gzip
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import clients
+import spans
+
+GCS_BUCKET = os.environ.get('GCS_BUCKET', 'YOUR-GCS-BUCKET')
+
+LOCAL_STORAGE_DIR = os.environ.get('LOCAL_STORAGE_DIR')  # bucket mirror on disk
+TRANSFER_WORKERS = int(os.environ.get('GCS_TRANSFER_WORKERS', '16'))
+MAX_RETRIES = 5
+RETRY_BASE = 1.0   # seconds, doubled per attempt
+RETRY_MAX = 32
+PINNED_ATTEMPTS = 3  # generation-pinned reads before giving up on the cache
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLIENT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def get_client():
+    """Process-wide storage.Client (safe to call from worker threads)."""
+    return clients.storage()
+
+
+def get_gcs_bucket(name=GCS_BUCKET):
+    return get_client().bucket(name)
+
+
+def get_bucket(name=GCS_BUCKET):
+    """The pipeline's bucket: LOCAL_STORAGE_DIR if set, else GCS."""
+    if LOCAL_STORAGE_DIR:
+        from local_storage import LocalBucket
+        return LocalBucket(LOCAL_STORAGE_DIR)
+    return get_gcs_bucket(name)
+
+
+def is_transient(exc):
+    """Errors worth retrying: throttling, server errors, dropped connections."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout,
+                            requests.exceptions.ChunkedEncodingError)):
+            return True
+    except ImportError:
+        pass
+    try:
+        from google.api_core import exceptions as api
+    except ImportError:
+        return False
+    return isinstance(exc, (api.TooManyRequests, api.InternalServerError,
+                            api.BadGateway, api.ServiceUnavailable,
+                            api.GatewayTimeout))
+
+
+def is_precondition_failed(exc):
+    """HTTP 412: the object no longer has the generation we asked for."""
+    try:
+        from google.api_core import exceptions as api
+    except ImportError:
+        return False
+    return isinstance(exc, api.PreconditionFailed)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# TRANSFER MANAGER
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TransferStats:
+    """Thread-safe counters for one manager."""
+
+    def __init__(self):
+        self.uploaded = 0
+        self.downloaded = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.started = None
+        self._lock = threading.Lock()
+
+    def add(self, direction, n_bytes):
+        with self._lock:
+            if self.started is None:
+                self.started = time.time()
+            if direction == 'up':
+                self.uploaded += 1
+                self.bytes_up += n_bytes
+            else:
+                self.downloaded += 1
+                self.bytes_down += n_bytes
+
+    def retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def __str__(self):
+        elapsed = time.time() - self.started if self.started else 0
+        mb = (self.bytes_up + self.bytes_down) / 1024 / 1024
+        rate = mb / elapsed if elapsed > 0 else 0
+        return (f'↓ {self.downloaded} / ↑ {self.uploaded} objects, {mb:.1f} MB '
+                f'in {elapsed:.1f}s ({rate:.1f} MB/s), {self.retries} retries, '
+                f'{self.cache_hits} cache hits')
+
+
+class TransferManager:
+    """Bounded, retrying, concurrent uploads and downloads for one bucket."""
+
+    def __init__(self, bucket=None, workers=TRANSFER_WORKERS, retries=MAX_RETRIES,
+                 gzip=False):
+        self.bucket = bucket or get_bucket()
+        self.workers = workers
+        self.retries = retries
+        self.gzip = gzip
+        self.stats = TransferStats()
+
+    def _retry(self, fn, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                self.stats.retry()
+                time.sleep(min(RETRY_BASE * 2 ** attempt, RETRY_MAX))
+
+    def map(self, fn, items):
+        """
+        fn(item) over items on the pool, yielded in input order. Workers
+        count their bytes towards the caller's current span.
+        """
+        if self.workers <= 1:
+            yield from (fn(item) for item in items)
+            return
+        parent = spans.current()
+
+        def run(item):
+            with spans.within(parent):
+                return fn(item)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = deque()
+            for item in items:
+                if len(in_flight) >= 2 * self.workers:
+                    yield in_flight.popleft().result()
+                in_flight.append(pool.submit(run, item))
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    # ── Single objects ───────────────────────────────────────────────────────
+    def download(self, blob, cache=None):
+        """
+        Object bytes (blob or name); retried on transient errors. With a
+        cache, versioned blobs (generation + CRC32C known) are read through it.
+        """
+        if isinstance(blob, str):
+            blob = self.bucket.blob(blob)
+        if cache is not None and cache.key(blob) is not None:
+            data = self._download_cached(blob, cache)
+            if data is not None:
+                return data
+            # Rewritten on every attempt: read the latest bytes uncached
+        data = self._retry(blob.download_as_bytes)
+        self.stats.add('down', len(data))
+        spans.add(bytes_down=len(data))
+        return data
+
+    def _download_cached(self, blob, cache):
+        """
+        Read `blob` through the cache. The download is pinned to the
+        generation named in the cache key, so an object rewritten
+        meanwhile is never cached under its old key; on a 412 the blob is
+        reloaded and read again, still through the cache, at its new
+        generation. None if it changed on every attempt.
+        """
+        for _ in range(PINNED_ATTEMPTS):
+            data = cache.get(blob)
+            if data is not None:
+                self.stats.hit()
+                return data
+            try:
+                data = self._retry(lambda: blob.download_as_bytes(
+                    if_generation_match=blob.generation))
+            except Exception as e:
+                if not is_precondition_failed(e):
+                    raise
+                blob.reload()
+                continue
+            cache.put(blob, data)
+            self.stats.add('down', len(data))
+            spans.add(bytes_down=len(data))
+            return data
+        return None
+
+    def upload(self, name, data, content_type=None, gzip=None, cache=None):
+        """
+        Upload bytes/str to `name`, optionally gzip content-encoded. With a
+        cache, the bytes are also stored under the new generation, so the
+        next run reads them back without a download.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        raw = data
+        blob = self.bucket.blob(name)
+        if self.gzip if gzip is None else gzip:
+            data = _gzip(data)
+            blob.content_encoding = 'gzip'
+        self._retry(lambda: blob.upload_from_string(data, content_type=content_type))
+        self.stats.add('up', len(data))
+        spans.add(bytes_up=len(data))
+        if cache is not None:
+            cache.put(blob, raw)
+        return blob
+
+    def upload_file(self, name, path, content_type=None):
+        blob = self.bucket.blob(name)
+        self._retry(lambda: blob.upload_from_filename(path, content_type=content_type))
+        self.stats.add('up', os.path.getsize(path))
+        spans.add(bytes_up=os.path.getsize(path))
+        return blob
+
+    # ── Bulk ─────────────────────────────────────────────────────────────────
+    def download_many(self, blobs, cache=None):
+        """Yield (blob, bytes) for blobs (or names), in input order."""
+        def fetch(blob):
+            if isinstance(blob, str):
+                blob = self.bucket.blob(blob)
+            return blob, self.download(blob, cache)
+        yield from self.map(fetch, blobs)
+
+    def upload_many(self, items, cache=None):
+        """Upload (name, data, content_type[, gzip]) items; returns the names."""
+        return [blob.name for blob in
+                self.map(lambda item: self.upload(*item, cache=cache), items)]
+
+    def upload_files(self, items):
+        """Upload (name, local path, content_type) items; returns the names."""
+        return [blob.name for blob in
+                self.map(lambda item: self.upload_file(*item), items)]
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """Process-wide TransferManager for GCS_BUCKET."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = TransferManager()
+    return _manager
@@ -24,6 +24,10 @@ import os
 import time
 import subprocess
 
+import clients
+import task_tracker
+from task_tracker import get_tracker
+
 GEE_PROJECT = os.environ.get('GEE_PROJECT', 'YOUR-GEE-PROJECT')
 GCS_BUCKET = os.environ.get('GCS_BUCKET', 'YOUR-GCS-BUCKET')
 ASSET_FOLDER = f'projects/{GEE_PROJECT}/assets/coral_dhw'
@@ -32,7 +36,7 @@ SMALL_THRESHOLD = 100  # features — above this, use GCS staging
 
 
 def init():
-    ee.Initialize(project=GEE_PROJECT)
+    clients.init_ee()
 
 
 def delete_asset_if_exists(asset_id):
@@ -51,33 +55,24 @@ def ensure_folder():
 
 
 def wait_for_task(task):
-    """Poll task until completed or failed."""
+    """Wait for a task via the shared tracker (adaptive backoff)."""
     print('Waiting for upload ...')
-    while True:
-        status = task.status()
-        state = status['state']
-        print(f'  {state}')
-        if state == 'COMPLETED':
-            return True
-        elif state == 'FAILED':
-            print(f'  Error: {status.get("error_message", "")}')
-            return False
-        time.sleep(5)
+    status = get_tracker().wait([get_tracker().track(task)])[0]
+    print(f'  {status["state"]}')
+    if status['state'] == 'COMPLETED':
+        return True
+    print(f'  Error: {status.get("error_message", "")}')
+    return False
 
 
 def wait_for_operation(op_name):
-    """Poll an EE operation by name until done."""
+    """Wait for an EE operation by name (adaptive backoff)."""
     print('Waiting for ingestion ...')
-    while True:
-        op = ee.data.getOperation(op_name)
-        state = op['metadata']['state']
-        print(f'  {state}')
-        if state == 'SUCCEEDED':
-            return True
-        elif state in ('FAILED', 'CANCELLED'):
-            print(f'  Error: {op.get("error", {}).get("message", "")}')
-            return False
-        time.sleep(5)
+    op = task_tracker.wait_for_operation(op_name)
+    if op.get('metadata', {}).get('state') == 'SUCCEEDED':
+        return True
+    print(f'  Error: {op.get("error", {}).get("message", "")}')
+    return False
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -122,15 +117,12 @@ def upload_small(features, asset_id, asset_name):
 
 def upload_large_via_gcs(geojson_path, asset_id, asset_name):
     """Upload large GeoJSON by staging through GCS."""
-    from google.cloud import storage
+    import transfer
 
     gcs_path = f'tmp/{asset_name}.geojson'
     print(f'  Uploading to gs://{GCS_BUCKET}/{gcs_path} ...')
 
-    client = storage.Client(project=GEE_PROJECT)
-    bucket = client.bucket(GCS_BUCKET)
-    blob = bucket.blob(gcs_path)
-    blob.upload_from_filename(geojson_path)
+    blob = transfer.get_manager().upload_file(gcs_path, geojson_path)
     print(f'  Uploaded ({blob.size / 1024 / 1024:.1f} MB)')
 
     # Ingest from GCS into EE
@@ -181,8 +173,10 @@ def upload_large_via_cli(geojson_path, asset_id):
 
     # CLI starts an async task — wait for it
     print('  Waiting for CLI upload task ...')
-    for _ in range(360):  # max 30 minutes
-        tasks = ee.data.getTaskList()
+    tracker = get_tracker()
+    deadline = time.time() + 30 * 60
+    while time.time() < deadline:
+        tasks = tracker.list_tasks()
         upload_tasks = [t for t in tasks
                         if 'upload' in t.get('description', '').lower()
                         and t['state'] in ('READY', 'RUNNING')]
@@ -194,7 +188,7 @@ def upload_large_via_cli(geojson_path, asset_id):
             if recent:
                 return True
             break
-        time.sleep(5)
+        tracker.sleep()
 
     return True
 